@@ -0,0 +1,39 @@
+import { type NextRequest, NextResponse } from "next/server"
+
+const PYTHON_SERVER_URL = process.env.PYTHON_SERVER_URL || "http://localhost:8000"
+
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json()
+
+    const { client_ids } = body
+
+    if (!Array.isArray(client_ids) || client_ids.length === 0) {
+      return NextResponse.json({ error: "client_ids must be a non-empty array" }, { status: 400 })
+    }
+
+    try {
+      // Features are resolved server-side, so only the ids travel
+      const response = await fetch(`${PYTHON_SERVER_URL}/predict/churn/clients`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ client_ids }),
+        signal: AbortSignal.timeout(5000),
+      })
+
+      if (response.ok) {
+        const prediction = await response.json()
+        return NextResponse.json(prediction)
+      }
+
+      return NextResponse.json({ error: "Churn prediction failed" }, { status: response.status })
+    } catch (error) {
+      return NextResponse.json({ error: "ML server unavailable" }, { status: 503 })
+    }
+  } catch (error) {
+    console.error("[v0] Error in churn prediction by client:", error)
+    return NextResponse.json({ error: "Failed to predict churn" }, { status: 500 })
+  }
+}
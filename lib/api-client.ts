@@ -62,6 +62,13 @@ class ApiClient {
     return this.post<{ quality_label: string; quality_score: number }>("/predict/lead-quality", lead)
   }
 
+  async predictChurnForClients(clientIds: Array<string | number>) {
+    return this.post<{
+      predictions: { client_id: string; churn_probability: number; risk_level: string }[]
+      not_found: string[]
+    }>("/predict/churn-by-client", { client_ids: clientIds })
+  }
+
   async saveLead(lead: any) {
     return this.post("/leads", lead)
   }
@@ -0,0 +1,534 @@
+"""
+Benchmarks de rendimiento - Customer Intelligence System
+
+Mide la inferencia de `ml/utils.py` (predicción individual, por lotes, en
+batch con DataFrame y carga de modelos) y las etapas del pipeline de
+`ml/train_leads_and_churn.py`, con entradas de 1 a 10^6 filas. Los resultados
+se guardan en JSON y se comparan con una línea base: si algún caso es más
+lento que en la base por encima de la tolerancia, el script lo lista y
+termina con código 1. Sin línea base solo avisa, salvo con `--require-baseline`.
+
+Los modelos medidos no son los de `ml/models/`: se entrenan al arrancar con
+datos sintéticos generados con semilla fija, así que dos ejecuciones del mismo
+código miden exactamente los mismos modelos (`--models-dir` mide otros).
+
+Uso:
+    python ml/benchmark.py --save-baseline          # guarda la línea base
+    python ml/benchmark.py                          # compara con la línea base
+    python ml/benchmark.py --require-baseline       # ídem, y falla si no hay línea base
+    python ml/benchmark.py --suite inference --sizes 1 1000 1000000
+    python ml/benchmark.py --suite training --train-sizes 1000 10000
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Add project root to path to import ml.utils
+sys.path.insert(0, str(BASE_DIR))
+import ml.utils as ml_utils
+from ml.model_format import load_model
+import ml.train_leads_and_churn as training
+
+RESULTS_DIR = Path(__file__).resolve().parent / "benchmark_results"
+DEFAULT_BASELINE = RESULTS_DIR / "baseline.json"
+DEFAULT_OUTPUT = RESULTS_DIR / "latest.json"
+
+INFERENCE_SIZES = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+# Cross-validated fits at 10^6 rows take tens of minutes; ask for them with --train-sizes
+TRAINING_SIZES = (1_000, 10_000, 100_000)
+MIN_TRAINING_ROWS = 100
+
+# Rows of synthetic history the measured models are trained on
+FIXTURE_ROWS = 5_000
+SEED = 42
+
+# Timing: calls are grouped so each repeat lasts at least MIN_REPEAT_SECONDS, and a case
+# repeats up to REPEATS times within its time budget. Many short repeats spread over a
+# couple of seconds ride out slow phases of a shared host better than a few long ones
+MIN_REPEAT_SECONDS = 0.1
+REPEATS = 20
+DEFAULT_MAX_SECONDS = 5.0
+
+# Statistic compared against the baseline: noise (other processes, a shared host) only ever
+# adds time, so the fastest repeat is the most reproducible estimate of a case's own cost
+COMPARED_STAT = 'min_seconds'
+
+# A case regresses when it is this much slower than the baseline...
+DEFAULT_TOLERANCE = 0.25
+# ...and by at least this many seconds per call (timer noise on microsecond cases)
+DEFAULT_MIN_DELTA = 1e-5
+
+PRESUPUESTOS = ['Menos de 5M', '5M-10M', '10M-20M', '20M-50M', 'Más de 50M']
+URGENCIAS = ['Baja', 'Media', 'Alta', 'Inmediata']
+TIPOS_SERVICIO = ['Consultoría', 'Desarrollo', 'Marketing', 'Infraestructura', 'SEO']
+CIUDADES = ['Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Cartagena', 'Bucaramanga']
+NIVELES = ['Bajo', 'Medio', 'Alto']
+
+
+# ==================== Datos sintéticos ====================
+
+def synthetic_leads(n: int, seed: int = SEED) -> pd.DataFrame:
+    """Histórico de leads con el esquema de `leads_historicos.csv` y calidad correlacionada con las features."""
+    rng = np.random.default_rng(seed)
+    presupuesto = rng.integers(0, len(PRESUPUESTOS), n)
+    urgencia = rng.integers(0, len(URGENCIAS), n)
+    tipo_servicio = rng.integers(0, len(TIPOS_SERVICIO), n)
+    ciudad = rng.integers(0, len(CIUDADES), n)
+
+    score = presupuesto / 2 + urgencia / 1.5 + (tipo_servicio == 1) * 0.5 + rng.normal(0, 0.6, n)
+    calidad = np.select([score < 1.3, score < 2.6], ['Baja', 'Media'], 'Alta')
+
+    return pd.DataFrame({
+        'presupuesto': np.asarray(PRESUPUESTOS, dtype=object)[presupuesto],
+        'urgencia': np.asarray(URGENCIAS, dtype=object)[urgencia],
+        'tipo_servicio': np.asarray(TIPOS_SERVICIO, dtype=object)[tipo_servicio],
+        'ciudad': np.asarray(CIUDADES, dtype=object)[ciudad],
+        'calidad': calidad
+    })
+
+
+def synthetic_clients(n: int, seed: int = SEED) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Comportamiento de `n` clientes y sus transacciones (unas 3 por cliente), con
+    el esquema de `clientes_comportamiento.csv` y `clientes_transacciones.csv`.
+    """
+    rng = np.random.default_rng(seed)
+    comportamiento = pd.DataFrame({
+        'cliente_id': np.arange(n),
+        'nivel_engagement': np.asarray(NIVELES, dtype=object)[rng.choice(3, n, p=[0.2, 0.5, 0.3])],
+        'nivel_satisfaccion': np.asarray(NIVELES, dtype=object)[rng.choice(3, n, p=[0.15, 0.45, 0.4])],
+        'dias_ultima_compra': rng.integers(0, 180, n)
+    })
+
+    client_ids = np.repeat(np.arange(n), rng.poisson(3, n))
+    dates = np.datetime64('2024-01-01') + rng.integers(0, 365, len(client_ids)).astype('timedelta64[D]')
+    transacciones = pd.DataFrame({
+        'cliente_id': client_ids,
+        'monto_cop': rng.lognormal(14.5, 0.8, len(client_ids)),
+        'fecha_transaccion': np.datetime_as_string(dates, unit='D')
+    })
+    return comportamiento, transacciones
+
+
+def lead_requests(n: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    """`n` leads con los campos de `predict_lead_quality`."""
+    leads = synthetic_leads(n, seed).drop(columns='calidad')
+    return leads.to_dict('records')
+
+
+def client_requests(n: int, seed: int = SEED) -> List[Dict[str, Any]]:
+    """`n` clientes con los campos de `predict_churn`."""
+    rng = np.random.default_rng(seed)
+    num_transacciones = rng.poisson(3, n)
+    promedio = rng.lognormal(14.5, 0.5, n)
+    clients = pd.DataFrame({
+        'engagement': np.asarray(NIVELES, dtype=object)[rng.integers(0, 3, n)],
+        'satisfaccion': np.asarray(NIVELES, dtype=object)[rng.integers(0, 3, n)],
+        'dias_ultima_compra': rng.integers(0, 180, n),
+        'total_compras': promedio * num_transacciones,
+        'promedio_compra': promedio,
+        'num_transacciones': num_transacciones,
+        'std_compra': promedio * rng.uniform(0, 0.5, n)
+    })
+    return clients.to_dict('records')
+
+
+# ==================== Medición ====================
+
+def time_case(fn: Callable[[], Any], max_seconds: float = DEFAULT_MAX_SECONDS) -> Dict[str, Any]:
+    """
+    Mide `fn` y devuelve estadísticas del tiempo por llamada.
+
+    La primera llamada calienta cachés y no se cuenta, salvo que por sí sola
+    agote `max_seconds` (en ese caso es la única medición). Las llamadas más
+    cortas que `MIN_REPEAT_SECONDS` se agrupan en cada repetición, como en
+    `timeit.Timer.autorange`.
+
+    Returns:
+        dict: 'median_seconds', 'min_seconds', 'mean_seconds', 'max_seconds',
+            'repeats' y 'calls_per_repeat'
+    """
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+
+    if first >= max_seconds:
+        samples, number = [first], 1
+    else:
+        number = max(1, math.ceil(MIN_REPEAT_SECONDS / max(first, 1e-9)))
+        repeats = max(1, min(REPEATS, int(max_seconds // max(first * number, 1e-9))))
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+
+    return {
+        'median_seconds': statistics.median(samples),
+        'min_seconds': min(samples),
+        'mean_seconds': statistics.fmean(samples),
+        'max_seconds': max(samples),
+        'repeats': len(samples),
+        'calls_per_repeat': number
+    }
+
+
+def _record(results: List[Dict[str, Any]], suite: str, name: str, size: int, timing: Dict[str, Any]) -> None:
+    timing['rows_per_second'] = size / timing['median_seconds'] if timing['median_seconds'] > 0 else None
+    results.append({'suite': suite, 'name': name, 'size': size, **timing})
+    print(f"   • {name:<28} n={size:>9,}  mín={_format_seconds(timing['min_seconds'])}"
+          f"  mediana={_format_seconds(timing['median_seconds'])}  ({timing['repeats']}×{timing['calls_per_repeat']})")
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f}ms"
+    return f"{seconds:8.2f}s "
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silencia los prints de las etapas de entrenamiento mientras se miden."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# ==================== Modelos de prueba ====================
+
+def train_fixture_models(models_dir: Path, rows: int = FIXTURE_ROWS, n_jobs: int = training.N_JOBS) -> None:
+    """Entrena y exporta los dos modelos con datos sintéticos, como lo haría el pipeline de entrenamiento."""
+    with _quiet():
+        lead_features = training.build_lead_features(synthetic_leads(rows))
+        lead_fit = training.fit_leads(lead_features, training.lead_candidates(n_jobs), 2, n_jobs)
+        training.export_leads(lead_fit, lead_features['feature_config'], models_dir)
+
+        churn_features = training.build_churn_features(*synthetic_clients(rows))
+        churn_fit = training.fit_churn(churn_features, training.churn_candidates(n_jobs), 2, n_jobs)
+        training.export_churn(
+            churn_fit, churn_features['feature_config'], churn_features['aggregates'], models_dir
+        )
+    print(f"   🤖 Leads: {lead_fit['best_name']} | Churn: {churn_fit['best_name']}")
+
+
+def _use_models(models_dir: Path) -> None:
+    """Apunta `ml.utils` a `models_dir` y descarta los modelos ya cargados."""
+    ml_utils.MODELS_DIR = models_dir
+    ml_utils.get_model_registry().invalidate()
+
+
+# ==================== Suites ====================
+
+def run_inference(sizes: Sequence[int], max_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Inferencia de `ml.utils` con los modelos de `ml_utils.MODELS_DIR`.
+
+    La caché de churn se desactiva para medir siempre el modelo; las funciones
+    de un solo registro se miden solo con n=1.
+    """
+    results: List[Dict[str, Any]] = []
+    cache = ml_utils.get_churn_cache()
+    cache_size, cache.max_size = cache.max_size, 0
+    try:
+        print("\n⏱️  Carga de modelos")
+        for name in ml_utils.MODEL_ARTIFACTS:
+            # A fresh registry per call: memory-mapped artifacts + lookup table, as the server loads them
+            _record(results, 'inference', f'load_registry[{name}]', 1,
+                    time_case(lambda: ml_utils.ModelRegistry().get(name), max_seconds))
+        _record(results, 'inference', 'load_joblib[lead_quality]', 1,
+                time_case(ml_utils.load_lead_quality_model, max_seconds))
+        _record(results, 'inference', 'load_joblib[churn]', 1,
+                time_case(ml_utils.load_churn_model, max_seconds))
+        for name, filename in ml_utils.NATIVE_MODEL_FILES.items():
+            path = ml_utils.MODELS_DIR / filename
+            if path.exists():
+                _record(results, 'inference', f'load_native[{name}]', 1,
+                        time_case(lambda: load_model(path), max_seconds))
+        ml_utils.warm_up_models()
+
+        print("\n⏱️  Predicción individual")
+        lead = lead_requests(1)[0]
+        client = client_requests(1)[0]
+        _record(results, 'inference', 'predict_lead_quality', 1,
+                time_case(lambda: ml_utils.predict_lead_quality(lead), max_seconds))
+        _record(results, 'inference', 'predict_churn', 1,
+                time_case(lambda: ml_utils.predict_churn(client), max_seconds))
+
+        print("\n⏱️  Predicción por lotes")
+        leads = lead_requests(max(sizes))
+        clients = client_requests(max(sizes))
+        cases = (
+            ('predict_lead_quality_many', ml_utils.predict_lead_quality_many, leads),
+            ('batch_predict_leads', ml_utils.batch_predict_leads, leads),
+            ('predict_churn_many', ml_utils.predict_churn_many, clients),
+            ('batch_predict_churn', ml_utils.batch_predict_churn, clients),
+        )
+        for name, fn, rows in cases:
+            for size in sizes:
+                batch = rows[:size]
+                _record(results, 'inference', name, size, time_case(lambda: fn(batch), max_seconds))
+    finally:
+        cache.max_size = cache_size
+    return results
+
+
+def run_training(sizes: Sequence[int], max_seconds: float, cv_folds: int, n_jobs: int) -> List[Dict[str, Any]]:
+    """
+    Etapas load, features, fit, evaluate y export del pipeline de entrenamiento,
+    con datos sintéticos de cada tamaño (report no se mide: solo dibuja gráficos).
+    """
+    results: List[Dict[str, Any]] = []
+    for size in sizes:
+        print(f"\n⏱️  Entrenamiento con {size:,} filas")
+        with tempfile.TemporaryDirectory(prefix='benchmark-train-') as tmp:
+            tmp_dir = Path(tmp)
+            leads_csv = tmp_dir / 'leads_historicos.csv'
+            comportamiento_csv = tmp_dir / 'clientes_comportamiento.csv'
+            transacciones_csv = tmp_dir / 'clientes_transacciones.csv'
+            synthetic_leads(size).to_csv(leads_csv, index=False)
+            comportamiento, transacciones = synthetic_clients(size)
+            comportamiento.to_csv(comportamiento_csv, index=False)
+            transacciones.to_csv(transacciones_csv, index=False)
+            # A new directory per call: exporting over an existing version skips writing it
+            runs = itertools.count()
+
+            leads_df = training.load_leads(leads_csv)
+            features = training.build_lead_features(leads_df)
+            candidates = training.lead_candidates(n_jobs)
+            with _quiet():
+                fit = training.fit_leads(features, candidates, cv_folds, n_jobs)
+            stages = (
+                ('leads_load', lambda: training.load_leads(leads_csv)),
+                ('leads_features', lambda: training.build_lead_features(leads_df)),
+                ('leads_fit', lambda: training.fit_leads(features, candidates, cv_folds, n_jobs)),
+                ('leads_evaluate', lambda: training.evaluate_leads(fit)),
+                ('leads_export', lambda: training.export_leads(
+                    fit, features['feature_config'], tmp_dir / f"models-{next(runs)}"
+                )),
+            )
+            _time_stages(results, stages, size, max_seconds)
+
+            churn_inputs = training.load_churn(comportamiento_csv, transacciones_csv)
+            features = training.build_churn_features(*churn_inputs)
+            candidates = training.churn_candidates(n_jobs)
+            with _quiet():
+                fit = training.fit_churn(features, candidates, cv_folds, n_jobs)
+            stages = (
+                ('churn_load', lambda: training.load_churn(comportamiento_csv, transacciones_csv)),
+                ('churn_features', lambda: training.build_churn_features(*churn_inputs)),
+                ('churn_fit', lambda: training.fit_churn(features, candidates, cv_folds, n_jobs)),
+                ('churn_evaluate', lambda: training.evaluate_churn(fit)),
+                ('churn_export', lambda: training.export_churn(
+                    fit, features['feature_config'], features['aggregates'], tmp_dir / f"models-{next(runs)}"
+                )),
+            )
+            _time_stages(results, stages, size, max_seconds)
+    return results
+
+
+def _time_stages(
+    results: List[Dict[str, Any]],
+    stages: Sequence[Tuple[str, Callable[[], Any]]],
+    size: int,
+    max_seconds: float
+) -> None:
+    for name, fn in stages:
+        with _quiet():
+            timing = time_case(fn, max_seconds)
+        _record(results, 'training', name, size, timing)
+
+
+# ==================== Línea base ====================
+
+def environment() -> Dict[str, Any]:
+    """Máquina y versiones con que se midió; compararlas evita falsas regresiones entre equipos."""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit-learn': sklearn.__version__
+    }
+
+
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_delta: float = DEFAULT_MIN_DELTA
+) -> List[Dict[str, Any]]:
+    """
+    Compara cada caso con la línea base según `COMPARED_STAT` (la repetición más rápida).
+
+    Returns:
+        list: Un dict por caso presente en ambas ('suite', 'name', 'size',
+            'baseline_seconds', 'current_seconds', 'ratio', 'regression')
+    """
+    baseline_cases = {
+        (case['suite'], case['name'], case['size']): case[COMPARED_STAT]
+        for case in baseline.get('results', [])
+    }
+    comparison = []
+    for case in results:
+        base = baseline_cases.get((case['suite'], case['name'], case['size']))
+        if base is None:
+            continue
+        current = case[COMPARED_STAT]
+        comparison.append({
+            'suite': case['suite'],
+            'name': case['name'],
+            'size': case['size'],
+            'baseline_seconds': base,
+            'current_seconds': current,
+            'ratio': current / base if base > 0 else math.inf,
+            'regression': current > base * (1 + tolerance) and current - base > min_delta
+        })
+    return comparison
+
+
+def print_comparison(comparison: List[Dict[str, Any]], tolerance: float) -> None:
+    """Imprime las regresiones y las mejoras respecto a la línea base."""
+    regressions = [case for case in comparison if case['regression']]
+    improvements = [case for case in comparison if case['ratio'] < 1 / (1 + tolerance)]
+
+    for case in improvements:
+        print(f"   🚀 {case['name']} n={case['size']:,}: {_format_seconds(case['baseline_seconds']).strip()} → "
+              f"{_format_seconds(case['current_seconds']).strip()} ({case['ratio']:.2f}x)")
+
+    if not regressions:
+        print(f"\n✅ Sin regresiones respecto a la línea base ({len(comparison)} casos, tolerancia {tolerance:.0%})")
+        return
+
+    print("\n" + "=" * 70)
+    print(f"❌ {len(regressions)} REGRESIONES DE RENDIMIENTO (tolerancia {tolerance:.0%})")
+    print("=" * 70)
+    for case in sorted(regressions, key=lambda case: -case['ratio']):
+        print(f"   ❌ [{case['suite']}] {case['name']} n={case['size']:,}: "
+              f"{_format_seconds(case['baseline_seconds']).strip()} → "
+              f"{_format_seconds(case['current_seconds']).strip()} ({case['ratio']:.2f}x más lento)")
+
+
+def _write_json(path: Path, payload: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ==================== CLI ====================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mide la inferencia y el entrenamiento y compara con una línea base."
+    )
+    parser.add_argument('--suite', choices=['all', 'inference', 'training'], default='all', help="Qué medir")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(INFERENCE_SIZES),
+                        help="Filas por llamada en los casos de inferencia por lotes")
+    parser.add_argument('--train-sizes', type=int, nargs='+', default=list(TRAINING_SIZES),
+                        help="Filas de histórico en los casos de entrenamiento")
+    parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                        help="Presupuesto de tiempo por caso")
+    parser.add_argument('--cv-folds', type=int, default=training.CV_FOLDS, help="Folds de validación cruzada")
+    parser.add_argument('--n-jobs', type=int, default=training.N_JOBS, help="Tareas en paralelo (-1 = todos los cores)")
+    parser.add_argument('--models-dir', type=Path, default=None,
+                        help="Medir estos modelos en vez de entrenar los de prueba")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="JSON de resultados")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help="JSON de la línea base")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Guardar los resultados como nueva línea base en vez de comparar")
+    parser.add_argument('--require-baseline', action='store_true',
+                        help="Terminar con código 1 si no hay línea base (en CI, para no dar por buena una ejecución sin comparar)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Fracción de lentitud admitida antes de considerar un caso regresión")
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA,
+                        help="Diferencia mínima en segundos por llamada para considerar un caso regresión")
+    args = parser.parse_args(argv)
+
+    if min(args.sizes) < 1:
+        parser.error("los tamaños de inferencia deben ser positivos")
+    if min(args.train_sizes) < MIN_TRAINING_ROWS:
+        parser.error(f"el entrenamiento necesita al menos {MIN_TRAINING_ROWS} filas (split estratificado y CV)")
+
+    warnings.filterwarnings('ignore')
+    print("=" * 70)
+    print("BENCHMARKS - CUSTOMER INTELLIGENCE SYSTEM")
+    print("=" * 70)
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix='benchmark-models-') as fixture_dir:
+        if args.models_dir is not None:
+            print(f"\n📁 Modelos: {args.models_dir}")
+            _use_models(args.models_dir)
+        else:
+            print(f"\n🔄 Entrenando modelos de prueba con {FIXTURE_ROWS:,} filas sintéticas...")
+            train_fixture_models(Path(fixture_dir), n_jobs=args.n_jobs)
+            _use_models(Path(fixture_dir))
+
+        try:
+            if args.suite in ('all', 'inference'):
+                results.extend(run_inference(sorted(set(args.sizes)), args.max_seconds))
+            if args.suite in ('all', 'training'):
+                results.extend(run_training(sorted(set(args.train_sizes)), args.max_seconds, args.cv_folds, args.n_jobs))
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            return 1
+
+    payload = {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'fixture': {'rows': FIXTURE_ROWS, 'seed': SEED} if args.models_dir is None else {'models_dir': str(args.models_dir)},
+        'results': results
+    }
+
+    if args.save_baseline:
+        _write_json(args.baseline, payload)
+        print(f"\n💾 Línea base guardada: {args.baseline}")
+        return 0
+
+    _write_json(args.output, payload)
+    print(f"\n💾 Resultados guardados: {args.output}")
+
+    if not args.baseline.exists():
+        if args.require_baseline:
+            print(f"❌ No hay línea base en {args.baseline}; créala con --save-baseline")
+            return 1
+        print(f"⚠️  No hay línea base en {args.baseline}; créala con --save-baseline")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != payload['environment']:
+        print("⚠️  La línea base se midió en otro entorno (máquina o versiones); las diferencias pueden no ser del código")
+
+    comparison = compare(results, baseline, args.tolerance, args.min_delta)
+    print_comparison(comparison, args.tolerance)
+    return 1 if any(case['regression'] for case in comparison) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Lectura tipada de los CSV de entrenamiento - Customer Intelligence System
+
+Cada CSV de entrada tiene un esquema (`TableSchema`) con el tipo de cada
+columna que usa el entrenamiento:
+
+- `category`: texto con pocos valores distintos (ciudad, nivel de engagement...),
+  guardado como códigos enteros de 1-2 bytes en lugar de un objeto Python por fila
+- `integer`: entero reducido al tipo más chico que lo contiene (int8...int64)
+- `float64`: montos, sin reducir (float32 cambiaría sumas y desviaciones)
+- `date`: fecha; se lee como categoría y se parsea una vez por valor distinto
+
+Solo se leen las columnas del esquema, con el parser C de pandas. El
+DataFrame tipado lo guarda la caché de etapas del entrenamiento, con la clave
+en `file_signature` (ruta, tamaño y fecha de modificación del CSV): mientras
+el archivo no cambie, no se vuelve a leer ni a recorrer para calcular su hash.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMN_KINDS = ('category', 'integer', 'float64', 'date')
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Columnas de un CSV y su tipo (uno de `COLUMN_KINDS`).
+
+    Example:
+        >>> schema = TableSchema('leads', {'ciudad': 'category', 'urgencia': 'integer'})
+        >>> leads_df = read_table(Path('leads_historicos.csv'), schema)
+    """
+    name: str
+    columns: Dict[str, str]
+
+    def __post_init__(self):
+        unknown = {kind for kind in self.columns.values() if kind not in COLUMN_KINDS}
+        if unknown:
+            raise ValueError(f"Tipos de columna desconocidos en el esquema {self.name}: {sorted(unknown)}")
+
+    def columns_of(self, kind: str) -> List[str]:
+        return [column for column, column_kind in self.columns.items() if column_kind == kind]
+
+
+LEADS_SCHEMA = TableSchema('leads', {
+    'presupuesto': 'category',
+    'urgencia': 'category',
+    'tipo_servicio': 'category',
+    'ciudad': 'category',
+    'calidad': 'category'
+})
+
+BEHAVIOR_SCHEMA = TableSchema('clientes_comportamiento', {
+    'cliente_id': 'integer',
+    'nivel_engagement': 'category',
+    'nivel_satisfaccion': 'category',
+    'dias_ultima_compra': 'integer'
+})
+
+TRANSACTIONS_SCHEMA = TableSchema('clientes_transacciones', {
+    'cliente_id': 'integer',
+    'monto_cop': 'float64',
+    'fecha_transaccion': 'date'
+})
+
+
+# ==================== Tipos ====================
+
+def apply_schema(df: pd.DataFrame, schema: TableSchema) -> pd.DataFrame:
+    """
+    Aplica los tipos del esquema a un DataFrame ya leído (en el lugar).
+
+    Las columnas `integer` con valores faltantes o no enteros se dejan como
+    se leyeron; las fechas que no se pueden parsear quedan en NaT.
+    """
+    for column in schema.columns_of('category'):
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in schema.columns_of('integer'):
+        if pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    for column in schema.columns_of('float64'):
+        if pd.api.types.is_numeric_dtype(df[column].dtype):
+            df[column] = df[column].astype(np.float64)
+    for column in schema.columns_of('date'):
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Parse each distinct date once; code -1 (missing) picks the trailing NaT
+            dates = pd.to_datetime(values.cat.categories, errors='coerce').to_numpy(dtype='datetime64[ns]')
+            dates = np.append(dates, np.datetime64('NaT', 'ns'))
+            df[column] = pd.Series(dates[values.cat.codes.to_numpy()], index=df.index, name=column)
+        elif not pd.api.types.is_datetime64_any_dtype(values.dtype):
+            df[column] = pd.to_datetime(values, errors='coerce')
+    return df
+
+
+def map_categories(series: pd.Series, mapping: Dict) -> pd.Series:
+    """
+    `series.map(mapping)` con el tipo de los valores mapeados.
+
+    Sobre una columna categórica, `map` devuelve otra columna categórica; aquí
+    el resultado es numérico como en una columna de texto (int64, o float64
+    si algún valor no está en `mapping`).
+    """
+    return pd.Series(np.asarray(series.map(mapping)), index=series.index, name=series.name)
+
+
+# ==================== Lectura ====================
+
+def file_signature(path: Path) -> Tuple[str, int, int]:
+    """
+    (ruta absoluta, tamaño, fecha de modificación en ns) de un archivo.
+
+    Es la clave de caché de una lectura: cambia cuando el archivo se
+    reescribe, sin tener que leerlo entero para calcular su hash.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+    """
+    path = Path(path)
+    stat = path.stat()
+    return str(path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def read_table(path: Path, schema: TableSchema) -> pd.DataFrame:
+    """
+    Lee las columnas del esquema de un CSV con sus tipos.
+
+    Returns:
+        pd.DataFrame: Solo las columnas del esquema, con sus tipos
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        ValueError: Si al CSV le falta alguna columna del esquema
+
+    Example:
+        >>> read_table(Path('public/data/leads_historicos.csv'), LEADS_SCHEMA)
+    """
+    # Dates repeat a lot: reading them as categories keeps one string per distinct date
+    dtypes = {column: 'category' for column in schema.columns_of('category') + schema.columns_of('date')}
+    dtypes.update({column: 'float64' for column in schema.columns_of('float64')})
+    try:
+        df = pd.read_csv(path, usecols=list(schema.columns), dtype=dtypes, engine='c')
+    except ValueError as e:
+        header = pd.read_csv(path, nrows=0).columns
+        missing = [column for column in schema.columns if column not in header]
+        if missing:
+            raise ValueError(f"Faltan columnas en {path}: {missing}") from e
+        raise
+    return apply_schema(df, schema)
@@ -0,0 +1,549 @@
+"""
+Agregados incrementales de transacciones por cliente - Customer Intelligence System
+
+Mantiene, para cada cliente, el número de transacciones, la suma, la media, la
+suma de cuadrados de desviaciones (M2, algoritmo de Welford) y la fecha de la
+última transacción. Con esos cinco valores se obtienen las features de churn
+`total_compras`, `promedio_compra`, `num_transacciones` y `std_compra` sin
+volver a recorrer el histórico: absorber un lote nuevo de transacciones cuesta
+O(filas nuevas), combinando los agregados del lote con los existentes mediante
+la fórmula de Chan et al. para varianzas en paralelo.
+
+pandas se importa solo al leer CSV o construir DataFrames, para que importar
+el módulo (por ejemplo, desde el servidor) no lo cargue.
+
+Uso:
+    python ml/feature_store.py build public/data/clientes_transacciones.csv
+    python ml/feature_store.py append transacciones_del_dia.csv
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Default location, next to the trained models
+DEFAULT_STORE_PATH = Path(__file__).resolve().parent / "models" / "transaction_aggregates.npz"
+DEFAULT_BEHAVIOR_CSV = Path(__file__).resolve().parents[1] / "public" / "data" / "clientes_comportamiento.csv"
+DEFAULT_TRANSACTIONS_CSV = Path(__file__).resolve().parents[1] / "public" / "data" / "clientes_transacciones.csv"
+
+# Bump when the persisted layout changes
+STORE_FORMAT_VERSION = 1
+
+_NAT = np.iinfo(np.int64).min
+
+
+class TransactionAggregateStore:
+    """
+    Agregados por cliente (conteo, suma, media, M2 y última fecha) actualizables por lotes.
+
+    Los agregados viven en arrays de NumPy con un índice cliente -> fila, y los
+    arrays crecen por duplicación, así que `update` solo toca las filas de los
+    clientes presentes en el lote.
+
+    Args:
+        id_column: Columna con el id del cliente
+        amount_column: Columna con el monto de la transacción
+        date_column: Columna con la fecha de la transacción
+
+    Example:
+        >>> store = TransactionAggregateStore.from_transactions(transacciones_df)
+        >>> store.update(transacciones_de_hoy)
+        >>> store.save(DEFAULT_STORE_PATH)
+        >>> store.features([17, 42])
+    """
+
+    def __init__(
+        self,
+        id_column: str = 'cliente_id',
+        amount_column: str = 'monto_cop',
+        date_column: str = 'fecha_transaccion'
+    ):
+        self.id_column = id_column
+        self.amount_column = amount_column
+        self.date_column = date_column
+
+        self._index: Dict[Any, int] = {}
+        self._ids: List[Any] = []
+        self._count = np.zeros(0, dtype=np.int64)
+        self._sum = np.zeros(0, dtype=np.float64)
+        self._mean = np.zeros(0, dtype=np.float64)
+        self._m2 = np.zeros(0, dtype=np.float64)
+        self._last_date = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+        self.rows_absorbed = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_transactions(cls, transactions: 'pd.DataFrame', **columns: str) -> 'TransactionAggregateStore':
+        """Construye el store a partir de un DataFrame de transacciones completo."""
+        store = cls(**columns)
+        store.update(transactions)
+        return store
+
+    @classmethod
+    def from_csv(cls, path: Path, chunksize: int = 1_000_000, **columns: str) -> 'TransactionAggregateStore':
+        """Construye el store leyendo un CSV de transacciones por bloques."""
+        store = cls(**columns)
+        store.update_csv(path, chunksize)
+        return store
+
+    # ==================== Actualización ====================
+
+    def _rows_for(self, client_ids: Iterable[Any]) -> np.ndarray:
+        """Fila de cada cliente, creando (con agregados en cero) las de los clientes nuevos."""
+        index = self._index
+        rows = np.fromiter((index.get(client_id, -1) for client_id in client_ids), dtype=np.intp)
+        new = np.flatnonzero(rows < 0)
+        if len(new):
+            client_ids = list(client_ids)
+            start = len(self._ids)
+            self._reserve(start + len(new))
+            for offset, position in enumerate(new):
+                client_id = client_ids[position]
+                index[client_id] = start + offset
+                self._ids.append(client_id)
+            rows[new] = np.arange(start, start + len(new))
+        return rows
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._count)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        used = len(self._ids)
+        for name, fill in (('_count', 0), ('_sum', 0.0), ('_mean', 0.0), ('_m2', 0.0), ('_last_date', _NAT)):
+            old = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=old.dtype)
+            grown[:used] = old[:used]
+            setattr(self, name, grown)
+
+    def update(self, transactions: 'pd.DataFrame') -> int:
+        """
+        Absorbe un lote de transacciones.
+
+        Args:
+            transactions: DataFrame con las columnas de id, monto y fecha
+
+        Returns:
+            int: Número de clientes afectados
+        """
+        import pandas as pd
+
+        if transactions.empty:
+            return 0
+
+        client_ids = transactions[self.id_column]
+        amounts = pd.to_numeric(transactions[self.amount_column], errors='coerce')
+        dates = pd.to_datetime(transactions[self.date_column], errors='coerce')
+
+        # Per-client aggregates of the batch alone
+        grouped = amounts.groupby(client_ids, sort=False)
+        batch_count = grouped.count()
+        batch_index = batch_count.index
+        nb = batch_count.to_numpy(dtype=np.int64)
+        sb = grouped.sum().reindex(batch_index).to_numpy(dtype=np.float64)
+        mb = grouped.mean().reindex(batch_index).fillna(0.0).to_numpy(dtype=np.float64)
+        m2b = (grouped.var(ddof=0).reindex(batch_index).fillna(0.0) * batch_count).to_numpy(dtype=np.float64)
+        last_b = (
+            dates.groupby(client_ids, sort=False).max().reindex(batch_index)
+            .to_numpy(dtype='datetime64[ns]').view(np.int64)
+        )
+
+        with self._lock:
+            rows = self._rows_for(batch_index.tolist())
+            na = self._count[rows]
+            ma = self._mean[rows]
+            n = na + nb
+            # Chan et al.: combine (n, mean, M2) of two disjoint sets
+            with np.errstate(invalid='ignore', divide='ignore'):
+                delta = mb - ma
+                weight = np.where(n > 0, nb / np.maximum(n, 1), 0.0)
+                self._mean[rows] = ma + delta * weight
+                self._m2[rows] = self._m2[rows] + m2b + delta * delta * na * weight
+            self._count[rows] = n
+            self._sum[rows] = self._sum[rows] + sb
+            self._last_date[rows] = np.maximum(self._last_date[rows], last_b)
+            self.rows_absorbed += len(transactions)
+
+        return len(rows)
+
+    def update_csv(self, path: Path, chunksize: int = 1_000_000) -> int:
+        """
+        Absorbe un CSV de transacciones, leyéndolo por bloques.
+
+        Returns:
+            int: Número de transacciones leídas
+        """
+        import pandas as pd
+
+        rows = 0
+        usecols = [self.id_column, self.amount_column, self.date_column]
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+            self.update(chunk)
+            rows += len(chunk)
+        return rows
+
+    # ==================== Consulta ====================
+
+    def features(self, client_ids: Optional[Iterable[Any]] = None) -> 'pd.DataFrame':
+        """
+        Features de transacciones por cliente, con el formato del `groupby().agg()` de entrenamiento.
+
+        Args:
+            client_ids: Clientes a consultar, en orden (None = todos). Los
+                clientes sin transacciones tienen conteo 0, suma 0 y media,
+                desviación y fecha nulas.
+
+        Returns:
+            pd.DataFrame: Columnas id, total_compras, promedio_compra,
+                num_transacciones, std_compra y fecha_ultima_transaccion
+        """
+        import pandas as pd
+
+        size = len(self._ids)
+        if client_ids is None:
+            ids = list(self._ids)
+            rows = np.arange(size)
+        else:
+            ids = list(client_ids)
+            index = self._index
+            rows = np.fromiter((index.get(client_id, -1) for client_id in ids), dtype=np.intp, count=len(ids))
+        known = rows >= 0
+        safe_rows = np.where(known, rows, 0)
+
+        def column(values: np.ndarray, missing: Any) -> np.ndarray:
+            if size == 0:
+                return np.full(len(rows), missing, dtype=values.dtype)
+            return np.where(known, values[safe_rows], missing)
+
+        count = column(self._count, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, column(self._mean, 0.0), np.nan)
+            std = np.where(count > 1, np.sqrt(np.maximum(column(self._m2, 0.0), 0.0) / (count - 1)), np.nan)
+
+        return pd.DataFrame({
+            self.id_column: ids,
+            'total_compras': column(self._sum, 0.0),
+            'promedio_compra': mean,
+            'num_transacciones': count,
+            'std_compra': std,
+            'fecha_ultima_transaccion': column(self._last_date, _NAT).view('datetime64[ns]')
+        })
+
+    def get(self, client_id: Any) -> Optional[Dict[str, Any]]:
+        """Features de un cliente, o None si no tiene transacciones registradas."""
+        if client_id not in self._index:
+            return None
+        return self.features([client_id]).iloc[0].to_dict()
+
+    # ==================== Persistencia ====================
+
+    def save(self, path: Path = DEFAULT_STORE_PATH) -> Path:
+        """Guarda el store en un `.npz` (escritura atómica)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            size = len(self._ids)
+            arrays = {
+                'ids': np.asarray(self._ids) if size else np.zeros(0, dtype=np.int64),
+                'count': self._count[:size],
+                'sum': self._sum[:size],
+                'mean': self._mean[:size],
+                'm2': self._m2[:size],
+                'last_date': self._last_date[:size],
+                'columns': np.asarray([self.id_column, self.amount_column, self.date_column]),
+                'meta': np.asarray([STORE_FORMAT_VERSION, self.rows_absorbed], dtype=np.int64)
+            }
+            tmp_path = path.with_name(path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_STORE_PATH) -> 'TransactionAggregateStore':
+        """
+        Carga un store guardado con `save`.
+
+        Raises:
+            FileNotFoundError: Si el archivo no existe
+            ValueError: Si el archivo tiene un formato distinto
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"Store de agregados no encontrado en {path}. "
+                "Créalo con: python ml/feature_store.py build public/data/clientes_transacciones.csv"
+            )
+        with np.load(path, allow_pickle=False) as data:
+            version, rows_absorbed = data['meta'].tolist()
+            if version != STORE_FORMAT_VERSION:
+                raise ValueError(f"Formato de store no soportado: {version} (esperado {STORE_FORMAT_VERSION})")
+            id_column, amount_column, date_column = data['columns'].tolist()
+            store = cls(id_column, amount_column, date_column)
+            ids = data['ids'].tolist()
+            store._ids = ids
+            store._index = {client_id: row for row, client_id in enumerate(ids)}
+            store._count = data['count'].copy()
+            store._sum = data['sum'].copy()
+            store._mean = data['mean'].copy()
+            store._m2 = data['m2'].copy()
+            store._last_date = data['last_date'].copy()
+            store.rows_absorbed = rows_absorbed
+        return store
+
+
+# ==================== Índice de features por cliente ====================
+
+class ClientFeatureIndex:
+    """
+    Features de churn de todos los clientes, en arrays columnares indexados por id.
+
+    Se construye una vez a partir del comportamiento de los clientes y del
+    store de agregados de transacciones, con las mismas transformaciones que el
+    entrenamiento, de modo que resolver las features de un cliente es una
+    búsqueda en un dict y unas pocas lecturas de arrays.
+
+    Example:
+        >>> index = ClientFeatureIndex.build(comportamiento_df, TransactionAggregateStore.load())
+        >>> samples = index.samples(['17', '42'])  # Entradas de predict_churn_many (None si no existe)
+    """
+
+    # Numeric features resolved per client, in predict_churn field names
+    NUMERIC_FIELDS = ('dias_ultima_compra', 'total_compras', 'promedio_compra', 'num_transacciones', 'std_compra')
+
+    def __init__(self, client_ids: List[str], engagement: np.ndarray, satisfaccion: np.ndarray, numeric: np.ndarray):
+        self.client_ids = client_ids
+        self.engagement = engagement
+        self.satisfaccion = satisfaccion
+        self.numeric = numeric
+        # Later rows win for duplicated ids, like a dict built from the CSV
+        self._index = {client_id: row for row, client_id in enumerate(client_ids)}
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, client_id: Any) -> bool:
+        return str(client_id) in self._index
+
+    @classmethod
+    def build(cls, comportamiento_df: 'pd.DataFrame', aggregates: TransactionAggregateStore) -> 'ClientFeatureIndex':
+        """
+        Une comportamiento y agregados de transacciones, como `build_churn_features` en el entrenamiento.
+
+        Args:
+            comportamiento_df: Columnas cliente_id, nivel_engagement,
+                nivel_satisfaccion y dias_ultima_compra
+            aggregates: Store de agregados de transacciones
+
+        Raises:
+            ValueError: Si a `comportamiento_df` le falta alguna de esas columnas
+        """
+        from ml.datasets import BEHAVIOR_SCHEMA
+
+        missing = [column for column in BEHAVIOR_SCHEMA.columns if column not in comportamiento_df.columns]
+        if missing:
+            raise ValueError(
+                f"El comportamiento de clientes no tiene las columnas del entrenamiento: faltan {missing}"
+            )
+        raw_ids = comportamiento_df['cliente_id'].tolist()
+        trans_agg = aggregates.features(raw_ids)
+        numeric = np.column_stack([
+            comportamiento_df['dias_ultima_compra'].to_numpy(dtype=np.float64),
+            # Clients without transactions get zeros, as in training
+            trans_agg['total_compras'].fillna(0).to_numpy(dtype=np.float64),
+            trans_agg['promedio_compra'].fillna(0).to_numpy(dtype=np.float64),
+            trans_agg['num_transacciones'].fillna(0).to_numpy(dtype=np.float64),
+            trans_agg['std_compra'].fillna(0).to_numpy(dtype=np.float64),
+        ])
+        return cls(
+            [str(client_id) for client_id in raw_ids],
+            comportamiento_df['nivel_engagement'].to_numpy(dtype=object),
+            comportamiento_df['nivel_satisfaccion'].to_numpy(dtype=object),
+            numeric
+        )
+
+    @classmethod
+    def from_files(cls, behavior_csv: Path, transactions_path: Path) -> 'ClientFeatureIndex':
+        """
+        Construye el índice desde el CSV de comportamiento y un store `.npz` o un CSV de transacciones.
+
+        El CSV de comportamiento se lee con el esquema del entrenamiento
+        (`BEHAVIOR_SCHEMA` en `ml/datasets.py`).
+
+        Raises:
+            FileNotFoundError: Si alguno de los archivos no existe
+            ValueError: Si al CSV de comportamiento le falta alguna columna del esquema
+        """
+        from ml.datasets import BEHAVIOR_SCHEMA, read_table
+
+        behavior = read_table(behavior_csv, BEHAVIOR_SCHEMA)
+        transactions_path = Path(transactions_path)
+        if transactions_path.suffix == '.npz':
+            aggregates = TransactionAggregateStore.load(transactions_path)
+        elif transactions_path.exists():
+            aggregates = TransactionAggregateStore.from_csv(transactions_path)
+        else:
+            raise FileNotFoundError(f"No se encontraron transacciones en {transactions_path}")
+        return cls.build(behavior, aggregates)
+
+    def samples(self, client_ids: Iterable[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Diccionario de entrada de `predict_churn` para cada cliente, o None si no está en el índice."""
+        index = self._index
+        samples: List[Optional[Dict[str, Any]]] = []
+        for client_id in client_ids:
+            row = index.get(str(client_id))
+            if row is None:
+                samples.append(None)
+                continue
+            sample = dict(zip(self.NUMERIC_FIELDS, self.numeric[row].tolist()))
+            sample['engagement'] = self.engagement[row]
+            sample['satisfaccion'] = self.satisfaccion[row]
+            samples.append(sample)
+        return samples
+
+
+class ClientFeatureIndexLoader:
+    """
+    Mantiene en memoria un `ClientFeatureIndex` y lo reconstruye cuando cambian sus archivos.
+
+    Como máximo cada `check_interval` segundos se comparan mtime y tamaño de
+    los archivos de origen; si cambiaron (por ejemplo, tras un
+    `feature_store.py append`) el índice se reconstruye y se reemplaza de forma
+    atómica. Si la reconstrucción falla se sigue sirviendo el índice anterior.
+
+    Args:
+        behavior_csv: CSV de comportamiento de clientes
+        transactions_path: Store `.npz` de agregados (preferido) o CSV de transacciones
+        check_interval: Segundos entre comprobaciones (0 = en cada llamada)
+    """
+
+    def __init__(self, behavior_csv: Path, transactions_path: Path, check_interval: float = 30.0):
+        self.behavior_csv = Path(behavior_csv)
+        self.transactions_path = Path(transactions_path)
+        self.check_interval = check_interval
+        self._index: Optional[ClientFeatureIndex] = None
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def _current_signature(self) -> Tuple:
+        signature = []
+        for path in (self.behavior_csv, self.transactions_path):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                signature.append((str(path), None, None))
+                continue
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get(self) -> ClientFeatureIndex:
+        """
+        Devuelve el índice actual, construyéndolo o reconstruyéndolo si hace falta.
+
+        Raises:
+            FileNotFoundError: Si los archivos no existen y no hay un índice previo
+            ValueError: Si el CSV de comportamiento no tiene las columnas del
+                entrenamiento y no hay un índice previo
+        """
+        index = self._index
+        if index is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return index
+        self.refresh()
+        return self._index
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reconstruye el índice si sus archivos cambiaron (o siempre, con `force`).
+
+        Returns:
+            bool: True si se construyó un índice nuevo
+
+        Raises:
+            FileNotFoundError: Si los archivos no existen y no hay un índice previo
+            ValueError: Si el CSV de comportamiento no tiene las columnas del
+                entrenamiento y no hay un índice previo
+        """
+        with self._lock:
+            signature = self._current_signature()
+            self._checked_at = time.monotonic()
+            if not force and self._index is not None and signature == self._signature:
+                return False
+            start = time.perf_counter()
+            try:
+                index = ClientFeatureIndex.from_files(self.behavior_csv, self.transactions_path)
+            except Exception as e:
+                self.last_error = str(e)
+                if self._index is None:
+                    raise
+                return False
+            self._index = index
+            self._signature = signature
+            self.loads += 1
+            self.load_seconds = time.perf_counter() - start
+            self.last_error = None
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        """Tamaño del índice y datos de la última carga."""
+        index = self._index
+        return {
+            'loaded': index is not None,
+            'clients': len(index) if index is not None else 0,
+            'built_at': index.built_at if index is not None else None,
+            'loads': self.loads,
+            'load_seconds': self.load_seconds,
+            'last_error': self.last_error,
+            'behavior_csv': str(self.behavior_csv),
+            'transactions': str(self.transactions_path)
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Crea o actualiza el store de agregados de transacciones por cliente.")
+    parser.add_argument('command', choices=['build', 'append'],
+                        help="build: crear desde cero; append: absorber transacciones nuevas")
+    parser.add_argument('csv', type=Path, help="CSV de transacciones")
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH, help="Archivo del store (.npz)")
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help="Filas por bloque de lectura")
+    args = parser.parse_args(argv)
+
+    try:
+        store = TransactionAggregateStore() if args.command == 'build' else TransactionAggregateStore.load(args.store)
+        rows = store.update_csv(args.csv, args.chunk_size)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    store.save(args.store)
+    print(f"✅ {rows:,} transacciones absorbidas ({len(store):,} clientes, {store.rows_absorbed:,} en total)")
+    print(f"💾 Store guardado: {args.store}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
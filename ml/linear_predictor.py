@@ -0,0 +1,150 @@
+"""
+Predictor lineal NumPy - Customer Intelligence System
+
+Reproduce `predict_proba` de un LogisticRegression entrenado a partir de sus
+coeficientes e intercepto, sin importar sklearn: es el equivalente para
+modelos lineales de `FlatTreeEnsemble` y lo que guarda el artefacto nativo
+(`ml/model_format.py`) cuando el mejor modelo es lineal.
+"""
+
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# How per-class scores become probabilities, as in sklearn's LogisticRegression
+LINKS = ('binary', 'softmax', 'ovr')
+
+
+class LinearPredictor:
+    """
+    Modelo lineal `X @ coef.T + intercept` con la misma función de enlace que sklearn.
+
+    - `binary`: sigmoide del único score, columnas [1 - p, p]
+    - `softmax`: multinomial
+    - `ovr`: sigmoide por clase normalizada para sumar 1 (one-vs-rest)
+
+    Example:
+        >>> predictor = LinearPredictor.from_sklearn(model)
+        >>> probabilities = predictor.predict_proba(X_scaled)
+    """
+
+    def __init__(
+        self,
+        coef: np.ndarray,
+        intercept: np.ndarray,
+        classes: np.ndarray,
+        link: str,
+        raw_input: bool = False
+    ):
+        if link not in LINKS:
+            raise ValueError(f"Función de enlace desconocida: {link}")
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = classes
+        self.link = link
+        self.n_features_in_ = coef.shape[1]
+        # Coefficients already include the StandardScaler (see `fuse_scaler`)
+        self.raw_input = raw_input
+
+    @staticmethod
+    def supports(model: Any) -> bool:
+        """Indica si `model` es un LogisticRegression que se puede convertir."""
+        from sklearn.linear_model import LogisticRegression
+
+        return isinstance(model, LogisticRegression)
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> 'LinearPredictor':
+        """
+        Copia coeficientes, intercepto y clases de un LogisticRegression.
+
+        Raises:
+            TypeError: Si el modelo no es un LogisticRegression
+        """
+        if not cls.supports(model):
+            raise TypeError(f"Modelo no soportado por LinearPredictor: {type(model).__name__}")
+
+        if len(model.classes_) <= 2:
+            link = 'binary'
+        else:
+            # sklearn < 1.7 could still fit one-vs-rest models for multiclass targets
+            multi_class = getattr(model, 'multi_class', 'auto')
+            ovr = multi_class == 'ovr' or (multi_class in ('auto', 'deprecated') and model.solver == 'liblinear')
+            link = 'ovr' if ovr else 'softmax'
+        return cls(
+            coef=np.array(model.coef_, dtype=np.float64),
+            intercept=np.array(model.intercept_, dtype=np.float64),
+            classes=np.asarray(model.classes_),
+            link=link
+        )
+
+    def fuse_scaler(self, mean: np.ndarray, scale: np.ndarray) -> 'LinearPredictor':
+        """
+        Devuelve una copia que recibe las features sin escalar.
+
+        Con `z = (x - mean) / scale`: `w·z + b = (w / scale)·x + (b - (w / scale)·mean)`.
+
+        Raises:
+            ValueError: Si el predictor ya tiene un scaler incorporado
+        """
+        if self.raw_input:
+            raise ValueError("El predictor ya recibe features sin escalar")
+        coef = self.coef / scale
+        return type(self)(
+            coef=coef,
+            intercept=self.intercept - coef @ mean,
+            classes=self.classes_,
+            link=self.link,
+            raw_input=True
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """Estado serializable del predictor: (escalares para JSON, arrays por nombre)."""
+        meta = {'link': self.link, 'raw_input': self.raw_input, 'classes': self.classes_.tolist()}
+        arrays = {'coef': np.ascontiguousarray(self.coef), 'intercept': np.ascontiguousarray(self.intercept)}
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> 'LinearPredictor':
+        """Reconstruye el predictor a partir de `to_arrays`."""
+        classes = np.asarray(meta['classes'])
+        return cls(
+            coef=arrays['coef'],
+            intercept=arrays['intercept'],
+            classes=classes.astype(object) if classes.dtype.kind == 'U' else classes,
+            link=meta['link'],
+            raw_input=bool(meta.get('raw_input', False))
+        )
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Scores lineales; forma (n,) en el caso binario y (n, n_clases) si no."""
+        scores = X @ self.coef.T + self.intercept
+        return scores.ravel() if self.link == 'binary' else scores
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidades por clase, con la misma forma y orden de columnas que sklearn."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Se esperaban {self.n_features_in_} features, se recibió una matriz de forma {X.shape}"
+            )
+        scores = self.decision_function(X)
+        if self.link == 'softmax':
+            scores = scores - scores.max(axis=1, keepdims=True)
+            exp = np.exp(scores)
+            return exp / exp.sum(axis=1, keepdims=True)
+
+        positive = 1.0 / (1.0 + np.exp(-scores))
+        if self.link == 'binary':
+            return np.column_stack([1.0 - positive, positive])
+        total = positive.sum(axis=1, keepdims=True)
+        all_zero = total[:, 0] == 0.0
+        if all_zero.any():
+            # Every class underflowed to 0: uniform probabilities, as sklearn does
+            positive[all_zero] = 1.0
+            total[all_zero] = positive.shape[1]
+        return positive / total
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Clase predicha (argmax de las probabilidades), como `model.predict`."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
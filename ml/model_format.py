@@ -0,0 +1,225 @@
+"""
+Artefacto nativo de modelo - Customer Intelligence System
+
+Un solo archivo binario con todo lo que el servidor necesita para predecir:
+los arrays del predictor (árboles aplanados o coeficientes, con el
+StandardScaler ya fusionado), la configuración de features
+(`feature_config_*.json`) y el digest de los artefactos joblib de los que se
+exportó. Cargarlo no deserializa objetos de Python ni importa sklearn, así
+que no depende de la versión de sklearn con que se entrenó y tarda
+milisegundos.
+
+Estructura del archivo (enteros little-endian):
+
+    offset  bytes  contenido
+    0       8      magic b'CIMODEL\\0'
+    8       4      versión del formato (uint32)
+    12      4      longitud de la cabecera JSON (uint32)
+    16      32     SHA-256 de todo lo que sigue (cabecera + padding + arrays)
+    48      n      cabecera JSON en UTF-8
+    ...            arrays en orden C, cada uno alineado a 64 bytes
+
+La cabecera describe el predictor (`type` y sus escalares) y, por cada array,
+su dtype, forma y offset dentro de la sección de datos. Los arrays se leen con
+`np.frombuffer` sobre un mmap de solo lectura del archivo: no se copian y
+todos los procesos que cargan el mismo archivo comparten sus páginas.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from ml.linear_predictor import LinearPredictor
+from ml.tree_ensemble import FlatTreeEnsemble
+
+MAGIC = b'CIMODEL\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# magic, format version, header length, SHA-256 of the rest of the file
+_PREAMBLE = struct.Struct('<8sII32s')
+
+# Predictor classes by the `type` stored in the header
+PREDICTOR_TYPES = {
+    'flat_tree_ensemble': FlatTreeEnsemble,
+    'linear': LinearPredictor
+}
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+# ==================== Lectura y escritura ====================
+
+def write_artifact(path: Path, header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> Path:
+    """
+    Escribe `header` (serializable a JSON) y `arrays` en un archivo con el formato nativo.
+
+    El archivo se escribe con otro nombre y se publica con un rename, así que
+    un proceso que tenga mapeada la versión anterior la sigue leyendo intacta.
+
+    Raises:
+        ValueError: Si algún array tiene dtype object (no se puede guardar sin pickle)
+    """
+    path = Path(path)
+    layout: Dict[str, Dict[str, Any]] = {}
+    data_size = 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"El array '{name}' tiene dtype object")
+        data_size = _aligned(data_size)
+        layout[name] = {'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape), 'offset': data_size}
+        data_size += array.nbytes
+
+    header_bytes = json.dumps({**header, 'arrays': layout}, ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(_PREAMBLE.size + len(header_bytes))
+    body = bytearray(data_start - _PREAMBLE.size + data_size)
+    body[:len(header_bytes)] = header_bytes
+    for name, array in arrays.items():
+        start = data_start - _PREAMBLE.size + layout[name]['offset']
+        body[start:start + array.nbytes] = np.ascontiguousarray(array, dtype=layout[name]['dtype']).tobytes()
+
+    preamble = _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes), hashlib.sha256(body).digest())
+    staging = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    with open(staging, 'wb') as f:
+        f.write(preamble)
+        f.write(body)
+    os.replace(staging, path)
+    return path
+
+
+def read_artifact(path: Path, verify: bool = True) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Lee un archivo escrito por `write_artifact`.
+
+    Args:
+        path: Archivo del artefacto
+        verify: Comprobar el SHA-256 (lee el archivo completo una vez)
+
+    Returns:
+        tuple: (cabecera, arrays de solo lectura mapeados sobre el archivo)
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        ValueError: Si no es un artefacto nativo, su versión no es compatible
+            o el checksum no coincide
+    """
+    with open(path, 'rb') as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"Artefacto vacío: {path}")
+    if len(buffer) < _PREAMBLE.size:
+        raise ValueError(f"Artefacto truncado: {path}")
+
+    magic, version, header_size, checksum = _PREAMBLE.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"No es un artefacto de modelo nativo: {path}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de artefacto no soportada: {version}")
+    if verify and hashlib.sha256(memoryview(buffer)[_PREAMBLE.size:]).digest() != checksum:
+        raise ValueError(f"Checksum inválido, el artefacto está corrupto: {path}")
+
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_size]).decode('utf-8'))
+    data_start = _aligned(_PREAMBLE.size + header_size)
+    arrays = {}
+    for name, spec in header.pop('arrays').items():
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(spec['shape'])
+        count = int(np.prod(shape))
+        offset = data_start + spec['offset']
+        if offset + count * dtype.itemsize > len(buffer):
+            raise ValueError(f"Artefacto truncado: {path}")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return header, arrays
+
+
+# ==================== Modelos ====================
+
+@dataclass
+class NativeModel:
+    """Predictor, configuración de features y procedencia cargados de un artefacto nativo."""
+    name: str
+    predictor: Any
+    feature_config: Dict[str, Any]
+    source_digest: str
+    created_at: float
+    path: Path
+
+
+def save_model(
+    path: Path,
+    name: str,
+    predictor: Any,
+    feature_config: Dict[str, Any],
+    source_digest: str
+) -> Path:
+    """
+    Guarda un predictor NumPy y su configuración de features en un artefacto nativo.
+
+    Args:
+        path: Archivo a escribir
+        name: Nombre del modelo ('lead_quality' o 'churn')
+        predictor: `FlatTreeEnsemble` o `LinearPredictor`, normalmente con el
+            scaler fusionado (`raw_input`)
+        feature_config: Contenido de `feature_config_*.json`
+        source_digest: SHA-256 de los artefactos joblib de origen
+
+    Raises:
+        TypeError: Si el predictor no es de un tipo soportado
+
+    Example:
+        >>> save_model(Path('churn_model.cim'), 'churn', predictor, config, digest)
+    """
+    for predictor_type, cls in PREDICTOR_TYPES.items():
+        if isinstance(predictor, cls):
+            break
+    else:
+        raise TypeError(f"Predictor no soportado por el artefacto nativo: {type(predictor).__name__}")
+
+    meta, arrays = predictor.to_arrays()
+    header = {
+        'name': name,
+        'predictor': {'type': predictor_type, **meta},
+        'feature_config': feature_config,
+        'source_digest': source_digest,
+        'created_at': time.time()
+    }
+    return write_artifact(path, header, arrays)
+
+
+def load_model(path: Path, verify: bool = True) -> NativeModel:
+    """
+    Carga un artefacto escrito por `save_model`, sin importar sklearn.
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        ValueError: Si el archivo no es válido (ver `read_artifact`) o el
+            tipo de predictor es desconocido
+
+    Example:
+        >>> native = load_model(Path('ml/models/churn_model.cim'))
+        >>> probabilities = native.predictor.predict_proba(features)
+    """
+    header, arrays = read_artifact(path, verify=verify)
+    meta = header['predictor']
+    cls = PREDICTOR_TYPES.get(meta['type'])
+    if cls is None:
+        raise ValueError(f"Tipo de predictor desconocido: {meta['type']}")
+    return NativeModel(
+        name=header['name'],
+        predictor=cls.from_arrays(meta, arrays),
+        feature_config=header['feature_config'],
+        source_digest=header['source_digest'],
+        created_at=header['created_at'],
+        path=Path(path)
+    )
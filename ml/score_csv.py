@@ -0,0 +1,297 @@
+"""
+Scoring masivo de archivos CSV - Customer Intelligence System
+
+Lee un CSV de leads o de clientes por bloques de tamaño fijo, puntúa los
+bloques en paralelo en un pool de procesos (cada proceso carga los modelos una
+sola vez) y escribe el resultado de forma incremental en CSV o Parquet. La
+memoria usada queda acotada por `chunk_size * max_in_flight` filas, sin
+importar el tamaño del archivo de entrada.
+
+Uso:
+    python ml/score_csv.py leads.csv leads_scored.csv --model lead_quality \\
+        --column urgencia=urgencia_compra
+    python ml/score_csv.py clientes.csv clientes_scored.parquet --model churn --workers 8
+"""
+
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Add project root to path to import ml.utils
+sys.path.insert(0, str(BASE_DIR))
+import ml.utils as ml_utils
+
+# Prediction columns appended to the input rows for each model
+PREDICTION_COLUMNS = {
+    'lead_quality': ['predicted_quality_label', 'predicted_quality_score', 'prob_frio', 'prob_tibio', 'prob_caliente'],
+    'churn': ['churn_probability'],
+}
+
+BATCH_PREDICTORS = {
+    'lead_quality': ml_utils.batch_predict_leads,
+    'churn': ml_utils.batch_predict_churn,
+}
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+# ==================== Scoring por bloque ====================
+
+def _init_worker(model_name: str, models_dir: Optional[str]) -> None:
+    """Inicializador del pool: carga el modelo una vez por proceso."""
+    if models_dir is not None:
+        ml_utils.MODELS_DIR = Path(models_dir)
+    ml_utils.get_model_registry().get(model_name)
+
+
+def score_chunk(model_name: str, chunk: pd.DataFrame, column_map: Dict[str, str]) -> pd.DataFrame:
+    """
+    Puntúa un bloque del CSV y devuelve sus filas con las columnas de predicción añadidas.
+
+    Args:
+        model_name: 'lead_quality' o 'churn'
+        chunk: Bloque de filas tal como se leyó del CSV
+        column_map: Campo del modelo -> columna del CSV, para los campos con otro nombre
+
+    Returns:
+        pd.DataFrame: `chunk` + las columnas de `PREDICTION_COLUMNS[model_name]`
+    """
+    defaults = ml_utils.get_model_registry().get(model_name).encoder.defaults
+
+    # Model fields present in the CSV, under their model name; empty cells fall back to the model defaults
+    sources = {field: column_map.get(field, field) for field in defaults}
+    features = pd.DataFrame(
+        {field: chunk[column] for field, column in sources.items() if column in chunk.columns},
+        index=chunk.index
+    )
+    features = features.fillna({field: defaults[field] for field in features.columns})
+
+    predictions = BATCH_PREDICTORS[model_name](features.to_dict('records'))
+
+    result = chunk.copy()
+    for column in PREDICTION_COLUMNS[model_name]:
+        result[column] = predictions[column].to_numpy()
+    return result
+
+
+# ==================== Escritura incremental ====================
+
+class CSVChunkWriter:
+    """Escribe bloques de un DataFrame en un mismo CSV (cabecera solo en el primero)."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._header = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetChunkWriter:
+    """
+    Escribe bloques de un DataFrame como row groups de un mismo archivo Parquet.
+
+    El esquema lo fija el primer bloque; requiere `pyarrow`.
+
+    Raises:
+        ImportError: Si pyarrow no está instalado
+    """
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "La salida Parquet requiere pyarrow. Instálalo con: pip install pyarrow"
+            ) from e
+        self._pa = pa
+        self._pq = pq
+        self._path = path
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._writer is None:
+            table = self._pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        else:
+            table = self._pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_writer(path: Path, output_format: Optional[str] = None):
+    """Writer incremental según `output_format` o, si es None, según la extensión de `path`."""
+    output_format = output_format or ('parquet' if path.suffix.lower() in ('.parquet', '.pq') else 'csv')
+    if output_format == 'parquet':
+        return ParquetChunkWriter(path)
+    return CSVChunkWriter(path)
+
+
+# ==================== Pipeline ====================
+
+def _ordered_results(
+    chunks: Iterator[pd.DataFrame],
+    model_name: str,
+    column_map: Dict[str, str],
+    workers: int,
+    max_in_flight: int,
+    models_dir: Optional[Path]
+) -> Iterator[pd.DataFrame]:
+    """Puntúa los bloques en paralelo y los entrega en el orden de entrada."""
+    models_dir_arg = str(models_dir) if models_dir is not None else None
+
+    if workers <= 0:
+        _init_worker(model_name, models_dir_arg)
+        for chunk in chunks:
+            yield score_chunk(model_name, chunk, column_map)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(model_name, models_dir_arg)
+    ) as pool:
+        # Only `max_in_flight` chunks are read ahead, which bounds memory
+        in_flight: 'deque[Future]' = deque()
+        for chunk in chunks:
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+            in_flight.append(pool.submit(score_chunk, model_name, chunk, column_map))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def score_csv(
+    input_path: Path,
+    output_path: Path,
+    model_name: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    max_in_flight: Optional[int] = None,
+    column_map: Optional[Dict[str, str]] = None,
+    output_format: Optional[str] = None,
+    models_dir: Optional[Path] = None,
+    sep: str = ','
+) -> int:
+    """
+    Puntúa un CSV completo y escribe el resultado bloque a bloque.
+
+    Args:
+        input_path: CSV de leads o de clientes
+        output_path: Archivo de salida (.csv o .parquet)
+        model_name: 'lead_quality' o 'churn'
+        chunk_size: Filas por bloque
+        workers: Procesos del pool (0 = puntuar en el proceso actual)
+        max_in_flight: Bloques leídos y aún no escritos (por defecto 2 por worker)
+        column_map: Campo del modelo -> columna del CSV
+        output_format: 'csv' o 'parquet' (por defecto, según la extensión de salida)
+        models_dir: Directorio de modelos (por defecto `ml/models`)
+        sep: Separador del CSV de entrada
+
+    Returns:
+        int: Número de filas puntuadas
+
+    Raises:
+        KeyError: Si `model_name` no es un modelo conocido
+        FileNotFoundError: Si el CSV o los modelos no existen
+        ImportError: Si se pide Parquet y pyarrow no está instalado
+    """
+    if model_name not in BATCH_PREDICTORS:
+        raise KeyError(f"Modelo desconocido: {model_name}")
+    column_map = column_map or {}
+    max_in_flight = max_in_flight or 2 * max(1, workers)
+
+    chunks = pd.read_csv(input_path, chunksize=chunk_size, sep=sep)
+    writer = open_writer(output_path, output_format)
+    rows = 0
+    start = time.perf_counter()
+    try:
+        for result in _ordered_results(chunks, model_name, column_map, workers, max_in_flight, models_dir):
+            writer.write(result)
+            rows += len(result)
+            elapsed = time.perf_counter() - start
+            print(f"   • {rows:,} filas ({rows / elapsed:,.0f} filas/s)", file=sys.stderr)
+    finally:
+        writer.close()
+    return rows
+
+
+def _parse_column_map(pairs: Sequence[str]) -> Dict[str, str]:
+    column_map = {}
+    for pair in pairs:
+        field, sep, column = pair.partition('=')
+        if not sep or not field or not column:
+            raise argparse.ArgumentTypeError(f"Mapeo de columna inválido: '{pair}' (usa campo=columna)")
+        column_map[field] = column
+    return column_map
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Puntúa un CSV de leads o clientes por bloques, en paralelo y con memoria acotada."
+    )
+    parser.add_argument('input', type=Path, help="CSV de entrada")
+    parser.add_argument('output', type=Path, help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument('--model', required=True, choices=sorted(BATCH_PREDICTORS), help="Modelo a aplicar")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por bloque")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos del pool (0 = en el proceso actual)")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="Bloques en memoria a la vez (por defecto 2 por worker)")
+    parser.add_argument('--column', action='append', default=[], metavar='CAMPO=COLUMNA',
+                        help="Columna del CSV para un campo del modelo (repetible), p. ej. urgencia=urgencia_compra")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                        help="Formato de salida (por defecto, según la extensión)")
+    parser.add_argument('--models-dir', type=Path, default=None, help="Directorio de modelos")
+    parser.add_argument('--sep', default=',', help="Separador del CSV de entrada")
+    args = parser.parse_args(argv)
+
+    try:
+        column_map = _parse_column_map(args.column)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    print(f"📁 Entrada: {args.input}")
+    print(f"📁 Salida: {args.output}")
+    print(f"🔄 Puntuando con '{args.model}' en bloques de {args.chunk_size:,} filas ({args.workers} workers)...")
+    start = time.perf_counter()
+    try:
+        rows = score_csv(
+            args.input,
+            args.output,
+            args.model,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            column_map=column_map,
+            output_format=args.format,
+            models_dir=args.models_dir,
+            sep=args.sep
+        )
+    except (FileNotFoundError, ImportError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {rows:,} filas puntuadas en {elapsed:.1f}s → {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
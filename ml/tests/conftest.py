@@ -0,0 +1,70 @@
+"""Configuración de pytest para los tests de `ml/`: hace importable el paquete `ml` y define fixtures comunes."""
+
+import json
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+import ml.utils as ml_utils  # noqa: E402
+
+CHURN_FEATURE_CONFIG = {
+    'feature_columns': [
+        'engagement_encoded', 'satisfaccion_encoded', 'dias_ultima_compra', 'total_compras',
+        'promedio_compra', 'num_transacciones', 'std_compra'
+    ],
+    'engagement_map': {'Bajo': 0, 'Medio': 1, 'Alto': 2},
+    'satisfaccion_map': {'Bajo': 0, 'Medio': 1, 'Alto': 2}
+}
+
+
+@pytest.fixture
+def churn_data():
+    """Features de churn sin escalar, con escalas parecidas a las reales (COP, días...), y su etiqueta."""
+    rng = np.random.default_rng(0)
+    n = 400
+    X = np.column_stack([
+        rng.integers(0, 3, n),
+        rng.integers(0, 3, n),
+        rng.integers(1, 365, n),
+        rng.lognormal(16, 1, n).round(2),
+        rng.lognormal(14, 1, n).round(2),
+        rng.integers(1, 40, n),
+        rng.lognormal(13, 1, n).round(2)
+    ]).astype(np.float64)
+    y = ((X[:, 2] > 120) ^ (rng.random(n) < 0.15)).astype(int)
+    return X, y
+
+
+@pytest.fixture
+def write_churn_model(churn_data):
+    """
+    Entrena `model` sobre `churn_data` con un StandardScaler y escribe los
+    artefactos joblib del modelo de churn (y, por defecto, el `.cim`) en un directorio.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    def write(models_dir: Path, model, export_native: bool = True):
+        X, y = churn_data
+        scaler = StandardScaler().fit(X)
+        model.fit(scaler.transform(X), y)
+        model_file, scaler_file, config_file = ml_utils.MODEL_ARTIFACTS['churn']
+        joblib.dump(model, models_dir / model_file)
+        joblib.dump(scaler, models_dir / scaler_file)
+        (models_dir / config_file).write_text(json.dumps(CHURN_FEATURE_CONFIG))
+        if export_native:
+            ml_utils.export_native_model('churn', models_dir)
+        return model, scaler
+
+    return write
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """Registro de modelos nuevo que lee de `tmp_path` y comprueba los archivos en cada llamada."""
+    monkeypatch.setattr(ml_utils, 'MODELS_DIR', tmp_path)
+    return ml_utils.ModelRegistry(check_interval=0.0)
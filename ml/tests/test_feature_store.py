@@ -0,0 +1,182 @@
+"""Tests de ml/feature_store.py: agregados incrementales frente al groupby de entrenamiento e índice por cliente."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.feature_store import ClientFeatureIndex, ClientFeatureIndexLoader, TransactionAggregateStore
+
+
+def make_transactions(n_rows: int = 5000, n_clients: int = 300, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'cliente_id': rng.integers(1, n_clients + 1, n_rows),
+        'monto_cop': rng.lognormal(12, 1.5, n_rows).round(2),
+        'fecha_transaccion': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 700, n_rows), unit='D')
+    })
+
+
+def groupby_features(transactions: pd.DataFrame) -> pd.DataFrame:
+    """Las mismas agregaciones que `build_churn_features` en el entrenamiento."""
+    grouped = transactions.groupby('cliente_id')
+    return pd.DataFrame({
+        'total_compras': grouped['monto_cop'].sum(),
+        'promedio_compra': grouped['monto_cop'].mean(),
+        'num_transacciones': grouped['monto_cop'].count(),
+        'std_compra': grouped['monto_cop'].std(),
+        'fecha_ultima_transaccion': grouped['fecha_transaccion'].max()
+    })
+
+
+def assert_matches_groupby(store: TransactionAggregateStore, transactions: pd.DataFrame) -> None:
+    expected = groupby_features(transactions)
+    actual = store.features(expected.index.tolist()).set_index('cliente_id')
+    np.testing.assert_array_equal(actual['num_transacciones'], expected['num_transacciones'])
+    for column in ('total_compras', 'promedio_compra', 'std_compra'):
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-12, equal_nan=True)
+    np.testing.assert_array_equal(
+        actual['fecha_ultima_transaccion'].to_numpy(), expected['fecha_ultima_transaccion'].to_numpy()
+    )
+
+
+def test_single_update_matches_groupby():
+    transactions = make_transactions()
+    store = TransactionAggregateStore.from_transactions(transactions)
+
+    assert len(store) == transactions['cliente_id'].nunique()
+    assert store.rows_absorbed == len(transactions)
+    assert_matches_groupby(store, transactions)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 97, 1000])
+def test_chunked_updates_match_single_update(chunk_size):
+    transactions = make_transactions(n_rows=2000)
+    single = TransactionAggregateStore.from_transactions(transactions)
+    chunked = TransactionAggregateStore()
+    for start in range(0, len(transactions), chunk_size):
+        chunked.update(transactions.iloc[start:start + chunk_size])
+
+    assert_matches_groupby(chunked, transactions)
+    pd.testing.assert_frame_equal(
+        chunked.features(single._ids), single.features(), check_exact=False, rtol=1e-12
+    )
+
+
+def test_update_csv_matches_groupby(tmp_path):
+    transactions = make_transactions(n_rows=3000)
+    csv_path = tmp_path / 'clientes_transacciones.csv'
+    transactions.to_csv(csv_path, index=False)
+
+    store = TransactionAggregateStore.from_csv(csv_path, chunksize=500)
+
+    assert store.rows_absorbed == len(transactions)
+    assert_matches_groupby(store, pd.read_csv(csv_path, parse_dates=['fecha_transaccion']))
+
+
+def test_nan_amounts_are_skipped_like_groupby():
+    transactions = make_transactions(n_rows=1000, n_clients=50)
+    transactions.loc[transactions.index[::7], 'monto_cop'] = np.nan
+    # A client whose only transactions have no amount
+    only_nan = pd.DataFrame({
+        'cliente_id': [999, 999],
+        'monto_cop': [np.nan, np.nan],
+        'fecha_transaccion': pd.to_datetime(['2024-05-01', '2024-06-01'])
+    })
+    transactions = pd.concat([transactions, only_nan], ignore_index=True)
+
+    store = TransactionAggregateStore()
+    for start in range(0, len(transactions), 128):
+        store.update(transactions.iloc[start:start + 128])
+
+    assert_matches_groupby(store, transactions)
+    row = store.get(999)
+    assert row['num_transacciones'] == 0
+    assert row['total_compras'] == 0.0
+    assert np.isnan(row['promedio_compra']) and np.isnan(row['std_compra'])
+    assert row['fecha_ultima_transaccion'] == pd.Timestamp('2024-06-01')
+
+
+def test_unknown_ids_have_empty_features():
+    store = TransactionAggregateStore.from_transactions(make_transactions(n_clients=20))
+
+    features = store.features([3, 12345, 'x'])
+
+    assert features['cliente_id'].tolist() == [3, 12345, 'x']
+    assert features['num_transacciones'].tolist()[1:] == [0, 0]
+    assert features['total_compras'].tolist()[1:] == [0.0, 0.0]
+    assert features[['promedio_compra', 'std_compra']].iloc[1:].isna().all().all()
+    assert features['fecha_ultima_transaccion'].iloc[1:].isna().all()
+    assert store.get(12345) is None
+
+
+def test_empty_store_features():
+    features = TransactionAggregateStore().features([1, 2])
+
+    assert features['num_transacciones'].tolist() == [0, 0]
+    assert features['promedio_compra'].isna().all()
+
+
+@pytest.mark.parametrize('to_id', [int, lambda client_id: f'C{client_id:04d}'], ids=['int', 'str'])
+def test_save_load_round_trip(tmp_path, to_id):
+    transactions = make_transactions(n_rows=1500, n_clients=80)
+    transactions['cliente_id'] = transactions['cliente_id'].map(to_id)
+    store = TransactionAggregateStore.from_transactions(transactions)
+
+    path = store.save(tmp_path / 'store.npz')
+    loaded = TransactionAggregateStore.load(path)
+
+    assert loaded._ids == store._ids
+    assert loaded.rows_absorbed == store.rows_absorbed
+    pd.testing.assert_frame_equal(loaded.features(), store.features())
+    # The loaded store keeps absorbing updates for old and new clients
+    more = make_transactions(n_rows=300, n_clients=120, seed=11)
+    more['cliente_id'] = more['cliente_id'].map(to_id)
+    loaded.update(more)
+    assert_matches_groupby(loaded, pd.concat([transactions, more], ignore_index=True))
+
+
+def test_load_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TransactionAggregateStore.load(tmp_path / 'missing.npz')
+
+
+def test_client_index_rejects_behavior_csv_without_training_columns(tmp_path):
+    store_path = TransactionAggregateStore.from_transactions(make_transactions(n_clients=5)).save(tmp_path / 'store.npz')
+    behavior_csv = tmp_path / 'clientes_comportamiento.csv'
+    pd.DataFrame({
+        'id_cliente': [1, 2],
+        'engagement': [0.975, 0.417],
+        'satisfaccion': [3, 2],
+        'dias_desde_ultima_compra': [88, 15]
+    }).to_csv(behavior_csv, index=False)
+
+    with pytest.raises(ValueError, match='nivel_engagement'):
+        ClientFeatureIndex.from_files(behavior_csv, store_path)
+    loader = ClientFeatureIndexLoader(behavior_csv, store_path)
+    with pytest.raises(ValueError):
+        loader.get()
+    assert 'Faltan columnas' in loader.status()['last_error']
+
+
+def test_client_index_from_training_behavior_csv(tmp_path):
+    transactions = make_transactions(n_clients=5)
+    store_path = TransactionAggregateStore.from_transactions(transactions).save(tmp_path / 'store.npz')
+    behavior_csv = tmp_path / 'clientes_comportamiento.csv'
+    pd.DataFrame({
+        'cliente_id': [1, 2, 77],
+        'nivel_engagement': ['Alto', 'Bajo', 'Medio'],
+        'nivel_satisfaccion': ['Medio', 'Alto', 'Bajo'],
+        'dias_ultima_compra': [12, 150, 40]
+    }).to_csv(behavior_csv, index=False)
+
+    index = ClientFeatureIndex.from_files(behavior_csv, store_path)
+    first, unknown_client, missing = index.samples([1, '77', 5000])
+
+    expected = groupby_features(transactions).loc[1]
+    assert first['engagement'] == 'Alto' and first['satisfaccion'] == 'Medio'
+    assert first['dias_ultima_compra'] == 12
+    assert first['num_transacciones'] == expected['num_transacciones']
+    assert first['total_compras'] == pytest.approx(expected['total_compras'], rel=1e-12)
+    # Clients without transactions get zeros, as in training
+    assert unknown_client['num_transacciones'] == 0 and unknown_client['std_compra'] == 0
+    assert missing is None
@@ -0,0 +1,139 @@
+"""Tests de `fuse_scaler`: umbrales llevados al espacio original y coeficientes lineales con el scaler incorporado."""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from ml.linear_predictor import LinearPredictor
+from ml.tree_ensemble import FlatTreeEnsemble, _raw_thresholds
+from ml.utils import fuse_scaler
+
+
+def raw_data(n_rows: int = 500, seed: int = 0):
+    """Features con medias grandes y escalas muy distintas, donde los redondeos del scaler importan."""
+    rng = np.random.default_rng(seed)
+    mean = np.array([0.0, 1e8, -3.5e4, 7.25, 1e-3])
+    scale = np.array([1.0, 2.5e6, 1.3e2, 1e-4, 3e-7])
+    X = mean + scale * rng.normal(size=(n_rows, len(mean)))
+    y = (X[:, 1] > 1e8) ^ (X[:, 3] < 7.25) ^ (rng.random(n_rows) < 0.1)
+    return X, y.astype(int)
+
+
+def boundary_rows(fused: FlatTreeEnsemble, unfused: FlatTreeEnsemble, scaler: StandardScaler, base: np.ndarray):
+    """Filas con el feature de cada split exactamente en su umbral y en los floats vecinos."""
+    mean, scale = scaler.mean_, scaler.scale_
+    is_split = unfused.left != np.arange(unfused.n_nodes)
+    rows = []
+    for node in np.flatnonzero(is_split):
+        j = unfused.feature[node]
+        raw = fused.threshold[node]
+        naive = unfused.threshold[node] * scale[j] + mean[j]
+        candidates = [raw, naive]
+        for value in (raw, naive):
+            candidates += [np.nextafter(value, np.inf), np.nextafter(value, -np.inf)]
+            up, down = value, value
+            for _ in range(3):
+                up, down = np.nextafter(up, np.inf), np.nextafter(down, -np.inf)
+            candidates += [up, down]
+        for value in candidates:
+            row = base[node % len(base)].copy()
+            row[j] = value
+            rows.append(row)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize('model', [
+    RandomForestClassifier(n_estimators=10, max_depth=8, random_state=0),
+    GradientBoostingClassifier(n_estimators=20, max_depth=4, random_state=0),
+], ids=['random_forest', 'gradient_boosting'])
+def test_fused_trees_reach_the_same_leaves_at_every_threshold(model):
+    X, y = raw_data()
+    scaler = StandardScaler().fit(X)
+    model.fit(scaler.transform(X), y)
+    unfused = FlatTreeEnsemble.from_sklearn(model)
+
+    fused = fuse_scaler(unfused, scaler)
+
+    assert isinstance(fused, FlatTreeEnsemble) and fused.raw_input
+    X_edges = np.vstack([X, boundary_rows(fused, unfused, scaler, X)])
+    X_scaled = scaler.transform(X_edges)
+    np.testing.assert_array_equal(fused.apply(X_edges), unfused.apply(X_scaled))
+    np.testing.assert_array_equal(fused.predict_proba(X_edges), unfused.predict_proba(X_scaled))
+    np.testing.assert_allclose(fused.predict_proba(X_edges), model.predict_proba(X_scaled), rtol=0, atol=1e-12)
+
+
+def test_raw_threshold_is_the_exact_boundary():
+    rng = np.random.default_rng(3)
+    n = 2000
+    mean = rng.normal(size=n) * 10.0 ** rng.integers(-3, 9, n)
+    scale = np.abs(rng.normal(size=n)) * 10.0 ** rng.integers(-7, 7, n) + 1e-12
+    # sklearn thresholds are midpoints between float32 values, stored as float64
+    threshold = rng.normal(size=n).astype(np.float32).astype(np.float64) * 3 + 0.5 * 2.0 ** -20
+
+    raw = _raw_thresholds(threshold, mean, scale)
+
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32) <= threshold
+
+    assert goes_left(raw).all()
+    assert not goes_left(np.nextafter(raw, np.inf)).any()
+
+
+def test_fuse_trees_without_centering():
+    X, y = raw_data()
+    scaler = StandardScaler(with_mean=False).fit(X)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+    unfused = FlatTreeEnsemble.from_sklearn(model)
+
+    fused = fuse_scaler(unfused, scaler)
+
+    X_edges = np.vstack([X, boundary_rows(fused, unfused, scaler, X)])
+    np.testing.assert_array_equal(fused.apply(X_edges), unfused.apply(scaler.transform(X_edges)))
+
+
+@pytest.mark.parametrize('n_classes', [2, 3], ids=['binary', 'multiclass'])
+def test_logistic_regression_fold(n_classes):
+    X, y = raw_data()
+    if n_classes == 3:
+        y = y + (X[:, 0] > 1)
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+
+    fused = fuse_scaler(model, scaler)
+
+    expected_coef = model.coef_ / scaler.scale_
+    np.testing.assert_allclose(fused.coef_, expected_coef, rtol=1e-15)
+    np.testing.assert_allclose(fused.intercept_, model.intercept_ - expected_coef @ scaler.mean_, rtol=1e-12)
+    # The original model is left untouched
+    assert not np.shares_memory(fused.coef_, model.coef_)
+    np.testing.assert_allclose(
+        fused.predict_proba(X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-9
+    )
+
+
+def test_linear_predictor_fold():
+    X, y = raw_data()
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+    predictor = LinearPredictor.from_sklearn(model)
+
+    fused = fuse_scaler(predictor, scaler)
+
+    assert isinstance(fused, LinearPredictor) and fused.raw_input
+    np.testing.assert_allclose(
+        fused.predict_proba(X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-9
+    )
+
+
+def test_unsupported_combinations_return_none():
+    X, y = raw_data()
+    scaler = StandardScaler().fit(X)
+    forest = RandomForestClassifier(n_estimators=3, random_state=0).fit(scaler.transform(X), y)
+    engine = FlatTreeEnsemble.from_sklearn(forest)
+
+    # Only StandardScaler, only once, and not on sklearn trees
+    assert fuse_scaler(engine, MinMaxScaler().fit(X)) is None
+    assert fuse_scaler(fuse_scaler(engine, scaler), scaler) is None
+    assert fuse_scaler(forest, scaler) is None
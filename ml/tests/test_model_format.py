@@ -0,0 +1,236 @@
+"""Tests del artefacto nativo (`ml/model_format.py`) y de qué predictor sirve el registro según los flags."""
+
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+import ml.utils as ml_utils
+from ml.linear_predictor import LinearPredictor
+from ml.model_format import ALIGNMENT, FORMAT_VERSION, load_model, read_artifact, save_model, write_artifact
+from ml.tree_ensemble import FlatTreeEnsemble
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def served_probabilities(bundle, X):
+    features = bundle.scaler.transform(X) if bundle.scaler is not None else X
+    return bundle.predictor.predict_proba(features)
+
+
+# ==================== Flags y predictor servido ====================
+
+@pytest.mark.parametrize('flat_trees, fuse_scaler, artifact, predictor_type, fused', [
+    (True, True, 'native', FlatTreeEnsemble, True),
+    (False, True, 'joblib', RandomForestClassifier, False),
+    (True, False, 'joblib', FlatTreeEnsemble, False),
+    (False, False, 'joblib', RandomForestClassifier, False),
+])
+def test_tree_model_flags(
+    tmp_path, monkeypatch, registry, write_churn_model, churn_data,
+    flat_trees, fuse_scaler, artifact, predictor_type, fused
+):
+    model, scaler = write_churn_model(tmp_path, RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0))
+    monkeypatch.setattr(ml_utils, 'FLAT_TREES_ENABLED', flat_trees)
+    monkeypatch.setattr(ml_utils, 'FUSE_SCALER_ENABLED', fuse_scaler)
+
+    bundle = registry.get('churn')
+
+    assert bundle.artifact == artifact
+    assert type(bundle.predictor) is predictor_type
+    assert bundle.scaler_fused is fused
+    X, _ = churn_data
+    np.testing.assert_allclose(
+        served_probabilities(bundle, X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize('flat_trees, fuse_scaler, artifact, predictor_type', [
+    (True, True, 'native', LinearPredictor),
+    # ML_FLAT_TREES only concerns tree ensembles
+    (False, True, 'native', LinearPredictor),
+    (True, False, 'joblib', LogisticRegression),
+])
+def test_linear_model_flags(
+    tmp_path, monkeypatch, registry, write_churn_model, churn_data,
+    flat_trees, fuse_scaler, artifact, predictor_type
+):
+    model, scaler = write_churn_model(tmp_path, LogisticRegression())
+    monkeypatch.setattr(ml_utils, 'FLAT_TREES_ENABLED', flat_trees)
+    monkeypatch.setattr(ml_utils, 'FUSE_SCALER_ENABLED', fuse_scaler)
+
+    bundle = registry.get('churn')
+
+    assert bundle.artifact == artifact
+    assert type(bundle.predictor) is predictor_type
+    X, _ = churn_data
+    np.testing.assert_allclose(
+        served_probabilities(bundle, X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-12
+    )
+
+
+def test_native_artifacts_flag(tmp_path, monkeypatch, registry, write_churn_model):
+    write_churn_model(tmp_path, LogisticRegression())
+    monkeypatch.setattr(ml_utils, 'NATIVE_ARTIFACTS_ENABLED', False)
+
+    assert registry.get('churn').artifact == 'joblib'
+
+
+def test_native_only_models_dir_ignores_kill_switches(tmp_path, monkeypatch, registry, write_churn_model):
+    write_churn_model(tmp_path, RandomForestClassifier(n_estimators=5, random_state=0))
+    for filename in ml_utils.MODEL_ARTIFACTS['churn']:
+        (tmp_path / filename).unlink()
+    monkeypatch.setattr(ml_utils, 'FLAT_TREES_ENABLED', False)
+    monkeypatch.setattr(ml_utils, 'FUSE_SCALER_ENABLED', False)
+
+    # Without joblib artifacts there is nothing to fall back to
+    assert registry.get('churn').artifact == 'native'
+
+
+# ==================== Formato del archivo ====================
+
+@pytest.mark.parametrize('model', [
+    RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0),
+    GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0),
+    LogisticRegression(),
+], ids=['random_forest', 'gradient_boosting', 'logistic_regression'])
+def test_round_trip_matches_joblib_model(tmp_path, write_churn_model, churn_data, model):
+    model, scaler = write_churn_model(tmp_path, model)
+
+    native = load_model(tmp_path / ml_utils.NATIVE_MODEL_FILES['churn'])
+
+    X, _ = churn_data
+    assert native.name == 'churn'
+    assert native.predictor.raw_input
+    assert native.feature_config == json.loads((tmp_path / ml_utils.MODEL_ARTIFACTS['churn'][2]).read_text())
+    assert native.source_digest == ml_utils._artifact_digest('churn', tmp_path)
+    np.testing.assert_array_equal(native.predictor.classes_, model.classes_)
+    np.testing.assert_allclose(
+        native.predictor.predict_proba(X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-12
+    )
+
+
+def test_arrays_are_aligned_read_only_views(tmp_path):
+    arrays = {
+        'a': np.arange(5, dtype=np.int32),
+        'b': np.linspace(0, 1, 12).reshape(3, 4),
+        'c': np.array([True, False, True])
+    }
+    path = write_artifact(tmp_path / 'x.cim', {'type': 'test'}, arrays)
+
+    header, loaded = read_artifact(path)
+
+    assert header == {'type': 'test'}
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(loaded[name], array)
+        assert loaded[name].dtype == array.dtype
+        assert not loaded[name].flags.writeable
+        assert loaded[name].ctypes.data % ALIGNMENT == 0
+
+
+def test_object_arrays_and_unknown_predictors_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_artifact(tmp_path / 'x.cim', {}, {'a': np.array(['x', None], dtype=object)})
+    with pytest.raises(TypeError):
+        save_model(tmp_path / 'x.cim', 'churn', LogisticRegression(), {}, 'digest')
+
+
+def corrupt_checksum(path):
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def corrupt_magic(path):
+    data = bytearray(path.read_bytes())
+    data[:8] = b'NOTMODEL'
+    path.write_bytes(bytes(data))
+
+
+def corrupt_version(path):
+    data = bytearray(path.read_bytes())
+    data[8:12] = (FORMAT_VERSION + 1).to_bytes(4, 'little')
+    path.write_bytes(bytes(data))
+
+
+def truncate(path):
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 128])
+
+
+def empty(path):
+    path.write_bytes(b'')
+
+
+@pytest.mark.parametrize('corrupt, message', [
+    (corrupt_checksum, 'Checksum'),
+    (corrupt_magic, 'No es un artefacto'),
+    (corrupt_version, 'Versión'),
+    (truncate, 'Checksum'),
+    (empty, 'vacío'),
+], ids=['checksum', 'magic', 'version', 'truncated', 'empty'])
+def test_corrupted_file_falls_back_to_joblib(tmp_path, registry, write_churn_model, churn_data, corrupt, message):
+    model, scaler = write_churn_model(tmp_path, RandomForestClassifier(n_estimators=5, random_state=0))
+    path = tmp_path / ml_utils.NATIVE_MODEL_FILES['churn']
+    corrupt(path)
+
+    with pytest.raises(ValueError, match=message):
+        load_model(path)
+    assert ml_utils._load_native_model('churn') is None
+    bundle = registry.get('churn')
+    assert bundle.artifact != 'native'
+    X, _ = churn_data
+    np.testing.assert_allclose(
+        served_probabilities(bundle, X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-12
+    )
+
+
+def test_truncated_arrays_are_detected_without_checksum(tmp_path, write_churn_model):
+    write_churn_model(tmp_path, RandomForestClassifier(n_estimators=5, random_state=0))
+    path = tmp_path / ml_utils.NATIVE_MODEL_FILES['churn']
+    truncate(path)
+
+    with pytest.raises(ValueError, match='truncado'):
+        load_model(path, verify=False)
+
+
+def test_stale_source_digest_falls_back_to_joblib(tmp_path, registry, write_churn_model, churn_data):
+    write_churn_model(tmp_path, LogisticRegression())
+    # Retrained without exporting: the .cim still describes the previous model
+    model, scaler = write_churn_model(tmp_path, LogisticRegression(C=0.01), export_native=False)
+
+    assert ml_utils._load_native_model('churn') is None
+    bundle = registry.get('churn')
+    assert bundle.artifact == 'joblib'
+    X, _ = churn_data
+    np.testing.assert_allclose(
+        served_probabilities(bundle, X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-12
+    )
+
+
+def test_native_load_does_not_import_sklearn(tmp_path, write_churn_model):
+    write_churn_model(tmp_path, GradientBoostingClassifier(n_estimators=10, random_state=0))
+    script = textwrap.dedent(f"""
+        import sys
+        from pathlib import Path
+        sys.path.insert(0, {str(REPO_ROOT)!r})
+        import ml.utils as ml_utils
+        ml_utils.MODELS_DIR = Path({str(tmp_path)!r})
+        bundle = ml_utils.ModelRegistry().get('churn')
+        assert bundle.artifact == 'native', bundle.artifact
+        bundle.predictor.predict_proba(bundle.encoder.transform([{{
+            'engagement': 'Medio', 'satisfaccion': 'Alto', 'dias_ultima_compra': 45,
+            'total_compras': 5e7, 'promedio_compra': 1e7, 'num_transacciones': 5
+        }}]))
+        print(sorted(name for name in sys.modules if name.split('.')[0] == 'sklearn'))
+    """)
+
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == '[]'
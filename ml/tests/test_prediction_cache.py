@@ -0,0 +1,174 @@
+"""Tests de PredictionCache: aciertos, fallos, expiración, LRU e invalidación al recargar el modelo."""
+
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import ml.utils as ml_utils
+from ml.utils import PredictionCache
+
+CLIENT = {
+    'engagement': 'Medio',
+    'satisfaccion': 'Alto',
+    'dias_ultima_compra': 45,
+    'total_compras': 50000000,
+    'promedio_compra': 10000000,
+    'num_transacciones': 5,
+    'std_compra': 2000000
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ml_utils.time, 'monotonic', fake)
+    return fake
+
+
+def key(i: int, version: int = 1) -> bytes:
+    return PredictionCache.make_key(np.array([float(i), 2.0, 3.0]), version)
+
+
+def test_hit_and_miss():
+    cache = PredictionCache(max_size=10)
+
+    assert cache.get(key(1)) is None
+    cache.put(key(1), {'churn_probability': 0.25})
+
+    assert cache.get(key(1)) == {'churn_probability': 0.25}
+    # Same features under another model version is a different entry
+    assert cache.get(key(1, version=2)) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 1)
+    assert stats['hit_rate'] == 0.3333
+
+
+def test_ttl_expiry(clock):
+    cache = PredictionCache(max_size=10, ttl=60)
+    cache.put(key(1), 'a')
+
+    clock.now += 59
+    assert cache.get(key(1)) == 'a'
+    clock.now += 1
+    assert cache.get(key(1)) is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_no_ttl_never_expires(clock):
+    cache = PredictionCache(max_size=10)
+    cache.put(key(1), 'a')
+
+    clock.now += 10 ** 9
+    assert cache.get(key(1)) == 'a'
+
+
+def test_lru_eviction():
+    cache = PredictionCache(max_size=2)
+    cache.put(key(1), 'a')
+    cache.put(key(2), 'b')
+    cache.get(key(1))  # key(2) becomes the least recently used
+    cache.put(key(3), 'c')
+
+    assert cache.get(key(2)) is None
+    assert cache.get(key(1)) == 'a' and cache.get(key(3)) == 'c'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PredictionCache(max_size=0)
+    cache.put(key(1), 'a')
+
+    assert not cache.enabled
+    assert cache.get(key(1)) is None
+
+
+# ==================== Caché de churn y recarga del modelo ====================
+
+def write_churn_model(models_dir, coef_sign: float = 1.0) -> None:
+    """Escribe un modelo de churn mínimo (LogisticRegression + scaler + config) en `models_dir`."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 7))
+    y = (coef_sign * X[:, 2] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression().fit(scaler.transform(X), y)
+    model_file, scaler_file, config_file = ml_utils.MODEL_ARTIFACTS['churn']
+    joblib.dump(model, models_dir / model_file)
+    joblib.dump(scaler, models_dir / scaler_file)
+    (models_dir / config_file).write_text(json.dumps({
+        'feature_columns': [
+            'engagement_encoded', 'satisfaccion_encoded', 'dias_ultima_compra', 'total_compras',
+            'promedio_compra', 'num_transacciones', 'std_compra'
+        ],
+        'engagement_map': {'Bajo': 0, 'Medio': 1, 'Alto': 2},
+        'satisfaccion_map': {'Bajo': 0, 'Medio': 1, 'Alto': 2}
+    }))
+
+
+@pytest.fixture
+def churn_models(tmp_path, monkeypatch):
+    write_churn_model(tmp_path)
+    registry = ml_utils.get_model_registry()
+    monkeypatch.setattr(ml_utils, 'MODELS_DIR', tmp_path)
+    monkeypatch.setattr(ml_utils, '_churn_cache', PredictionCache(max_size=100))
+    monkeypatch.setattr(registry, 'check_interval', 0.0)
+    registry.invalidate('churn')
+    yield tmp_path
+    registry.invalidate('churn')
+
+
+def test_churn_predictions_are_cached(churn_models):
+    cache = ml_utils.get_churn_cache()
+
+    first = ml_utils.predict_churn(CLIENT)
+    second = ml_utils.predict_churn(CLIENT)
+
+    assert first == second
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Callers get copies of the cached entry
+    second['churn_probability'] = -1.0
+    assert ml_utils.predict_churn(CLIENT) == first
+
+
+def test_registry_reload_clears_churn_cache(churn_models):
+    cache = ml_utils.get_churn_cache()
+    before = ml_utils.predict_churn(CLIENT)
+    version = ml_utils.get_model_registry().get('churn').version
+    invalidations = cache.stats()['invalidations']
+    assert cache.stats()['size'] == 1
+
+    # Retrain with the opposite relationship and make sure the mtime moves
+    write_churn_model(churn_models, coef_sign=-1.0)
+    model_path = churn_models / ml_utils.MODEL_ARTIFACTS['churn'][0]
+    stat = model_path.stat()
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    after = ml_utils.predict_churn(CLIENT)
+
+    assert ml_utils.get_model_registry().get('churn').version == version + 1
+    assert cache.stats()['invalidations'] == invalidations + 1
+    assert cache.stats()['size'] == 1
+    assert after != before
+
+
+def test_registry_invalidate_clears_churn_cache(churn_models):
+    cache = ml_utils.get_churn_cache()
+    ml_utils.predict_churn(CLIENT)
+
+    ml_utils.get_model_registry().invalidate('lead_quality')
+    assert cache.stats()['size'] == 1
+    ml_utils.get_model_registry().invalidate('churn')
+    assert cache.stats()['size'] == 0
@@ -0,0 +1,40 @@
+"""Tests de las etapas de entrenamiento que afectan a los artefactos servidos."""
+
+import json
+
+import numpy as np
+import pytest
+
+from ml import train_leads_and_churn as training
+
+
+@pytest.mark.parametrize('candidates', [training.lead_candidates, training.churn_candidates])
+def test_served_models_are_single_threaded(candidates, churn_data):
+    X, y = churn_data
+
+    for model in candidates(n_jobs=-1).values():
+        fitted = training.fit_for_serving(model, X, y)
+        # Serving runs one prediction per inference thread in each worker
+        assert fitted.get_params().get('n_jobs') in (None, 1)
+        assert np.all(np.isfinite(fitted.predict_proba(X)))
+
+
+def test_default_search_spaces_are_valid():
+    training.validate_search_spaces(training.SearchSettings().spaces)
+
+
+@pytest.mark.parametrize('spaces, message', [
+    ({'ventas': {}}, "Modelo desconocido"),
+    ({'churn': {}}, "vacío"),
+    ({'churn': {'svm': {'C': [1.0]}}}, "Candidato desconocido"),
+    ({'leads': {'Random Forest': {'profundidad': [3]}}}, "Parámetros desconocidos"),
+    ({'leads': {'Random Forest': {'max_depth': []}}}, "lista de valores no vacía"),
+])
+def test_invalid_search_space_is_rejected_before_training(spaces, message, tmp_path, capsys):
+    space_path = tmp_path / 'space.json'
+    space_path.write_text(json.dumps(spaces), encoding='utf-8')
+
+    with pytest.raises(SystemExit):
+        training.main(['--search', '--search-space', str(space_path), '--data-dir', str(tmp_path / 'sin-datos')])
+
+    assert message in capsys.readouterr().err
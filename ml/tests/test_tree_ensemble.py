@@ -0,0 +1,162 @@
+"""Tests de FlatTreeEnsemble: equivalencia con sklearn, árboles mapeados en memoria y fallback a sklearn."""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+import ml.utils as ml_utils
+from ml.tree_ensemble import FlatTreeEnsemble
+
+MODELS = {
+    'random_forest': lambda: RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0),
+    'extra_trees': lambda: ExtraTreesClassifier(n_estimators=15, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingClassifier(n_estimators=25, max_depth=3, random_state=0),
+}
+
+
+def classification_data(n_classes: int, n_rows: int = 600, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 6)) * [1, 10, 1e3, 1e6, 0.01, 1]
+    score = X[:, 0] + X[:, 1] / 10 - X[:, 2] / 1e3 + rng.normal(scale=0.5, size=n_rows)
+    y = np.digitize(score, np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1]))
+    return X, y
+
+
+@pytest.mark.parametrize('n_classes', [2, 3], ids=['binary', 'multiclass'])
+@pytest.mark.parametrize('kind', sorted(MODELS))
+def test_matches_sklearn_predict_proba(kind, n_classes):
+    X, y = classification_data(n_classes)
+    model = MODELS[kind]().fit(X[:400], y[:400])
+
+    engine = FlatTreeEnsemble.from_sklearn(model)
+
+    X_test = np.vstack([X[400:], np.random.default_rng(1).normal(size=(200, 6)) * 1e3])
+    np.testing.assert_array_equal(engine.classes_, model.classes_)
+    np.testing.assert_allclose(engine.predict_proba(X_test), model.predict_proba(X_test), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(engine.predict(X_test), model.predict(X_test))
+
+
+def test_string_classes_and_chunking():
+    X, y = classification_data(3)
+    labels = np.array(['frío', 'tibio', 'caliente'])[y]
+    model = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, labels)
+    engine = FlatTreeEnsemble.from_sklearn(model)
+
+    np.testing.assert_allclose(
+        engine.predict_proba(X, chunk_size=64), model.predict_proba(X), rtol=0, atol=1e-12
+    )
+    np.testing.assert_array_equal(engine.predict(X), model.predict(X))
+
+
+@pytest.mark.parametrize('kind', ['random_forest', 'extra_trees'])
+def test_missing_values_follow_sklearn(kind):
+    X, y = classification_data(2)
+    X[np.random.default_rng(2).random(X.shape) < 0.1] = np.nan
+    model = MODELS[kind]().fit(X, y)
+
+    engine = FlatTreeEnsemble.from_sklearn(model)
+
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+
+
+def test_unsupported_models():
+    X, y = classification_data(2)
+    X = X[:, [0, 5]]
+    assert not FlatTreeEnsemble.supports(LogisticRegression().fit(X, y))
+    assert not FlatTreeEnsemble.supports(GradientBoostingClassifier(init=LogisticRegression()).fit(X, y))
+    with pytest.raises(TypeError):
+        FlatTreeEnsemble.from_sklearn(LogisticRegression().fit(X, y))
+
+
+def test_wrong_feature_count():
+    X, y = classification_data(2)
+    engine = FlatTreeEnsemble.from_sklearn(MODELS['random_forest']().fit(X, y))
+
+    with pytest.raises(ValueError):
+        engine.predict_proba(X[:, :3])
+
+
+def test_save_and_mmap_load(tmp_path):
+    X, y = classification_data(3)
+    model = MODELS['gradient_boosting']().fit(X, y)
+    engine = FlatTreeEnsemble.from_sklearn(model)
+
+    engine.save(tmp_path / 'engine')
+    mapped = FlatTreeEnsemble.load(tmp_path / 'engine', mmap_mode='r')
+    in_memory = FlatTreeEnsemble.load(tmp_path / 'engine', mmap_mode=None)
+
+    assert mapped.mapped_from == tmp_path / 'engine'
+    assert in_memory.mapped_from is None
+    for loaded in (mapped, in_memory):
+        np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
+
+
+# ==================== Árboles mapeados en ml/models/flat_trees ====================
+
+@pytest.fixture
+def without_native(monkeypatch):
+    monkeypatch.setattr(ml_utils, 'NATIVE_ARTIFACTS_ENABLED', False)
+
+
+def test_exported_flat_trees_are_memory_mapped(tmp_path, registry, write_churn_model, churn_data, without_native):
+    model, scaler = write_churn_model(tmp_path, MODELS['random_forest'](), export_native=False)
+
+    path = ml_utils.export_flat_trees('churn', tmp_path)
+
+    digest = ml_utils._artifact_digest('churn', tmp_path)
+    assert path == tmp_path / ml_utils.FLAT_TREES_DIR / f"churn-{digest[:16]}-fused"
+    bundle = registry.get('churn')
+    assert bundle.artifact == 'flat_trees'
+    assert bundle.memory_mapped and bundle.predictor.mapped_from == path
+    X, _ = churn_data
+    np.testing.assert_allclose(
+        bundle.predictor.predict_proba(X), model.predict_proba(scaler.transform(X)), rtol=0, atol=1e-12
+    )
+
+
+def test_first_load_exports_flat_trees(tmp_path, registry, write_churn_model, without_native):
+    write_churn_model(tmp_path, MODELS['random_forest'](), export_native=False)
+
+    first = registry.get('churn')
+
+    digest = ml_utils._artifact_digest('churn', tmp_path)
+    assert first.artifact == 'joblib'
+    assert first.predictor.mapped_from == ml_utils._flat_trees_path('churn', digest)
+    # Another process loading the same artifacts maps the exported arrays
+    assert ml_utils.ModelRegistry(check_interval=0.0).get('churn').artifact == 'flat_trees'
+
+
+def test_retraining_replaces_previous_flat_trees(tmp_path, write_churn_model, without_native):
+    write_churn_model(tmp_path, MODELS['random_forest'](), export_native=False)
+    old = ml_utils.export_flat_trees('churn', tmp_path)
+    write_churn_model(tmp_path, RandomForestClassifier(n_estimators=7, random_state=1), export_native=False)
+
+    new = ml_utils.export_flat_trees('churn', tmp_path)
+
+    assert new != old and new.exists() and not old.exists()
+    assert sorted(p.name for p in (tmp_path / ml_utils.FLAT_TREES_DIR).iterdir()) == [new.name]
+
+
+def test_failed_equivalence_check_serves_sklearn(
+    tmp_path, monkeypatch, registry, write_churn_model, churn_data, without_native
+):
+    model, scaler = write_churn_model(tmp_path, MODELS['random_forest'](), export_native=False)
+    from_sklearn = FlatTreeEnsemble.from_sklearn
+
+    def broken_from_sklearn(model):
+        engine = from_sklearn(model)
+        engine.value = engine.value[:, ::-1].copy()
+        return engine
+
+    monkeypatch.setattr(FlatTreeEnsemble, 'from_sklearn', staticmethod(broken_from_sklearn))
+
+    assert ml_utils.export_flat_trees('churn', tmp_path) is None
+    bundle = registry.get('churn')
+    assert bundle.predictor is bundle.model
+    assert isinstance(bundle.predictor, RandomForestClassifier)
+    assert not (tmp_path / ml_utils.FLAT_TREES_DIR).exists()
+    X, _ = churn_data
+    np.testing.assert_array_equal(
+        bundle.predictor.predict_proba(bundle.scaler.transform(X)), model.predict_proba(scaler.transform(X))
+    )
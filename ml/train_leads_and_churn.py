@@ -1,59 +1,730 @@
-import pandas as pd
-import numpy as np
+"""
+Entrenamiento de modelos - Customer Intelligence System
+
+Pipeline de entrenamiento de los modelos de calidad de leads y de churn,
+organizado en etapas: carga (load), construcción de features (features),
+entrenamiento (fit), evaluación (evaluate), reporte (report) y exportación
+(export).
+
+La salida de cada etapa se guarda en `ml/.cache/`, indexada por el hash de sus
+entradas (para load, la ruta, el tamaño y la fecha de modificación de cada CSV
+según `file_signature`, más su esquema; para las demás, la salida de la etapa
+anterior y los hiperparámetros; en todas, el código de la etapa y de los
+módulos del pipeline). Al volver a ejecutar, las etapas cuyas entradas no
+cambiaron se leen de la caché: cambiar un hiperparámetro solo repite fit,
+evaluate, report y export.
+
+Con `--search`, antes de fit se ejecuta una etapa search: búsqueda de
+hiperparámetros por successive halving que optimiza la métrica de CV
+penalizada por la latencia de predecir una sola fila (ver
+`successive_halving_search`). La configuración elegida se guarda junto a los
+artefactos en `<modelo>_search.json`.
+
+Uso:
+    python ml/train_leads_and_churn.py               # ambos modelos, con gráficos
+    python ml/train_leads_and_churn.py --headless    # sin gráficos (no importa matplotlib)
+    python ml/train_leads_and_churn.py --only churn --no-cache
+    python ml/train_leads_and_churn.py --search --latency-budget-ms 0.5
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import math
+import os
+import sys
+import time
+import warnings
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from sklearn.model_selection import train_test_split, cross_val_score
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import (
-    classification_report, 
-    confusion_matrix, 
-    roc_auc_score, 
+    classification_report,
+    confusion_matrix,
+    roc_auc_score,
     roc_curve,
     precision_score,
     recall_score,
     f1_score,
-    accuracy_score
+    accuracy_score,
+    get_scorer
 )
-import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
-import json
-import warnings
-warnings.filterwarnings('ignore')
+from sklearn.model_selection import train_test_split, ParameterSampler, StratifiedKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE_DIR / "public" / "data"
 MODELS_DIR = Path(__file__).resolve().parent / "models"
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
 
-# Create models directory if it doesn't exist
-MODELS_DIR.mkdir(exist_ok=True)
-
-print("=" * 70)
-print("ENTRENAMIENTO DE MODELOS - CUSTOMER INTELLIGENCE SYSTEM")
-print("=" * 70)
-print(f"\n📁 Directorio base: {BASE_DIR}")
-print(f"📁 Directorio de datos: {DATA_DIR}")
-print(f"📁 Directorio de modelos: {MODELS_DIR}")
-
-# ============================================================================
-# 1. MODELO DE CALIDAD DE LEADS (LEAD SCORING)
-# ============================================================================
-print("\n" + "=" * 70)
-print("[1/2] MODELO DE CALIDAD DE LEADS (LEAD SCORING)")
-print("=" * 70)
-
-leads_csv = DATA_DIR / "leads_historicos.csv"
-if not leads_csv.exists():
-    print(f"\n⚠️  No se encontró {leads_csv}")
-    print("   Por favor, asegúrate de que el archivo existe en public/data/")
-    print("   Saltando entrenamiento del modelo de leads...")
-else:
-    # Load data
-    leads_df = pd.read_csv(leads_csv)
-    print(f"\n✅ Cargados {len(leads_df)} leads históricos")
-    print(f"   Columnas: {list(leads_df.columns)}")
+# Add project root to path to import ml.utils
+sys.path.insert(0, str(BASE_DIR))
+import ml.utils as ml_utils
+from ml.datasets import (
+    BEHAVIOR_SCHEMA, LEADS_SCHEMA, TRANSACTIONS_SCHEMA, file_signature, map_categories, read_table
+)
+from ml.feature_store import DEFAULT_STORE_PATH, TransactionAggregateStore
+
+# Cross-validation folds per candidate and parallel jobs (-1 = all cores)
+CV_FOLDS = int(os.environ.get('ML_TRAIN_CV_FOLDS', '5'))
+N_JOBS = int(os.environ.get('ML_TRAIN_N_JOBS', '-1'))
+
+# Hyperparameter search (--search): configurations sampled per candidate, fraction kept per
+# successive-halving round and rows of the smallest round
+SEARCH_CANDIDATES = int(os.environ.get('ML_SEARCH_CANDIDATES', '16'))
+SEARCH_FACTOR = int(os.environ.get('ML_SEARCH_FACTOR', '3'))
+SEARCH_MIN_RESOURCES = int(os.environ.get('ML_SEARCH_MIN_RESOURCES', '200'))
+
+# Single-row latency the search aims for, and objective points lost per budget exceeded
+LATENCY_BUDGET_MS = float(os.environ.get('ML_SEARCH_LATENCY_BUDGET_MS', '1.0'))
+LATENCY_WEIGHT = float(os.environ.get('ML_SEARCH_LATENCY_WEIGHT', '0.1'))
+LATENCY_REPEATS = 200
+
+
+# ==================== Caché de etapas ====================
+
+def file_digest(path: Path) -> str:
+    """SHA-256 del contenido de un archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Bump to invalidate every cached stage (e.g. after a change the source digest can't see)
+CACHE_VERSION = 1
+
+# Modules whose code the stages run, directly or through helpers (compare_models, encoders,
+# schemas, the aggregate store, exporters): editing any of them invalidates every stage
+PIPELINE_SOURCES = [
+    Path(__file__).resolve(),
+    *(Path(__file__).resolve().parent / name for name in (
+        'utils.py', 'datasets.py', 'feature_store.py', 'tree_ensemble.py', 'linear_predictor.py', 'model_format.py'
+    ))
+]
+
+
+def _pipeline_digest() -> str:
+    """Digest del código del pipeline y de la versión de sklearn (las etapas guardan modelos sklearn)."""
+    import sklearn
+
+    digest = hashlib.sha256(repr((CACHE_VERSION, sklearn.__version__)).encode('utf-8'))
+    for path in PIPELINE_SOURCES:
+        digest.update(file_digest(path).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Caché en disco de la salida de cada etapa del pipeline.
+
+    La clave de una etapa es el hash del código del pipeline
+    (`PIPELINE_SOURCES`, `CACHE_VERSION`), del código fuente de la etapa y de
+    `key_parts` (claves de las etapas anteriores, hiperparámetros, hashes de
+    archivos), así que editar la etapa, los helpers que usa o cualquiera de
+    sus entradas invalida la entrada.
+
+    Example:
+        >>> cache = StageCache(CACHE_DIR)
+        >>> leads_df, key = cache.run('leads-load', load_leads, [file_signature(csv)], csv)
+    """
+
+    def __init__(self, root: Path, enabled: bool = True):
+        self.root = root
+        self.enabled = enabled
+        self.code_digest = _pipeline_digest()
+
+    def key(self, fn: Callable, key_parts: Sequence[Any]) -> str:
+        digest = hashlib.sha256(self.code_digest.encode('utf-8'))
+        digest.update(inspect.getsource(fn).encode('utf-8'))
+        for part in key_parts:
+            digest.update(b'\0')
+            digest.update(repr(part).encode('utf-8'))
+        return digest.hexdigest()[:24]
+
+    def run(
+        self,
+        stage: str,
+        fn: Callable,
+        key_parts: Sequence[Any],
+        *args: Any,
+        is_valid: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, str]:
+        """
+        Devuelve la salida cacheada de `stage` o la calcula con `fn(*args)` y la guarda.
+
+        Args:
+            stage: Nombre de la etapa (prefijo del archivo de caché)
+            fn: Función de la etapa
+            key_parts: Todo lo que determina la salida además del código de `fn`
+            is_valid: Comprobación extra de una salida cacheada (p. ej. que los
+                archivos que describe sigan existiendo)
+
+        Returns:
+            tuple: (salida de la etapa, clave de la etapa)
+        """
+        key = self.key(fn, key_parts)
+        path = self.root / f"{stage}-{key}.joblib"
+
+        if self.enabled and path.exists():
+            try:
+                result = joblib.load(path)
+            except Exception:
+                result = None
+            else:
+                if is_valid is None or is_valid(result):
+                    print(f"   ♻️  {stage}: sin cambios, usando caché")
+                    return result, key
+
+        start = time.perf_counter()
+        result = fn(*args)
+        print(f"   ⏱️  {stage}: {time.perf_counter() - start:.2f}s")
+
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so an interrupted run never leaves a truncated entry
+            tmp_path = path.with_suffix('.tmp')
+            joblib.dump(result, tmp_path)
+            os.replace(tmp_path, path)
+            for stale in self.root.glob(f"{stage}-*.joblib"):
+                if stale != path:
+                    stale.unlink(missing_ok=True)
+        return result, key
+
+
+def _outputs_unchanged(digests: Dict[str, str]) -> bool:
+    """True si todos los archivos existen y conservan el contenido registrado."""
+    return all(Path(path).exists() and file_digest(Path(path)) == digest for path, digest in digests.items())
+
+
+def _params_key(candidates: Dict[str, Any]) -> Dict[str, Any]:
+    """Hiperparámetros de los candidatos que afectan al resultado (no incluye n_jobs)."""
+    return {
+        name: sorted((param, repr(value)) for param, value in model.get_params().items() if param != 'n_jobs')
+        for name, model in candidates.items()
+    }
+
+
+# ==================== Comparación de modelos ====================
+
+def _fit_and_score_fold(name, estimator, X, y, train_idx, test_idx, scoring):
+    """Entrena y puntúa un candidato en un fold; devuelve también su tiempo de pared y de CPU."""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    estimator.fit(X[train_idx], y[train_idx])
+    scores = {metric: get_scorer(metric)(estimator, X[test_idx], y[test_idx]) for metric in scoring}
+    return name, scores, time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def compare_models(candidates, X, y, scoring, cv_folds=CV_FOLDS, n_jobs=N_JOBS):
+    """
+    Evalúa todos los candidatos con validación cruzada estratificada, en paralelo.
+
+    Cada par (candidato, fold) es una tarea independiente de joblib, así que
+    todos los cores trabajan a la vez. El scaler se ajusta dentro de cada fold
+    para no filtrar información del fold de validación.
+
+    Args:
+        candidates: Dict nombre -> estimador sin entrenar
+        X, y: Datos de entrenamiento sin escalar
+        scoring: Lista de métricas de sklearn (p. ej. ['accuracy', 'f1_macro'])
+        cv_folds: Número de folds
+        n_jobs: Tareas en paralelo (-1 = todos los cores)
+
+    Returns:
+        tuple: (resultados por candidato, segundos de pared de toda la evaluación).
+            Cada resultado tiene 'scores' (métrica -> (media, desviación)),
+            'wall_seconds' y 'cpu_seconds' sumados sobre sus folds.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    folds = list(StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42).split(X, y))
+
+    tasks = []
+    for name, model in candidates.items():
+        estimator = clone(model)
+        # Parallelism comes from running folds concurrently; avoid oversubscribing cores
+        if 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=1)
+        for train_idx, test_idx in folds:
+            pipeline = make_pipeline(StandardScaler(), clone(estimator))
+            tasks.append(delayed(_fit_and_score_fold)(name, pipeline, X, y, train_idx, test_idx, scoring))
+
+    start = time.perf_counter()
+    fold_results = Parallel(n_jobs=n_jobs)(tasks)
+    elapsed = time.perf_counter() - start
+
+    results = {name: {'fold_scores': {metric: [] for metric in scoring}, 'wall_seconds': 0.0, 'cpu_seconds': 0.0}
+               for name in candidates}
+    for name, scores, wall_seconds, cpu_seconds in fold_results:
+        for metric, score in scores.items():
+            results[name]['fold_scores'][metric].append(score)
+        results[name]['wall_seconds'] += wall_seconds
+        results[name]['cpu_seconds'] += cpu_seconds
+    for result in results.values():
+        fold_scores = result.pop('fold_scores')
+        result['scores'] = {metric: (float(np.mean(values)), float(np.std(values))) for metric, values in fold_scores.items()}
+
+    return results, elapsed
+
+
+def print_comparison(results, elapsed):
+    """Imprime las métricas de validación cruzada y el tiempo de cada candidato."""
+    for name, result in results.items():
+        metrics = ", ".join(f"{metric}={mean:.3f}±{std:.3f}" for metric, (mean, std) in result['scores'].items())
+        print(f"   • {name}: {metrics} | pared={result['wall_seconds']:.2f}s, CPU={result['cpu_seconds']:.2f}s")
+    sequential = sum(result['wall_seconds'] for result in results.values())
+    print(f"   ⏱️  Evaluación en paralelo: {elapsed:.2f}s de pared ({sequential:.2f}s si fuera secuencial)")
+
+
+def fit_for_serving(model: Any, X: np.ndarray, y: np.ndarray) -> Any:
+    """
+    Entrena `model` con todos los cores y lo deja con `n_jobs=1` para servirlo.
+
+    El servidor ya ejecuta una predicción por thread de inferencia en cada
+    worker; un `n_jobs=-1` guardado en el modelo repartiría cada
+    `predict_proba` entre todos los cores del host.
+    """
+    model.fit(X, y)
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+    return model
+
+
+def split_train_test(features: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Separación train/test (80/20 estratificada) común a las etapas search y fit."""
+    # Plain arrays: serving scales NumPy matrices, so the scaler must not record feature names
+    return train_test_split(
+        features['X'].to_numpy(dtype=np.float64), features['y'].to_numpy(),
+        test_size=0.2, random_state=42, stratify=features['y']
+    )
+
+
+# ==================== Búsqueda de hiperparámetros ====================
+
+# Search space per model and candidate: parameter -> values sampled from
+LEAD_SEARCH_SPACE = {
+    'Logistic Regression': {
+        'C': [0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0]
+    },
+    'Random Forest': {
+        'n_estimators': [50, 100, 200, 300],
+        'max_depth': [4, 6, 8, 10, 12, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': ['sqrt', 0.5, None]
+    }
+}
+CHURN_SEARCH_SPACE = {
+    'Random Forest': {
+        'n_estimators': [50, 100, 150, 300],
+        'max_depth': [4, 6, 8, 10, None],
+        'min_samples_leaf': [1, 2, 4, 8],
+        'max_features': ['sqrt', 0.5, None]
+    },
+    'Gradient Boosting': {
+        'n_estimators': [50, 100, 150, 250],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4, 5],
+        'subsample': [0.7, 0.85, 1.0],
+        'min_samples_leaf': [1, 5, 20]
+    }
+}
+
+
+@dataclass
+class SearchSettings:
+    """
+    Configuración de la búsqueda de hiperparámetros.
+
+    Args:
+        spaces: Espacio por modelo ('leads', 'churn'): candidato -> parámetro -> valores
+        n_candidates: Configuraciones muestreadas por candidato
+        factor: En cada ronda sigue 1/`factor` de las configuraciones, con `factor` veces más filas
+        min_resources: Filas de la primera ronda (como mínimo)
+        latency_budget_ms: Latencia objetivo de una predicción de una fila
+        latency_weight: Puntos de la métrica que se restan por cada presupuesto excedido
+    """
+    spaces: Dict[str, Dict[str, Dict[str, List[Any]]]] = field(
+        default_factory=lambda: {'leads': LEAD_SEARCH_SPACE, 'churn': CHURN_SEARCH_SPACE}
+    )
+    n_candidates: int = SEARCH_CANDIDATES
+    factor: int = SEARCH_FACTOR
+    min_resources: int = SEARCH_MIN_RESOURCES
+    latency_budget_ms: float = LATENCY_BUDGET_MS
+    latency_weight: float = LATENCY_WEIGHT
+
+
+def measure_latency_ms(model: Any, scaler: Any, row: np.ndarray, repeats: int = LATENCY_REPEATS) -> float:
+    """
+    Mediana en ms de predecir una fila sin escalar como lo hace el servidor.
+
+    El modelo se convierte al predictor NumPy del artefacto nativo con el
+    scaler fusionado; si no se puede, se mide scaler + modelo sklearn.
+    """
+    predictor = ml_utils.build_numpy_predictor(model) or model
+    fused = ml_utils.fuse_scaler(predictor, scaler)
+    if fused is not None:
+        predict = lambda: fused.predict_proba(row)
+    else:
+        predict = lambda: predictor.predict_proba(scaler.transform(row))
+
+    predict()
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        predict()
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings) * 1000)
 
+
+def latency_objective(score: float, latency_ms: float, budget_ms: float, weight: float) -> float:
+    """`score - weight * max(0, latency / budget - 1)`: dentro del presupuesto solo cuenta la métrica."""
+    return score - weight * max(0.0, latency_ms / budget_ms - 1.0)
+
+
+def _search_fold(index, pipeline, X, y, train_idx, test_idx, metric, measure_latency):
+    """Entrena y puntúa una configuración en un fold; en el primer fold mide además su latencia."""
+    _, scores, wall_seconds, _ = _fit_and_score_fold(index, pipeline, X, y, train_idx, test_idx, [metric])
+    latency_ms = measure_latency_ms(pipeline[-1], pipeline[0], X[test_idx[:1]]) if measure_latency else None
+    return index, scores[metric], latency_ms, wall_seconds
+
+
+def validate_search_spaces(spaces: Dict[str, Any]) -> None:
+    """
+    Comprueba un espacio de búsqueda antes de entrenar.
+
+    Raises:
+        ValueError: Si nombra modelos, candidatos o parámetros desconocidos,
+            o algún parámetro no tiene una lista de valores no vacía
+    """
+    base_candidates = {'leads': lead_candidates(), 'churn': churn_candidates()}
+    for model, space in spaces.items():
+        if model not in base_candidates:
+            raise ValueError(f"Modelo desconocido en el espacio de búsqueda: {model} (usa 'leads' o 'churn')")
+        if not isinstance(space, dict):
+            raise ValueError(f"El espacio de '{model}' debe ser un objeto candidato -> parámetros")
+        if not space:
+            raise ValueError(f"El espacio de búsqueda de '{model}' está vacío")
+        for name, family_space in space.items():
+            if name not in base_candidates[model]:
+                raise ValueError(f"Candidato desconocido en el espacio de búsqueda de '{model}': {name}")
+            if not isinstance(family_space, dict):
+                raise ValueError(f"Los parámetros de {name} deben ser un objeto parámetro -> valores")
+            unknown = set(family_space) - set(base_candidates[model][name].get_params())
+            if unknown:
+                raise ValueError(f"Parámetros desconocidos para {name}: {sorted(unknown)}")
+            for param, values in family_space.items():
+                if not isinstance(values, list) or not values:
+                    raise ValueError(f"{name}.{param} debe ser una lista de valores no vacía")
+
+
+def _sample_configurations(base_candidates: Dict[str, Any], space: Dict[str, Dict[str, List[Any]]], n_candidates: int) -> List[Dict[str, Any]]:
+    """Muestrea hasta `n_candidates` configuraciones distintas por candidato de un espacio ya validado."""
+    configurations = []
+    for name, family_space in space.items():
+        with warnings.catch_warnings():
+            # Spaces smaller than n_candidates are enumerated entirely (sklearn warns about it)
+            warnings.simplefilter('ignore', UserWarning)
+            sampled = ParameterSampler(family_space, n_iter=n_candidates, random_state=42)
+            configurations.extend({'candidate': name, 'params': params} for params in sampled)
+    return configurations
+
+
+def successive_halving_search(
+    base_candidates: Dict[str, Any],
+    space: Dict[str, Dict[str, List[Any]]],
+    X: np.ndarray,
+    y: np.ndarray,
+    metric: str,
+    settings: SearchSettings,
+    cv_folds: int = CV_FOLDS,
+    n_jobs: int = N_JOBS
+) -> Dict[str, Any]:
+    """
+    Búsqueda aleatoria de hiperparámetros con successive halving, en paralelo.
+
+    Se muestrean `settings.n_candidates` configuraciones por candidato. Cada
+    ronda evalúa las configuraciones vivas con CV estratificada sobre un
+    subconjunto estratificado de las filas y conserva la mejor
+    1/`settings.factor` según el objetivo; la siguiente ronda usa `factor`
+    veces más filas y la última, todas. Como en `compare_models`, cada par
+    (configuración, fold) es una tarea de joblib y el scaler se ajusta dentro
+    del fold.
+
+    El objetivo es la métrica media de CV penalizada por la latencia de
+    predecir una fila con el predictor que usaría el servidor
+    (`latency_objective`). La latencia se mide en el primer fold de cada
+    configuración, mientras otras tareas ocupan los demás cores, así que
+    tiende a sobrestimarse; sirve para comparar configuraciones entre sí.
+
+    Args:
+        base_candidates: Dict nombre -> estimador base (los parámetros no buscados se conservan)
+        space: Candidato -> parámetro -> lista de valores (validado con `validate_search_spaces`)
+        X, y: Datos de entrenamiento sin escalar
+        metric: Métrica de sklearn a maximizar (p. ej. 'accuracy', 'roc_auc')
+        settings: Tamaño de la búsqueda y presupuesto de latencia
+        cv_folds: Folds por ronda
+        n_jobs: Tareas en paralelo (-1 = todos los cores)
+
+    Returns:
+        dict: 'best' (candidato, parámetros, métrica, latencia y objetivo),
+            'rounds' con los resultados de cada ronda ordenados por objetivo,
+            la métrica y los segundos de pared
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    configurations = _sample_configurations(base_candidates, space, settings.n_candidates)
+
+    # Rounds so that the last one, on all rows, has between 1 and `factor` configurations
+    n_rounds = 1
+    while settings.factor ** n_rounds <= len(configurations):
+        n_rounds += 1
+
+    start = time.perf_counter()
+    survivors = list(range(len(configurations)))
+    rounds = []
+    for round_index in range(n_rounds):
+        n_resources = int(len(y) / settings.factor ** (n_rounds - 1 - round_index))
+        n_resources = min(len(y), max(n_resources, settings.min_resources))
+        rows = np.arange(len(y))
+        if n_resources < len(y):
+            rows, _ = train_test_split(rows, train_size=n_resources, random_state=42 + round_index, stratify=y)
+        X_round, y_round = X[rows], y[rows]
+        folds = list(StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42).split(X_round, y_round))
+
+        tasks = []
+        for index in survivors:
+            estimator = clone(base_candidates[configurations[index]['candidate']])
+            estimator.set_params(**configurations[index]['params'])
+            # Parallelism comes from running tasks concurrently; avoid oversubscribing cores
+            if 'n_jobs' in estimator.get_params():
+                estimator.set_params(n_jobs=1)
+            for fold_index, (train_idx, test_idx) in enumerate(folds):
+                pipeline = make_pipeline(StandardScaler(), clone(estimator))
+                tasks.append(delayed(_search_fold)(
+                    index, pipeline, X_round, y_round, train_idx, test_idx, metric, fold_index == 0
+                ))
+
+        scores = {index: [] for index in survivors}
+        latencies = {}
+        for index, score, latency_ms, _ in Parallel(n_jobs=n_jobs)(tasks):
+            scores[index].append(score)
+            if latency_ms is not None:
+                latencies[index] = latency_ms
+
+        results = []
+        for index in survivors:
+            score = float(np.mean(scores[index]))
+            results.append({
+                'config_id': index,
+                **configurations[index],
+                'score': score,
+                'score_std': float(np.std(scores[index])),
+                'latency_ms': latencies[index],
+                'objective': latency_objective(
+                    score, latencies[index], settings.latency_budget_ms, settings.latency_weight
+                )
+            })
+        results.sort(key=lambda result: -result['objective'])
+        rounds.append({'n_resources': n_resources, 'n_configurations': len(survivors), 'results': results})
+        survivors = [result['config_id'] for result in results[:math.ceil(len(survivors) / settings.factor)]]
+
+    return {
+        'metric': metric,
+        'best': rounds[-1]['results'][0],
+        'rounds': rounds,
+        'elapsed_seconds': time.perf_counter() - start
+    }
+
+
+def print_search(search: Dict[str, Any]) -> None:
+    """Imprime el resumen de cada ronda y la configuración elegida."""
+    metric = search['metric']
+    for round_results in search['rounds']:
+        top = round_results['results'][0]
+        print(f"   • {round_results['n_configurations']} configuraciones con {round_results['n_resources']:,} filas | "
+              f"mejor: {top['candidate']} {metric}={top['score']:.3f}, {top['latency_ms']:.3f}ms")
+    best = search['best']
+    params = ", ".join(f"{param}={value!r}" for param, value in sorted(best['params'].items()))
+    print(f"   🏆 {best['candidate']} ({params})")
+    print(f"      {metric}={best['score']:.3f}±{best['score_std']:.3f}, latencia={best['latency_ms']:.3f}ms, "
+          f"objetivo={best['objective']:.3f}")
+    print(f"   ⏱️  Búsqueda: {search['elapsed_seconds']:.1f}s de pared")
+
+
+def search_stage(
+    features: Dict[str, Any],
+    base_candidates: Dict[str, Any],
+    space: Dict[str, Dict[str, List[Any]]],
+    metric: str,
+    settings: SearchSettings,
+    cv_folds: int,
+    n_jobs: int
+) -> Dict[str, Any]:
+    """Etapa search: busca hiperparámetros sobre el mismo set de entrenamiento que usa fit."""
+    X_train, _, y_train, _ = split_train_test(features)
+    n_configurations = len(_sample_configurations(base_candidates, space, settings.n_candidates))
+    print(f"\n🔎 Buscando hiperparámetros ({n_configurations} configuraciones, successive halving "
+          f"x{settings.factor}, presupuesto {settings.latency_budget_ms}ms por fila)...")
+    search = successive_halving_search(base_candidates, space, X_train, y_train, metric, settings, cv_folds, n_jobs)
+    search['space'] = space
+    search['settings'] = {key: value for key, value in asdict(settings).items() if key != 'spaces'}
+    return search
+
+
+def tuned_candidates(base_candidates: Dict[str, Any], search: Dict[str, Any]) -> Dict[str, Any]:
+    """El candidato elegido por la búsqueda, con sus hiperparámetros, como único candidato de fit."""
+    best = search['best']
+    return {best['candidate']: clone(base_candidates[best['candidate']]).set_params(**best['params'])}
+
+
+def write_search_report(name: str, search: Optional[Dict[str, Any]], fit: Dict[str, Any], models_dir: Path) -> Optional[Path]:
+    """
+    Guarda `<name>_search.json` con la configuración elegida y el detalle de la búsqueda.
+
+    La latencia del modelo final (reentrenado con todo el set de entrenamiento)
+    se mide aquí, sin otras tareas en paralelo. Sin búsqueda se borra el
+    archivo de una ejecución anterior, que describiría otro modelo.
+    """
+    path = models_dir / f"{name}_search.json"
+    if search is None:
+        path.unlink(missing_ok=True)
+        return None
+
+    row = fit['scaler'].inverse_transform(fit['X_test_scaled'][:1])
+    latency_ms = measure_latency_ms(fit['model'], fit['scaler'], row)
+    settings = search['settings']
+    report = {
+        'model': name,
+        'metric': search['metric'],
+        'chosen': {
+            'candidate': search['best']['candidate'],
+            'params': search['best']['params'],
+            'cv_score': search['best']['score'],
+            'cv_score_std': search['best']['score_std'],
+            'search_latency_ms': search['best']['latency_ms'],
+            'objective': search['best']['objective'],
+            'latency_ms': latency_ms,
+            'within_budget': latency_ms <= settings['latency_budget_ms']
+        },
+        'settings': settings,
+        'space': search['space'],
+        'rounds': search['rounds'],
+        'elapsed_seconds': search['elapsed_seconds']
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"   💾 Búsqueda guardada: {path} (latencia del modelo final: {latency_ms:.3f}ms)")
+    return path
+
+
+# ==================== Gráficos ====================
+
+def _pyplot():
+    """Importa matplotlib/seaborn solo cuando se generan gráficos."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def _save_figure(plt, path: Path) -> str:
+    plt.tight_layout()
+    plt.savefig(path, dpi=150)
+    plt.close()
+    print(f"   💾 Guardado: {path}")
+    return str(path)
+
+
+def plot_confusion_matrix(cm: np.ndarray, labels: List[str], title: str, cmap: str, path: Path) -> str:
+    plt, sns = _pyplot()
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap=cmap, xticklabels=labels, yticklabels=labels)
+    plt.title(title, fontsize=14, fontweight='bold')
+    plt.xlabel('Predicción')
+    plt.ylabel('Real')
+    return _save_figure(plt, path)
+
+
+def plot_feature_importance(features: List[str], importances: np.ndarray, title: str, palette: str, path: Path) -> str:
+    plt, sns = _pyplot()
+    plt.figure(figsize=(10, 6))
+    feature_importance = pd.DataFrame({
+        'feature': features,
+        'importance': importances
+    }).sort_values('importance', ascending=False)
+
+    sns.barplot(data=feature_importance, x='importance', y='feature', palette=palette)
+    plt.title(title, fontsize=14, fontweight='bold')
+    plt.xlabel('Importancia')
+    plt.ylabel('Feature')
+    return _save_figure(plt, path)
+
+
+def plot_roc_curve(y_true: np.ndarray, y_proba: np.ndarray, auc: float, title: str, path: Path) -> str:
+    plt, _ = _pyplot()
+    plt.figure(figsize=(8, 6))
+    fpr, tpr, _ = roc_curve(y_true, y_proba)
+    plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (AUC = {auc:.3f})')
+    plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--', label='Random')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.05])
+    plt.xlabel('False Positive Rate')
+    plt.ylabel('True Positive Rate')
+    plt.title(title, fontsize=14, fontweight='bold')
+    plt.legend(loc="lower right")
+    plt.grid(alpha=0.3)
+    return _save_figure(plt, path)
+
+
+def plot_probability_distribution(y_true: np.ndarray, y_proba: np.ndarray, title: str, path: Path) -> str:
+    plt, _ = _pyplot()
+    plt.figure(figsize=(10, 6))
+    plt.hist(y_proba[y_true == 0], bins=30, alpha=0.6, label='No Churn', color='green')
+    plt.hist(y_proba[y_true == 1], bins=30, alpha=0.6, label='Churn', color='red')
+    plt.xlabel('Probabilidad de Churn')
+    plt.ylabel('Frecuencia')
+    plt.title(title, fontsize=14, fontweight='bold')
+    plt.legend()
+    plt.grid(alpha=0.3)
+    return _save_figure(plt, path)
+
+
+def _plots_exist(paths: List[str]) -> bool:
+    return all(Path(path).exists() for path in paths)
+
+
+# ==================== 1. Modelo de calidad de leads ====================
+
+LEAD_LABELS = ['Frío', 'Tibio', 'Caliente']
+
+
+def load_leads(leads_csv: Path) -> pd.DataFrame:
+    """Etapa load: lee el histórico de leads con su esquema (ver `ml/datasets.py`)."""
+    return read_table(leads_csv, LEADS_SCHEMA)
+
+
+def build_lead_features(leads_df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Etapa features: codifica los leads.
+
+    Returns:
+        dict: 'X', 'y', 'feature_columns', la configuración de features que se
+            exporta con el modelo ('feature_config') y la distribución de calidad
+    """
     presupuesto_map = {
         'Menos de 5M': 2.5,
         '5M-10M': 7.5,
@@ -72,155 +743,277 @@ else:
     tipo_servicio_encoder = LabelEncoder()
     ciudad_encoder = LabelEncoder()
 
-    leads_df['presupuesto_numeric'] = leads_df['presupuesto'].map(presupuesto_map)
-    leads_df['urgencia_numeric'] = leads_df['urgencia'].map(urgencia_map)
+    leads_df = leads_df.copy()
+    leads_df['presupuesto_numeric'] = map_categories(leads_df['presupuesto'], presupuesto_map)
+    leads_df['urgencia_numeric'] = map_categories(leads_df['urgencia'], urgencia_map)
     leads_df['tipo_servicio_encoded'] = tipo_servicio_encoder.fit_transform(leads_df['tipo_servicio'])
     leads_df['ciudad_encoded'] = ciudad_encoder.fit_transform(leads_df['ciudad'])
 
     calidad_map = {'Alta': 2, 'Media': 1, 'Baja': 0}
-    leads_df['calidad_encoded'] = leads_df['calidad'].map(calidad_map)
+    leads_df['calidad_encoded'] = map_categories(leads_df['calidad'], calidad_map)
 
-    # Features
     feature_cols_leads = ['presupuesto_numeric', 'urgencia_numeric', 'tipo_servicio_encoded', 'ciudad_encoded']
-    X_leads = leads_df[feature_cols_leads]
-    y_leads = leads_df['calidad_encoded']
 
-    print(f"\n📊 Distribución de calidad:")
-    print(leads_df['calidad'].value_counts())
+    feature_config_leads = {
+        'feature_columns': feature_cols_leads,
+        'presupuesto_map': presupuesto_map,
+        'urgencia_map': urgencia_map,
+        'tipo_servicio_classes': tipo_servicio_encoder.classes_.tolist(),
+        'ciudad_classes': ciudad_encoder.classes_.tolist(),
+        # Precomputed category -> code lookups so serving encodes in O(1)
+        'tipo_servicio_index': {value: i for i, value in enumerate(tipo_servicio_encoder.classes_.tolist())},
+        'ciudad_index': {value: i for i, value in enumerate(ciudad_encoder.classes_.tolist())},
+        'calidad_map': calidad_map,
+        'calidad_reverse_map': {v: k for k, v in calidad_map.items()}
+    }
 
-    # Split data
-    X_train_leads, X_test_leads, y_train_leads, y_test_leads = train_test_split(
-        X_leads, y_leads, test_size=0.2, random_state=42, stratify=y_leads
-    )
+    return {
+        'X': leads_df[feature_cols_leads],
+        'y': leads_df['calidad_encoded'],
+        'feature_columns': feature_cols_leads,
+        'feature_config': feature_config_leads,
+        'distribution': leads_df['calidad'].value_counts()
+    }
 
-    # Scale features
-    scaler_leads = StandardScaler()
-    X_train_leads_scaled = scaler_leads.fit_transform(X_train_leads)
-    X_test_leads_scaled = scaler_leads.transform(X_test_leads)
 
-    print("\n🔄 Comparando modelos...")
-    
-    models_to_compare = {
-        'Logistic Regression': LogisticRegression(max_iter=1000, random_state=42, multi_class='multinomial'),
+def lead_candidates(n_jobs: int = N_JOBS) -> Dict[str, Any]:
+    """Modelos candidatos para calidad de leads."""
+    return {
+        'Logistic Regression': LogisticRegression(max_iter=1000, random_state=42),
         'Random Forest': RandomForestClassifier(
             n_estimators=100,
             max_depth=10,
             min_samples_split=5,
             random_state=42,
-            class_weight='balanced'
+            class_weight='balanced',
+            n_jobs=n_jobs
         )
     }
 
-    best_model = None
-    best_score = 0
-    best_name = ""
 
-    for name, model in models_to_compare.items():
-        model.fit(X_train_leads_scaled, y_train_leads)
-        score = accuracy_score(y_test_leads, model.predict(X_test_leads_scaled))
-        f1 = f1_score(y_test_leads, model.predict(X_test_leads_scaled), average='macro')
-        print(f"   • {name}: Accuracy={score:.3f}, F1-macro={f1:.3f}")
-        
-        if score > best_score:
-            best_score = score
-            best_model = model
-            best_name = name
+def fit_leads(features: Dict[str, Any], candidates: Dict[str, Any], cv_folds: int, n_jobs: int) -> Dict[str, Any]:
+    """
+    Etapa fit: separa train/test, compara los candidatos con CV y reentrena el mejor.
+
+    Returns:
+        dict: 'model', 'scaler', 'best_name', 'cv_results' y el set de test escalado
+    """
+    X_train_leads, X_test_leads, y_train_leads, y_test_leads = split_train_test(features)
+
+    # Scale features
+    scaler_leads = StandardScaler()
+    X_train_leads_scaled = scaler_leads.fit_transform(X_train_leads)
+    X_test_leads_scaled = scaler_leads.transform(X_test_leads)
+
+    print(f"\n🔄 Comparando modelos ({cv_folds}-fold CV en paralelo)...")
+    cv_results_leads, cv_elapsed = compare_models(
+        candidates, X_train_leads, y_train_leads, ['accuracy', 'f1_macro'], cv_folds=cv_folds, n_jobs=n_jobs
+    )
+    print_comparison(cv_results_leads, cv_elapsed)
+
+    best_name = max(cv_results_leads, key=lambda name: cv_results_leads[name]['scores']['accuracy'][0])
+    model_leads = fit_for_serving(clone(candidates[best_name]), X_train_leads_scaled, y_train_leads)
+
+    return {
+        'model': model_leads,
+        'scaler': scaler_leads,
+        'best_name': best_name,
+        'cv_results': cv_results_leads,
+        'X_test_scaled': X_test_leads_scaled,
+        'y_test': np.asarray(y_test_leads)
+    }
+
+
+def evaluate_leads(fit: Dict[str, Any]) -> Dict[str, Any]:
+    """Etapa evaluate: métricas del modelo elegido sobre el set de test."""
+    y_test_leads = fit['y_test']
+    y_pred_leads = fit['model'].predict(fit['X_test_scaled'])
+    return {
+        'accuracy': accuracy_score(y_test_leads, y_pred_leads),
+        'f1_macro': f1_score(y_test_leads, y_pred_leads, average='macro'),
+        'classification_report': classification_report(y_test_leads, y_pred_leads, target_names=LEAD_LABELS),
+        'confusion_matrix': confusion_matrix(y_test_leads, y_pred_leads)
+    }
+
+
+def report_leads(fit: Dict[str, Any], evaluation: Dict[str, Any], feature_columns: List[str], models_dir: Path) -> List[str]:
+    """Etapa report: guarda los gráficos del modelo de leads y devuelve sus rutas."""
+    paths = [plot_confusion_matrix(
+        evaluation['confusion_matrix'], LEAD_LABELS,
+        f"Matriz de Confusión - Modelo de Leads ({fit['best_name']})", 'Blues',
+        models_dir / 'lead_quality_confusion_matrix.png'
+    )]
+    if hasattr(fit['model'], 'feature_importances_'):
+        paths.append(plot_feature_importance(
+            feature_columns, fit['model'].feature_importances_,
+            'Importancia de Features - Modelo de Leads', 'viridis',
+            models_dir / 'lead_quality_feature_importance.png'
+        ))
+    return paths
+
+
+def _export_flat_trees(name: str, models_dir: Path) -> List[Path]:
+    """Exporta los arrays aplanados de `name` (para servirlos mapeados en memoria) y devuelve sus archivos."""
+    directory = ml_utils.export_flat_trees(name, models_dir)
+    if directory is None:
+        return []
+    print(f"   💾 Árboles aplanados (memory-mapped) guardados: {directory}")
+    return sorted(directory.iterdir())
+
+
+def _export_native_model(name: str, models_dir: Path) -> List[Path]:
+    """Exporta el artefacto nativo de `name` (carga sin sklearn) y devuelve su archivo."""
+    path = ml_utils.export_native_model(name, models_dir)
+    if path is None:
+        print(f"   ⚠️  {name}: el modelo no se puede exportar al formato nativo; se servirá desde joblib")
+        return []
+    print(f"   💾 Artefacto nativo guardado: {path}")
+    return [path]
+
+
+def export_leads(
+    fit: Dict[str, Any],
+    feature_config: Dict[str, Any],
+    models_dir: Path,
+    search: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """
+    Etapa export: guarda modelo, scaler, configuración, tabla precalculada y,
+    si hubo búsqueda, la configuración elegida.
+
+    Returns:
+        dict: Ruta -> SHA-256 de cada archivo escrito
+    """
+    models_dir.mkdir(parents=True, exist_ok=True)
+    paths = [
+        models_dir / 'lead_quality_model.joblib',
+        models_dir / 'lead_quality_scaler.joblib',
+        models_dir / 'feature_config_leads.json'
+    ]
+    joblib.dump(fit['model'], paths[0])
+    joblib.dump(fit['scaler'], paths[1])
+    with open(paths[2], 'w', encoding='utf-8') as f:
+        json.dump(feature_config, f, indent=2, ensure_ascii=False)
+
+    print(f"   💾 Modelo guardado: {paths[0]}")
+    print(f"   💾 Scaler guardado: {paths[1]}")
+    print(f"   💾 Config guardado: {paths[2]}")
+
+    # Precompute probabilities for every input combination so serving skips sklearn
+    lookup_path = ml_utils.export_lead_lookup_table(models_dir)
+    if lookup_path is not None:
+        paths.append(lookup_path)
+        print(f"   💾 Tabla precalculada guardada: {lookup_path}")
+    else:
+        print("   ⚠️  Demasiadas combinaciones para la tabla precalculada; se usará el modelo directamente")
+
+    paths.extend(_export_flat_trees('lead_quality', models_dir))
+    paths.extend(_export_native_model('lead_quality', models_dir))
+
+    search_path = write_search_report('lead_quality', search, fit, models_dir)
+    if search_path is not None:
+        paths.append(search_path)
+    return {str(path): file_digest(path) for path in paths}
+
+
+def train_leads(
+    data_dir: Path,
+    models_dir: Path,
+    cache: StageCache,
+    headless: bool = False,
+    cv_folds: int = CV_FOLDS,
+    n_jobs: int = N_JOBS,
+    search_settings: Optional[SearchSettings] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Ejecuta el pipeline del modelo de calidad de leads (con búsqueda de
+    hiperparámetros si se pasa `search_settings`).
 
-    print(f"\n✅ Mejor modelo: {best_name} (Accuracy: {best_score:.3f})")
-    model_leads = best_model
+    Returns:
+        dict: Salidas de las etapas fit y evaluate, o None si falta el CSV
+    """
+    print("\n" + "=" * 70)
+    print("[1/2] MODELO DE CALIDAD DE LEADS (LEAD SCORING)")
+    print("=" * 70)
 
-    y_pred_leads = model_leads.predict(X_test_leads_scaled)
-    accuracy_leads = accuracy_score(y_test_leads, y_pred_leads)
-    f1_macro_leads = f1_score(y_test_leads, y_pred_leads, average='macro')
+    leads_csv = data_dir / "leads_historicos.csv"
+    if not leads_csv.exists():
+        print(f"\n⚠️  No se encontró {leads_csv}")
+        print("   Por favor, asegúrate de que el archivo existe en public/data/")
+        print("   Saltando entrenamiento del modelo de leads...")
+        return None
 
+    leads_df, load_key = cache.run(
+        'leads-load', load_leads, [file_signature(leads_csv), LEADS_SCHEMA], leads_csv
+    )
+    print(f"\n✅ Cargados {len(leads_df)} leads históricos")
+    print(f"   Columnas: {list(leads_df.columns)}")
+
+    features, features_key = cache.run('leads-features', build_lead_features, [load_key], leads_df)
+    print(f"\n📊 Distribución de calidad:")
+    print(features['distribution'])
+
+    candidates = lead_candidates(n_jobs)
+    search, search_key = None, None
+    if search_settings is not None:
+        space = search_settings.spaces.get('leads', {})
+        search, search_key = cache.run(
+            'leads-search', search_stage,
+            [features_key, _params_key(candidates), space, asdict(search_settings), cv_folds],
+            features, candidates, space, 'accuracy', search_settings, cv_folds, n_jobs
+        )
+        print_search(search)
+        candidates = tuned_candidates(candidates, search)
+
+    fit, fit_key = cache.run(
+        'leads-fit', fit_leads, [features_key, _params_key(candidates), cv_folds],
+        features, candidates, cv_folds, n_jobs
+    )
+    print(f"\n✅ Mejor modelo: {fit['best_name']} "
+          f"(Accuracy CV: {fit['cv_results'][fit['best_name']]['scores']['accuracy'][0]:.3f})")
+
+    evaluation, evaluation_key = cache.run('leads-evaluate', evaluate_leads, [fit_key], fit)
     print(f"\n📈 Métricas finales:")
-    print(f"   • Accuracy: {accuracy_leads:.3f}")
-    print(f"   • F1-Score (macro): {f1_macro_leads:.3f}")
+    print(f"   • Accuracy: {evaluation['accuracy']:.3f}")
+    print(f"   • F1-Score (macro): {evaluation['f1_macro']:.3f}")
     print(f"\n📋 Classification Report:")
-    print(classification_report(y_test_leads, y_pred_leads, target_names=['Frío', 'Tibio', 'Caliente']))
+    print(evaluation['classification_report'])
 
-    plt.figure(figsize=(8, 6))
-    cm_leads = confusion_matrix(y_test_leads, y_pred_leads)
-    sns.heatmap(cm_leads, annot=True, fmt='d', cmap='Blues', 
-                xticklabels=['Frío', 'Tibio', 'Caliente'],
-                yticklabels=['Frío', 'Tibio', 'Caliente'])
-    plt.title(f'Matriz de Confusión - Modelo de Leads ({best_name})', fontsize=14, fontweight='bold')
-    plt.xlabel('Predicción')
-    plt.ylabel('Real')
-    plt.tight_layout()
-    plt.savefig(MODELS_DIR / 'lead_quality_confusion_matrix.png', dpi=150)
-    print(f"   💾 Guardado: {MODELS_DIR / 'lead_quality_confusion_matrix.png'}")
-    plt.close()
+    if not headless:
+        cache.run(
+            'leads-report', report_leads, [evaluation_key, str(models_dir)],
+            fit, evaluation, features['feature_columns'], models_dir, is_valid=_plots_exist
+        )
 
-    if hasattr(model_leads, 'feature_importances_'):
-        plt.figure(figsize=(10, 6))
-        feature_importance = pd.DataFrame({
-            'feature': feature_cols_leads,
-            'importance': model_leads.feature_importances_
-        }).sort_values('importance', ascending=False)
-
-        sns.barplot(data=feature_importance, x='importance', y='feature', palette='viridis')
-        plt.title('Importancia de Features - Modelo de Leads', fontsize=14, fontweight='bold')
-        plt.xlabel('Importancia')
-        plt.ylabel('Feature')
-        plt.tight_layout()
-        plt.savefig(MODELS_DIR / 'lead_quality_feature_importance.png', dpi=150)
-        print(f"   💾 Guardado: {MODELS_DIR / 'lead_quality_feature_importance.png'}")
-        plt.close()
-
-    joblib.dump(model_leads, MODELS_DIR / 'lead_quality_model.joblib')
-    joblib.dump(scaler_leads, MODELS_DIR / 'lead_quality_scaler.joblib')
-    
-    # Save feature configuration
-    feature_config_leads = {
-        'feature_columns': feature_cols_leads,
-        'presupuesto_map': presupuesto_map,
-        'urgencia_map': urgencia_map,
-        'tipo_servicio_classes': tipo_servicio_encoder.classes_.tolist(),
-        'ciudad_classes': ciudad_encoder.classes_.tolist(),
-        'calidad_map': calidad_map,
-        'calidad_reverse_map': {v: k for k, v in calidad_map.items()}
-    }
-    
-    with open(MODELS_DIR / 'feature_config_leads.json', 'w', encoding='utf-8') as f:
-        json.dump(feature_config_leads, f, indent=2, ensure_ascii=False)
-    
-    print(f"   💾 Modelo guardado: {MODELS_DIR / 'lead_quality_model.joblib'}")
-    print(f"   💾 Scaler guardado: {MODELS_DIR / 'lead_quality_scaler.joblib'}")
-    print(f"   💾 Config guardado: {MODELS_DIR / 'feature_config_leads.json'}")
-
-# ============================================================================
-# 2. MODELO DE PREDICCIÓN DE CHURN
-# ============================================================================
-print("\n" + "=" * 70)
-print("[2/2] MODELO DE PREDICCIÓN DE CHURN")
-print("=" * 70)
-
-comportamiento_csv = DATA_DIR / "clientes_comportamiento.csv"
-transacciones_csv = DATA_DIR / "clientes_transacciones.csv"
-
-if not comportamiento_csv.exists():
-    print(f"\n⚠️  No se encontró {comportamiento_csv}")
-    print("   Por favor, asegúrate de que el archivo existe en public/data/")
-    print("   Saltando entrenamiento del modelo de churn...")
-elif not transacciones_csv.exists():
-    print(f"\n⚠️  No se encontró {transacciones_csv}")
-    print("   Por favor, asegúrate de que el archivo existe en public/data/")
-    print("   Saltando entrenamiento del modelo de churn...")
-else:
-    # Load data
-    comportamiento_df = pd.read_csv(comportamiento_csv)
-    transacciones_df = pd.read_csv(transacciones_csv)
-    print(f"\n✅ Cargados {len(comportamiento_df)} clientes con comportamiento")
-    print(f"✅ Cargadas {len(transacciones_df)} transacciones")
+    cache.run(
+        'leads-export', export_leads, [fit_key, features_key, str(models_dir), search_key],
+        fit, features['feature_config'], models_dir, search, is_valid=_outputs_unchanged
+    )
+    return {'fit': fit, 'evaluation': evaluation}
+
+
+# ==================== 2. Modelo de predicción de churn ====================
+
+CHURN_LABELS = ['No Churn', 'Churn']
 
-    # Aggregate transactions per client
-    trans_agg = transacciones_df.groupby('cliente_id').agg({
-        'monto_cop': ['sum', 'mean', 'count', 'std'],
-        'fecha_transaccion': 'max'
-    }).reset_index()
 
-    trans_agg.columns = ['cliente_id', 'total_compras', 'promedio_compra', 'num_transacciones', 'std_compra', 'fecha_ultima_transaccion']
+def load_churn(comportamiento_csv: Path, transacciones_csv: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Etapa load: lee el comportamiento de clientes y sus transacciones con sus esquemas."""
+    return read_table(comportamiento_csv, BEHAVIOR_SCHEMA), read_table(transacciones_csv, TRANSACTIONS_SCHEMA)
+
+
+def build_churn_features(comportamiento_df: pd.DataFrame, transacciones_df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Etapa features: agrega las transacciones por cliente, las une al
+    comportamiento, codifica y calcula la etiqueta de churn.
+
+    Returns:
+        dict: 'X', 'y', 'feature_columns', 'feature_config' y el store de
+            agregados de transacciones ('aggregates')
+    """
+    # Aggregate transactions per client (the same store the server and daily appends use)
+    aggregates = TransactionAggregateStore.from_transactions(transacciones_df)
+    trans_agg = aggregates.features()
     trans_agg['std_compra'] = trans_agg['std_compra'].fillna(0)
 
     # Merge datasets
@@ -230,8 +1023,8 @@ else:
     engagement_map = {'Bajo': 0, 'Medio': 1, 'Alto': 2}
     satisfaccion_map = {'Bajo': 0, 'Medio': 1, 'Alto': 2}
 
-    churn_df['engagement_encoded'] = churn_df['nivel_engagement'].map(engagement_map)
-    churn_df['satisfaccion_encoded'] = churn_df['nivel_satisfaccion'].map(satisfaccion_map)
+    churn_df['engagement_encoded'] = map_categories(churn_df['nivel_engagement'], engagement_map)
+    churn_df['satisfaccion_encoded'] = map_categories(churn_df['nivel_satisfaccion'], satisfaccion_map)
 
     # Fill NaN for clients without transactions
     churn_df['total_compras'] = churn_df['total_compras'].fillna(0)
@@ -240,46 +1033,43 @@ else:
     churn_df['std_compra'] = churn_df['std_compra'].fillna(0)
 
     churn_df['churn'] = (
-        (churn_df['engagement_encoded'] == 0) | 
-        (churn_df['satisfaccion_encoded'] == 0) | 
+        (churn_df['engagement_encoded'] == 0) |
+        (churn_df['satisfaccion_encoded'] == 0) |
         (churn_df['dias_ultima_compra'] > 90)
     ).astype(int)
 
-    print(f"\n📊 Distribución de churn:")
-    print(churn_df['churn'].value_counts())
-    print(f"   Tasa de churn: {churn_df['churn'].mean():.1%}")
-
-    # Features
     feature_cols_churn = [
-        'engagement_encoded', 
-        'satisfaccion_encoded', 
+        'engagement_encoded',
+        'satisfaccion_encoded',
         'dias_ultima_compra',
-        'total_compras', 
-        'promedio_compra', 
+        'total_compras',
+        'promedio_compra',
         'num_transacciones',
         'std_compra'
     ]
-    X_churn = churn_df[feature_cols_churn]
-    y_churn = churn_df['churn']
 
-    # Split data
-    X_train_churn, X_test_churn, y_train_churn, y_test_churn = train_test_split(
-        X_churn, y_churn, test_size=0.2, random_state=42, stratify=y_churn
-    )
+    return {
+        'X': churn_df[feature_cols_churn],
+        'y': churn_df['churn'],
+        'feature_columns': feature_cols_churn,
+        'feature_config': {
+            'feature_columns': feature_cols_churn,
+            'engagement_map': engagement_map,
+            'satisfaccion_map': satisfaccion_map
+        },
+        'aggregates': aggregates
+    }
 
-    # Scale features
-    scaler_churn = StandardScaler()
-    X_train_churn_scaled = scaler_churn.fit_transform(X_train_churn)
-    X_test_churn_scaled = scaler_churn.transform(X_test_churn)
 
-    print("\n🔄 Comparando modelos...")
-    
-    models_churn_to_compare = {
+def churn_candidates(n_jobs: int = N_JOBS) -> Dict[str, Any]:
+    """Modelos candidatos para churn."""
+    return {
         'Random Forest': RandomForestClassifier(
             n_estimators=150,
             max_depth=8,
             random_state=42,
-            class_weight='balanced'
+            class_weight='balanced',
+            n_jobs=n_jobs
         ),
         'Gradient Boosting': GradientBoostingClassifier(
             n_estimators=150,
@@ -289,121 +1079,291 @@ else:
         )
     }
 
-    best_model_churn = None
-    best_auc = 0
-    best_name_churn = ""
-
-    for name, model in models_churn_to_compare.items():
-        model.fit(X_train_churn_scaled, y_train_churn)
-        y_proba = model.predict_proba(X_test_churn_scaled)[:, 1]
-        auc = roc_auc_score(y_test_churn, y_proba)
-        print(f"   • {name}: ROC-AUC={auc:.3f}")
-        
-        if auc > best_auc:
-            best_auc = auc
-            best_model_churn = model
-            best_name_churn = name
-
-    print(f"\n✅ Mejor modelo: {best_name_churn} (ROC-AUC: {best_auc:.3f})")
-    model_churn = best_model_churn
-
-    y_pred_churn = model_churn.predict(X_test_churn_scaled)
-    y_proba_churn = model_churn.predict_proba(X_test_churn_scaled)[:, 1]
-    
-    precision_churn = precision_score(y_test_churn, y_pred_churn)
-    recall_churn = recall_score(y_test_churn, y_pred_churn)
-    f1_churn = f1_score(y_test_churn, y_pred_churn)
-    auc_churn = roc_auc_score(y_test_churn, y_proba_churn)
 
+def fit_churn(features: Dict[str, Any], candidates: Dict[str, Any], cv_folds: int, n_jobs: int) -> Dict[str, Any]:
+    """
+    Etapa fit: separa train/test, compara los candidatos con CV y reentrena el mejor.
+
+    Returns:
+        dict: 'model', 'scaler', 'best_name', 'cv_results' y el set de test escalado
+    """
+    X_train_churn, X_test_churn, y_train_churn, y_test_churn = split_train_test(features)
+
+    # Scale features
+    scaler_churn = StandardScaler()
+    X_train_churn_scaled = scaler_churn.fit_transform(X_train_churn)
+    X_test_churn_scaled = scaler_churn.transform(X_test_churn)
+
+    print(f"\n🔄 Comparando modelos ({cv_folds}-fold CV en paralelo)...")
+    cv_results_churn, cv_elapsed = compare_models(
+        candidates, X_train_churn, y_train_churn, ['roc_auc'], cv_folds=cv_folds, n_jobs=n_jobs
+    )
+    print_comparison(cv_results_churn, cv_elapsed)
+
+    best_name_churn = max(cv_results_churn, key=lambda name: cv_results_churn[name]['scores']['roc_auc'][0])
+    model_churn = fit_for_serving(clone(candidates[best_name_churn]), X_train_churn_scaled, y_train_churn)
+
+    return {
+        'model': model_churn,
+        'scaler': scaler_churn,
+        'best_name': best_name_churn,
+        'cv_results': cv_results_churn,
+        'X_test_scaled': X_test_churn_scaled,
+        'y_test': np.asarray(y_test_churn)
+    }
+
+
+def evaluate_churn(fit: Dict[str, Any]) -> Dict[str, Any]:
+    """Etapa evaluate: métricas del modelo elegido sobre el set de test."""
+    y_test_churn = fit['y_test']
+    y_pred_churn = fit['model'].predict(fit['X_test_scaled'])
+    y_proba_churn = fit['model'].predict_proba(fit['X_test_scaled'])[:, 1]
+    return {
+        'roc_auc': roc_auc_score(y_test_churn, y_proba_churn),
+        'precision': precision_score(y_test_churn, y_pred_churn),
+        'recall': recall_score(y_test_churn, y_pred_churn),
+        'f1': f1_score(y_test_churn, y_pred_churn),
+        'classification_report': classification_report(y_test_churn, y_pred_churn, target_names=CHURN_LABELS),
+        'confusion_matrix': confusion_matrix(y_test_churn, y_pred_churn),
+        'y_proba': y_proba_churn
+    }
+
+
+def report_churn(fit: Dict[str, Any], evaluation: Dict[str, Any], feature_columns: List[str], models_dir: Path) -> List[str]:
+    """Etapa report: guarda los gráficos del modelo de churn y devuelve sus rutas."""
+    paths = [plot_confusion_matrix(
+        evaluation['confusion_matrix'], CHURN_LABELS,
+        f"Matriz de Confusión - Modelo de Churn ({fit['best_name']})", 'Reds',
+        models_dir / 'churn_confusion_matrix.png'
+    )]
+    if hasattr(fit['model'], 'feature_importances_'):
+        paths.append(plot_feature_importance(
+            feature_columns, fit['model'].feature_importances_,
+            'Importancia de Features - Modelo de Churn', 'rocket',
+            models_dir / 'churn_feature_importance.png'
+        ))
+    paths.append(plot_roc_curve(
+        fit['y_test'], evaluation['y_proba'], evaluation['roc_auc'],
+        'Curva ROC - Modelo de Churn', models_dir / 'churn_roc_curve.png'
+    ))
+    paths.append(plot_probability_distribution(
+        fit['y_test'], evaluation['y_proba'],
+        'Distribución de Probabilidades de Churn', models_dir / 'churn_probability_distribution.png'
+    ))
+    return paths
+
+
+def export_churn(
+    fit: Dict[str, Any],
+    feature_config: Dict[str, Any],
+    aggregates: TransactionAggregateStore,
+    models_dir: Path,
+    search: Optional[Dict[str, Any]] = None
+) -> Dict[str, str]:
+    """
+    Etapa export: guarda modelo, scaler, configuración, agregados de
+    transacciones y, si hubo búsqueda, la configuración elegida.
+
+    Returns:
+        dict: Ruta -> SHA-256 de cada archivo escrito
+    """
+    models_dir.mkdir(parents=True, exist_ok=True)
+    paths = [
+        models_dir / 'churn_model.joblib',
+        models_dir / 'churn_scaler.joblib',
+        models_dir / 'feature_config_churn.json'
+    ]
+    joblib.dump(fit['model'], paths[0])
+    joblib.dump(fit['scaler'], paths[1])
+    with open(paths[2], 'w', encoding='utf-8') as f:
+        json.dump(feature_config, f, indent=2, ensure_ascii=False)
+
+    print(f"   💾 Modelo guardado: {paths[0]}")
+    print(f"   💾 Scaler guardado: {paths[1]}")
+    print(f"   💾 Config guardado: {paths[2]}")
+
+    # Starting point for incremental appends and server-side feature lookups
+    paths.append(aggregates.save(models_dir / DEFAULT_STORE_PATH.name))
+    print(f"   💾 Agregados de transacciones guardados: {paths[3]}")
+
+    paths.extend(_export_flat_trees('churn', models_dir))
+    paths.extend(_export_native_model('churn', models_dir))
+
+    search_path = write_search_report('churn', search, fit, models_dir)
+    if search_path is not None:
+        paths.append(search_path)
+    return {str(path): file_digest(path) for path in paths}
+
+
+def train_churn(
+    data_dir: Path,
+    models_dir: Path,
+    cache: StageCache,
+    headless: bool = False,
+    cv_folds: int = CV_FOLDS,
+    n_jobs: int = N_JOBS,
+    search_settings: Optional[SearchSettings] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Ejecuta el pipeline del modelo de churn (con búsqueda de hiperparámetros
+    si se pasa `search_settings`).
+
+    Returns:
+        dict: Salidas de las etapas fit y evaluate, o None si falta algún CSV
+    """
+    print("\n" + "=" * 70)
+    print("[2/2] MODELO DE PREDICCIÓN DE CHURN")
+    print("=" * 70)
+
+    comportamiento_csv = data_dir / "clientes_comportamiento.csv"
+    transacciones_csv = data_dir / "clientes_transacciones.csv"
+
+    for csv_path in (comportamiento_csv, transacciones_csv):
+        if not csv_path.exists():
+            print(f"\n⚠️  No se encontró {csv_path}")
+            print("   Por favor, asegúrate de que el archivo existe en public/data/")
+            print("   Saltando entrenamiento del modelo de churn...")
+            return None
+
+    (comportamiento_df, transacciones_df), load_key = cache.run(
+        'churn-load', load_churn,
+        [file_signature(comportamiento_csv), file_signature(transacciones_csv), BEHAVIOR_SCHEMA, TRANSACTIONS_SCHEMA],
+        comportamiento_csv, transacciones_csv
+    )
+    print(f"\n✅ Cargados {len(comportamiento_df)} clientes con comportamiento")
+    print(f"✅ Cargadas {len(transacciones_df)} transacciones")
+
+    features, features_key = cache.run(
+        'churn-features', build_churn_features, [load_key], comportamiento_df, transacciones_df
+    )
+    print(f"\n📊 Distribución de churn:")
+    print(features['y'].value_counts())
+    print(f"   Tasa de churn: {features['y'].mean():.1%}")
+
+    candidates = churn_candidates(n_jobs)
+    search, search_key = None, None
+    if search_settings is not None:
+        space = search_settings.spaces.get('churn', {})
+        search, search_key = cache.run(
+            'churn-search', search_stage,
+            [features_key, _params_key(candidates), space, asdict(search_settings), cv_folds],
+            features, candidates, space, 'roc_auc', search_settings, cv_folds, n_jobs
+        )
+        print_search(search)
+        candidates = tuned_candidates(candidates, search)
+
+    fit, fit_key = cache.run(
+        'churn-fit', fit_churn, [features_key, _params_key(candidates), cv_folds],
+        features, candidates, cv_folds, n_jobs
+    )
+    print(f"\n✅ Mejor modelo: {fit['best_name']} "
+          f"(ROC-AUC CV: {fit['cv_results'][fit['best_name']]['scores']['roc_auc'][0]:.3f})")
+
+    evaluation, evaluation_key = cache.run('churn-evaluate', evaluate_churn, [fit_key], fit)
     print(f"\n📈 Métricas finales:")
-    print(f"   • ROC-AUC: {auc_churn:.3f}")
-    print(f"   • Precision: {precision_churn:.3f}")
-    print(f"   • Recall: {recall_churn:.3f}")
-    print(f"   • F1-Score: {f1_churn:.3f}")
+    print(f"   • ROC-AUC: {evaluation['roc_auc']:.3f}")
+    print(f"   • Precision: {evaluation['precision']:.3f}")
+    print(f"   • Recall: {evaluation['recall']:.3f}")
+    print(f"   • F1-Score: {evaluation['f1']:.3f}")
     print(f"\n📋 Classification Report:")
-    print(classification_report(y_test_churn, y_pred_churn, target_names=['No Churn', 'Churn']))
+    print(evaluation['classification_report'])
 
-    plt.figure(figsize=(8, 6))
-    cm_churn = confusion_matrix(y_test_churn, y_pred_churn)
-    sns.heatmap(cm_churn, annot=True, fmt='d', cmap='Reds',
-                xticklabels=['No Churn', 'Churn'],
-                yticklabels=['No Churn', 'Churn'])
-    plt.title(f'Matriz de Confusión - Modelo de Churn ({best_name_churn})', fontsize=14, fontweight='bold')
-    plt.xlabel('Predicción')
-    plt.ylabel('Real')
-    plt.tight_layout()
-    plt.savefig(MODELS_DIR / 'churn_confusion_matrix.png', dpi=150)
-    print(f"   💾 Guardado: {MODELS_DIR / 'churn_confusion_matrix.png'}")
-    plt.close()
+    if not headless:
+        cache.run(
+            'churn-report', report_churn, [evaluation_key, str(models_dir)],
+            fit, evaluation, features['feature_columns'], models_dir, is_valid=_plots_exist
+        )
 
-    plt.figure(figsize=(10, 6))
-    feature_importance_churn = pd.DataFrame({
-        'feature': feature_cols_churn,
-        'importance': model_churn.feature_importances_
-    }).sort_values('importance', ascending=False)
+    cache.run(
+        'churn-export', export_churn, [fit_key, features_key, str(models_dir), search_key],
+        fit, features['feature_config'], features['aggregates'], models_dir, search, is_valid=_outputs_unchanged
+    )
+    return {'fit': fit, 'evaluation': evaluation}
 
-    sns.barplot(data=feature_importance_churn, x='importance', y='feature', palette='rocket')
-    plt.title('Importancia de Features - Modelo de Churn', fontsize=14, fontweight='bold')
-    plt.xlabel('Importancia')
-    plt.ylabel('Feature')
-    plt.tight_layout()
-    plt.savefig(MODELS_DIR / 'churn_feature_importance.png', dpi=150)
-    print(f"   💾 Guardado: {MODELS_DIR / 'churn_feature_importance.png'}")
-    plt.close()
 
-    plt.figure(figsize=(8, 6))
-    fpr, tpr, _ = roc_curve(y_test_churn, y_proba_churn)
-    plt.plot(fpr, tpr, color='darkorange', lw=2, label=f'ROC curve (AUC = {auc_churn:.3f})')
-    plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--', label='Random')
-    plt.xlim([0.0, 1.0])
-    plt.ylim([0.0, 1.05])
-    plt.xlabel('False Positive Rate')
-    plt.ylabel('True Positive Rate')
-    plt.title('Curva ROC - Modelo de Churn', fontsize=14, fontweight='bold')
-    plt.legend(loc="lower right")
-    plt.grid(alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(MODELS_DIR / 'churn_roc_curve.png', dpi=150)
-    print(f"   💾 Guardado: {MODELS_DIR / 'churn_roc_curve.png'}")
-    plt.close()
+# ==================== CLI ====================
 
-    plt.figure(figsize=(10, 6))
-    plt.hist(y_proba_churn[y_test_churn == 0], bins=30, alpha=0.6, label='No Churn', color='green')
-    plt.hist(y_proba_churn[y_test_churn == 1], bins=30, alpha=0.6, label='Churn', color='red')
-    plt.xlabel('Probabilidad de Churn')
-    plt.ylabel('Frecuencia')
-    plt.title('Distribución de Probabilidades de Churn', fontsize=14, fontweight='bold')
-    plt.legend()
-    plt.grid(alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(MODELS_DIR / 'churn_probability_distribution.png', dpi=150)
-    print(f"   💾 Guardado: {MODELS_DIR / 'churn_probability_distribution.png'}")
-    plt.close()
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Entrena los modelos de calidad de leads y de churn.")
+    parser.add_argument('--only', choices=['leads', 'churn'], default=None, help="Entrenar solo un modelo")
+    parser.add_argument('--headless', action='store_true',
+                        help="No generar gráficos (no importa matplotlib ni seaborn)")
+    parser.add_argument('--no-cache', action='store_true', help="Recalcular todas las etapas sin usar la caché")
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR, help="Directorio de los CSV")
+    parser.add_argument('--models-dir', type=Path, default=MODELS_DIR, help="Directorio de salida de los modelos")
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR, help="Directorio de la caché de etapas")
+    parser.add_argument('--cv-folds', type=int, default=CV_FOLDS, help="Folds de validación cruzada")
+    parser.add_argument('--n-jobs', type=int, default=N_JOBS, help="Tareas en paralelo (-1 = todos los cores)")
+    parser.add_argument('--search', action='store_true',
+                        help="Buscar hiperparámetros (successive halving) en lugar de usar los fijos")
+    parser.add_argument('--search-space', type=Path, default=None,
+                        help="JSON con el espacio de búsqueda: {\"leads\"|\"churn\": {candidato: {parámetro: [valores]}}}")
+    parser.add_argument('--search-candidates', type=int, default=SEARCH_CANDIDATES,
+                        help="Configuraciones muestreadas por candidato")
+    parser.add_argument('--search-factor', type=int, default=SEARCH_FACTOR,
+                        help="Factor de reducción entre rondas del successive halving")
+    parser.add_argument('--latency-budget-ms', type=float, default=LATENCY_BUDGET_MS,
+                        help="Latencia objetivo (ms) de una predicción de una fila")
+    parser.add_argument('--latency-weight', type=float, default=LATENCY_WEIGHT,
+                        help="Puntos de la métrica restados por cada presupuesto de latencia excedido")
+    args = parser.parse_args(argv)
 
-    joblib.dump(model_churn, MODELS_DIR / 'churn_model.joblib')
-    joblib.dump(scaler_churn, MODELS_DIR / 'churn_scaler.joblib')
-    
-    # Save feature configuration
-    feature_config_churn = {
-        'feature_columns': feature_cols_churn,
-        'engagement_map': engagement_map,
-        'satisfaccion_map': satisfaccion_map
-    }
-    
-    with open(MODELS_DIR / 'feature_config_churn.json', 'w', encoding='utf-8') as f:
-        json.dump(feature_config_churn, f, indent=2, ensure_ascii=False)
-    
-    print(f"   💾 Modelo guardado: {MODELS_DIR / 'churn_model.joblib'}")
-    print(f"   💾 Scaler guardado: {MODELS_DIR / 'churn_scaler.joblib'}")
-    print(f"   💾 Config guardado: {MODELS_DIR / 'feature_config_churn.json'}")
-
-# ============================================================================
-# RESUMEN FINAL
-# ============================================================================
-print("\n" + "=" * 70)
-print("✅ ENTRENAMIENTO COMPLETADO")
-print("=" * 70)
-print(f"\n📁 Todos los archivos guardados en: {MODELS_DIR}")
-print("\n🎯 Para ejecutar este script desde la raíz del proyecto:")
-print("   python ml/train_leads_and_churn.py")
-print("\n" + "=" * 70)
+    search_settings = None
+    if args.search:
+        if args.search_candidates < 1 or args.search_factor < 2 or args.latency_budget_ms <= 0:
+            parser.error("--search-candidates >= 1, --search-factor >= 2 y --latency-budget-ms > 0")
+        search_settings = SearchSettings(
+            n_candidates=args.search_candidates,
+            factor=args.search_factor,
+            latency_budget_ms=args.latency_budget_ms,
+            latency_weight=args.latency_weight
+        )
+        if args.search_space is not None:
+            try:
+                with open(args.search_space, 'r', encoding='utf-8') as f:
+                    spaces = json.load(f)
+            except (OSError, ValueError) as e:
+                parser.error(f"No se pudo leer --search-space: {e}")
+            if not isinstance(spaces, dict):
+                parser.error("--search-space debe ser un objeto JSON {\"leads\"|\"churn\": {...}}")
+            search_settings.spaces.update(spaces)
+        # The only check of the spaces: the search stages trust them from here on
+        try:
+            validate_search_spaces(search_settings.spaces)
+        except ValueError as e:
+            parser.error(f"Espacio de búsqueda inválido: {e}")
+
+    warnings.filterwarnings('ignore')
+    cache = StageCache(args.cache_dir, enabled=not args.no_cache)
+
+    print("=" * 70)
+    print("ENTRENAMIENTO DE MODELOS - CUSTOMER INTELLIGENCE SYSTEM")
+    print("=" * 70)
+    print(f"\n📁 Directorio base: {BASE_DIR}")
+    print(f"📁 Directorio de datos: {args.data_dir}")
+    print(f"📁 Directorio de modelos: {args.models_dir}")
+    print(f"📁 Caché de etapas: {args.cache_dir if cache.enabled else 'desactivada'}")
+    if search_settings is not None:
+        print(f"🔎 Búsqueda de hiperparámetros: {search_settings.n_candidates} configuraciones por candidato, "
+              f"presupuesto {search_settings.latency_budget_ms}ms por fila")
+
+    args.models_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    if args.only in (None, 'leads'):
+        train_leads(args.data_dir, args.models_dir, cache, args.headless, args.cv_folds, args.n_jobs, search_settings)
+    if args.only in (None, 'churn'):
+        train_churn(args.data_dir, args.models_dir, cache, args.headless, args.cv_folds, args.n_jobs, search_settings)
+
+    print("\n" + "=" * 70)
+    print(f"✅ ENTRENAMIENTO COMPLETADO ({time.perf_counter() - start:.1f}s)")
+    print("=" * 70)
+    print(f"\n📁 Todos los archivos guardados en: {args.models_dir}")
+    print("\n🎯 Para ejecutar este script desde la raíz del proyecto:")
+    print("   python ml/train_leads_and_churn.py")
+    print("\n" + "=" * 70)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,414 @@
+"""
+Motor de inferencia NumPy para ensembles de árboles - Customer Intelligence System
+
+Exporta los árboles de un RandomForestClassifier o GradientBoostingClassifier
+entrenado a arrays planos y contiguos (feature, threshold, hijos y valor de
+hoja) y los evalúa para un lote completo con recorridos vectorizados de NumPy.
+
+Para lotes pequeños, `predict_proba` de sklearn gasta la mayor parte del
+tiempo en validar la entrada y en despachar cada estimador desde Python; aquí
+todos los árboles avanzan un nivel por iteración sobre todas las filas a la
+vez, así que el costo es ~max_depth operaciones vectorizadas por lote.
+
+Los arrays se pueden guardar como archivos .npy sin comprimir y abrirse con
+memory-mapping: varios procesos que cargan el mismo directorio comparten una
+sola copia en el page cache del sistema en lugar de tener cada uno la suya.
+
+`fuse_scaler` lleva los umbrales de los splits al espacio original de las
+features, de modo que el ensemble recibe las features sin escalar y la
+inferencia se ahorra la llamada al StandardScaler.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Rows evaluated per traversal pass; bounds the (rows x trees) working arrays
+DEFAULT_CHUNK_SIZE = 4096
+
+# Node/tree arrays written by `save`, one .npy file each (optional ones may be absent)
+ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+OPTIONAL_ARRAY_FIELDS = ('missing_left', 'tree_class', 'init_raw')
+META_FILE = 'meta.json'
+FORMAT_VERSION = 1
+
+
+_SIGN_BIT = np.int64(-2 ** 63)
+
+
+def _ordered_keys(x: np.ndarray) -> np.ndarray:
+    """Enteros con el mismo orden que los float64 de `x` (consecutivos entre floats vecinos)."""
+    bits = x.view(np.int64)
+    return np.where(bits < 0, -(bits & ~_SIGN_BIT), bits)
+
+
+def _from_ordered_keys(keys: np.ndarray) -> np.ndarray:
+    """Inversa de `_ordered_keys`."""
+    return np.where(keys < 0, (-keys) | _SIGN_BIT, keys).view(np.float64)
+
+
+def _raw_thresholds(threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """Mayor float64 `x` con `float32((x - mean) / scale) <= threshold`, elemento a elemento."""
+    def goes_left(x: np.ndarray) -> np.ndarray:
+        # Same operations, in the same order and precision, as StandardScaler + sklearn's tree
+        with np.errstate(over='ignore'):
+            return ((x - mean) / scale).astype(np.float32) <= threshold
+
+    guess = threshold * scale + mean
+    # Bracket the boundary: `low` goes left, `high` goes right, widening until both hold
+    width = (np.abs(guess) + scale) * 1e-6
+    low, high = guess - width, guess + width
+    for _ in range(64):
+        bad_low, bad_high = ~goes_left(low), goes_left(high)
+        if not (bad_low.any() or bad_high.any()):
+            break
+        width = np.where(bad_low | bad_high, width * 16, width)
+        low = np.where(bad_low, guess - width, low)
+        high = np.where(bad_high, guess + width, high)
+
+    low_keys, high_keys = _ordered_keys(low), _ordered_keys(high)
+    while True:
+        open_interval = high_keys - low_keys > 1
+        if not open_interval.any():
+            return _from_ordered_keys(low_keys)
+        middle = low_keys + (high_keys - low_keys) // 2
+        left = goes_left(_from_ordered_keys(middle))
+        low_keys = np.where(open_interval & left, middle, low_keys)
+        high_keys = np.where(open_interval & ~left, middle, high_keys)
+
+
+class FlatTreeEnsemble:
+    """
+    Ensemble de árboles aplanado, equivalente en probabilidades al modelo sklearn original.
+
+    Todos los nodos de todos los árboles viven en los mismos arrays; `roots`
+    indica el nodo raíz de cada árbol. Las hojas apuntan a sí mismas como hijo
+    izquierdo y derecho, de modo que un recorrido de `max_depth` pasos deja
+    cada fila en su hoja sin tener que distinguir nodos internos y hojas.
+
+    Example:
+        >>> engine = FlatTreeEnsemble.from_sklearn(model)
+        >>> probabilities = engine.predict_proba(X_scaled)
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        classes: np.ndarray,
+        n_features: int,
+        missing_left: Optional[np.ndarray] = None,
+        tree_class: Optional[np.ndarray] = None,
+        learning_rate: float = 1.0,
+        init_raw: Optional[np.ndarray] = None,
+        raw_input: bool = False
+    ):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        self.missing_left = missing_left
+        self.tree_class = tree_class
+        self.learning_rate = learning_rate
+        self.init_raw = init_raw
+        # Thresholds live in unscaled feature space (see `fuse_scaler`)
+        self.raw_input = raw_input
+        # Directory the arrays are memory-mapped from, if loaded with `load(..., mmap_mode=...)`
+        self.mapped_from: Optional[Path] = None
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @staticmethod
+    def supports(model: Any) -> bool:
+        """Indica si `model` es un ensemble que se puede aplanar."""
+        from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+
+        if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+            return getattr(model, 'n_outputs_', 1) == 1
+        if isinstance(model, GradientBoostingClassifier):
+            return model.init in (None, 'zero')
+        return False
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> 'FlatTreeEnsemble':
+        """
+        Aplana un RandomForestClassifier, ExtraTreesClassifier o GradientBoostingClassifier.
+
+        Raises:
+            TypeError: Si el modelo no es un ensemble soportado
+        """
+        if not cls.supports(model):
+            raise TypeError(f"Modelo no soportado por FlatTreeEnsemble: {type(model).__name__}")
+
+        from sklearn.ensemble import GradientBoostingClassifier
+
+        if isinstance(model, GradientBoostingClassifier):
+            n_stages, n_per_stage = model.estimators_.shape
+            trees = [model.estimators_[stage, k].tree_ for stage in range(n_stages) for k in range(n_per_stage)]
+            tree_class = np.tile(np.arange(n_per_stage, dtype=np.intp), n_stages)
+            # Constant prior of the default init estimator, one value per class column
+            init_raw = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+            kind = 'gradient_boosting'
+        else:
+            trees = [estimator.tree_ for estimator in model.estimators_]
+            tree_class = None
+            init_raw = None
+            kind = 'forest'
+
+        features, thresholds, lefts, rights, values, missing, roots = [], [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.intp)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.intp))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.intp))
+
+            if kind == 'forest':
+                leaf_value = tree.value[:, 0, :].astype(np.float64)
+                normalizer = leaf_value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                values.append(leaf_value / normalizer)
+            else:
+                values.append(tree.value[:, 0, 0].astype(np.float64))
+
+            missing_go_to_left = getattr(tree, 'missing_go_to_left', None)
+            missing.append(
+                np.asarray(missing_go_to_left, dtype=bool) if missing_go_to_left is not None
+                else np.zeros(n_nodes, dtype=bool)
+            )
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            kind=kind,
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max(int(tree.max_depth) for tree in trees),
+            classes=np.asarray(model.classes_),
+            n_features=int(model.n_features_in_),
+            missing_left=np.concatenate(missing),
+            tree_class=tree_class,
+            learning_rate=float(getattr(model, 'learning_rate', 1.0)),
+            init_raw=None if init_raw is None else np.asarray(init_raw, dtype=np.float64)
+        )
+
+    def fuse_scaler(self, mean: Optional[np.ndarray], scale: Optional[np.ndarray]) -> 'FlatTreeEnsemble':
+        """
+        Devuelve una copia que recibe las features sin escalar, con el StandardScaler incorporado.
+
+        Cada umbral `t` del feature `j` se reemplaza por el mayor float64 `x`
+        que cumple `float32((x - mean[j]) / scale[j]) <= t`, es decir, por el
+        valor crudo en el que el split cambia de lado con la aritmética exacta
+        del scaler y de sklearn. `t * scale + mean` se aproxima a ese valor,
+        pero los redondeos del escalado y de la conversión a float32 pueden
+        mover el borde; como la transformación es monótona, el borde exacto se
+        encuentra por bisección y las hojas alcanzadas son las mismas.
+
+        Args:
+            mean: `scaler.mean_` (None si el scaler no centra)
+            scale: `scaler.scale_` (None si el scaler no escala)
+
+        Raises:
+            ValueError: Si el ensemble ya tiene un scaler incorporado
+        """
+        if self.raw_input:
+            raise ValueError("El ensemble ya recibe features sin escalar")
+        mean = np.zeros(self.n_features_in_) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(self.n_features_in_) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        is_split = self.left != np.arange(self.n_nodes)
+        feature = self.feature[is_split]
+        threshold = np.zeros(self.n_nodes, dtype=np.float64)
+        threshold[is_split] = _raw_thresholds(
+            np.asarray(self.threshold[is_split], dtype=np.float64), mean[feature], scale[feature]
+        )
+        return type(self)(
+            kind=self.kind,
+            feature=self.feature,
+            threshold=threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            max_depth=self.max_depth,
+            classes=self.classes_,
+            n_features=self.n_features_in_,
+            missing_left=self.missing_left,
+            tree_class=self.tree_class,
+            learning_rate=self.learning_rate,
+            init_raw=self.init_raw,
+            raw_input=True
+        )
+
+    def to_arrays(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Estado serializable del ensemble: (escalares para JSON, arrays por nombre).
+
+        Es la representación común de `save` y del artefacto nativo (`ml/model_format.py`).
+        """
+        arrays = {
+            field: np.ascontiguousarray(getattr(self, field))
+            for field in ARRAY_FIELDS + OPTIONAL_ARRAY_FIELDS
+            if getattr(self, field) is not None
+        }
+        meta = {
+            'kind': self.kind,
+            'max_depth': self.max_depth,
+            'n_features': self.n_features_in_,
+            'learning_rate': self.learning_rate,
+            'raw_input': self.raw_input,
+            # Labels are few and may be strings, which .npy can only hold via pickle
+            'classes': self.classes_.tolist()
+        }
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> 'FlatTreeEnsemble':
+        """Reconstruye el ensemble a partir de `to_arrays` (los arrays se usan sin copiar)."""
+        classes = np.asarray(meta['classes'])
+        return cls(
+            kind=meta['kind'],
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            value=arrays['value'],
+            roots=arrays['roots'],
+            max_depth=int(meta['max_depth']),
+            # sklearn keeps string labels in an object array
+            classes=classes.astype(object) if classes.dtype.kind == 'U' else classes,
+            n_features=int(meta['n_features']),
+            missing_left=arrays.get('missing_left'),
+            tree_class=arrays.get('tree_class'),
+            learning_rate=float(meta['learning_rate']),
+            init_raw=arrays.get('init_raw'),
+            raw_input=bool(meta.get('raw_input', False))
+        )
+
+    def save(self, directory: Path) -> Path:
+        """
+        Guarda el ensemble en `directory`: un .npy por array y los escalares en `meta.json`.
+
+        Los .npy se escriben sin comprimir para que `load` pueda mapearlos en memoria.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        meta, arrays = self.to_arrays()
+        for field, array in arrays.items():
+            np.save(directory / f"{field}.npy", array, allow_pickle=False)
+
+        meta = {'format_version': FORMAT_VERSION, **meta, 'arrays': list(arrays)}
+        with open(directory / META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        return directory
+
+    @classmethod
+    def load(cls, directory: Path, mmap_mode: Optional[str] = 'r') -> 'FlatTreeEnsemble':
+        """
+        Carga un ensemble guardado con `save`.
+
+        Args:
+            directory: Directorio escrito por `save`
+            mmap_mode: Modo de `np.load` ('r' = mapeado de solo lectura, None = leer a memoria)
+
+        Raises:
+            FileNotFoundError: Si falta `meta.json` o alguno de los arrays
+            ValueError: Si el formato no es compatible
+        """
+        directory = Path(directory)
+        with open(directory / META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Formato de ensemble no soportado: {meta.get('format_version')}")
+
+        arrays = {}
+        for field in meta['arrays']:
+            array = np.load(directory / f"{field}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+            # Plain ndarray view over the mapping: np.memmap wrappers slow down fancy indexing
+            arrays[field] = np.asarray(array)
+
+        engine = cls.from_arrays(meta, arrays)
+        engine.mapped_from = directory if mmap_mode is not None else None
+        return engine
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Índice global de la hoja alcanzada por cada fila en cada árbol, forma (n, n_trees)."""
+        # sklearn evaluates splits on float32 inputs against float64 thresholds; fused
+        # thresholds already account for that rounding and compare raw float64 values
+        X = np.asarray(X, dtype=np.float64 if self.raw_input else np.float32)
+        has_missing = self.missing_left is not None and bool(np.isnan(X).any())
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_missing:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _raw_predict(self, X: np.ndarray) -> np.ndarray:
+        leaf_values = self.value[self.apply(X)]
+        n_outputs = len(self.init_raw)
+        raw = np.empty((X.shape[0], n_outputs), dtype=np.float64)
+        for k in range(n_outputs):
+            raw[:, k] = leaf_values[:, self.tree_class == k].sum(axis=1)
+        return self.init_raw + self.learning_rate * raw
+
+    def _predict_proba_chunk(self, X: np.ndarray) -> np.ndarray:
+        if self.kind == 'forest':
+            return self.value[self.apply(X)].mean(axis=1)
+
+        raw = self._raw_predict(X)
+        if raw.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        raw -= raw.max(axis=1, keepdims=True)
+        exp = np.exp(raw)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """Probabilidades por clase, con la misma forma y orden de columnas que sklearn."""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Se esperaban {self.n_features_in_} features, se recibió una matriz de forma {X.shape}"
+            )
+        if X.shape[0] <= chunk_size:
+            return self._predict_proba_chunk(X)
+        return np.concatenate([
+            self._predict_proba_chunk(X[start:start + chunk_size])
+            for start in range(0, X.shape[0], chunk_size)
+        ])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Clase predicha (argmax de las probabilidades), como `model.predict`."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
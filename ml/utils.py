@@ -3,36 +3,93 @@ Utilidades para el módulo de Machine Learning - Customer Intelligence System
 
 Este módulo proporciona funciones para cargar modelos entrenados y realizar
 predicciones individuales o en lote para calidad de leads y predicción de churn.
+
+pandas solo se importa al llamar a las funciones `batch_predict_*`: el
+servidor de predicción no lo necesita y así arranca más rápido.
 """
 
-import pandas as pd
 import numpy as np
 import joblib
+import copy
+import hashlib
 import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import TYPE_CHECKING, Dict, Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from ml.linear_predictor import LinearPredictor
+from ml.model_format import NativeModel, load_model, save_model
+from ml.tree_ensemble import FlatTreeEnsemble
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Get models directory
 MODELS_DIR = Path(__file__).resolve().parent / "models"
 
+# Artifact files (model, scaler, config) for each model name
+MODEL_ARTIFACTS = {
+    'lead_quality': ('lead_quality_model.joblib', 'lead_quality_scaler.joblib', 'feature_config_leads.json'),
+    'churn': ('churn_model.joblib', 'churn_scaler.joblib', 'feature_config_churn.json'),
+}
 
-def load_lead_quality_model() -> Tuple[Any, Any, Dict]:
+# Seconds between checks of the artifact files for changes (0 = check on every call)
+MODEL_RELOAD_CHECK_INTERVAL = float(os.environ.get('ML_MODEL_RELOAD_CHECK_INTERVAL', '2.0'))
+
+# Precomputed lead-quality probabilities for every feature combination
+LEAD_LOOKUP_FILE = 'lead_quality_lookup.npz'
+LEAD_LOOKUP_ENABLED = os.environ.get('ML_LEAD_LOOKUP_TABLE', '1') == '1'
+LEAD_LOOKUP_MAX_CELLS = int(os.environ.get('ML_LEAD_LOOKUP_MAX_CELLS', '1000000'))
+
+# Serve tree ensembles with the flattened NumPy engine instead of sklearn's predict_proba
+FLAT_TREES_ENABLED = os.environ.get('ML_FLAT_TREES', '1') == '1'
+
+# Flattened tree arrays saved as raw .npy files and memory-mapped at load, so all
+# worker processes on a host share one page-cache copy instead of unpickling their own
+FLAT_TREES_DIR = 'flat_trees'
+MMAP_ARTIFACTS_ENABLED = os.environ.get('ML_MMAP_ARTIFACTS', '1') == '1'
+
+# Single-file native artifacts (`ml/model_format.py`): NumPy predictor with the scaler fused
+# plus feature config, loaded without unpickling or importing sklearn
+NATIVE_MODEL_FILES = {
+    'lead_quality': 'lead_quality_model.cim',
+    'churn': 'churn_model.cim'
+}
+NATIVE_ARTIFACTS_ENABLED = os.environ.get('ML_NATIVE_ARTIFACTS', '1') == '1'
+
+# Fold the StandardScaler into the served model (linear weights or tree thresholds)
+# so inference takes raw features and skips scaler.transform
+FUSE_SCALER_ENABLED = os.environ.get('ML_FUSE_SCALER', '1') == '1'
+
+# Cached churn predictions (entries, 0 = disabled) and their lifetime in seconds (0 = no expiry)
+CHURN_CACHE_SIZE = int(os.environ.get('ML_CHURN_CACHE_SIZE', '10000'))
+CHURN_CACHE_TTL = float(os.environ.get('ML_CHURN_CACHE_TTL', '0'))
+
+
+def _load_model_artifacts(
+    name: str,
+    models_dir: Optional[Path] = None,
+    load_model: bool = True
+) -> Tuple[Any, Any, Dict]:
     """
-    Carga el modelo de calidad de leads, su scaler y configuración de features.
-    
-    Returns:
-        tuple: (model, scaler, feature_config)
-        
+    Carga desde disco el modelo, scaler y configuración de `name`.
+
+    Con `load_model=False` se comprueba que el modelo exista pero no se
+    deserializa, y se devuelve None en su lugar.
+
     Raises:
         FileNotFoundError: Si los archivos del modelo no existen
-    
-    Example:
-        >>> model, scaler, config = load_lead_quality_model()
-        >>> print(config['feature_columns'])
     """
-    model_path = MODELS_DIR / 'lead_quality_model.joblib'
-    scaler_path = MODELS_DIR / 'lead_quality_scaler.joblib'
-    config_path = MODELS_DIR / 'feature_config_leads.json'
+    models_dir = models_dir or MODELS_DIR
+    model_file, scaler_file, config_file = MODEL_ARTIFACTS[name]
+    model_path = models_dir / model_file
+    scaler_path = models_dir / scaler_file
+    config_path = models_dir / config_file
     
     if not model_path.exists():
         raise FileNotFoundError(f"Modelo no encontrado: {model_path}")
@@ -41,7 +98,7 @@ def load_lead_quality_model() -> Tuple[Any, Any, Dict]:
     if not config_path.exists():
         raise FileNotFoundError(f"Config no encontrado: {config_path}")
     
-    model = joblib.load(model_path)
+    model = joblib.load(model_path) if load_model else None
     scaler = joblib.load(scaler_path)
     
     with open(config_path, 'r', encoding='utf-8') as f:
@@ -50,6 +107,23 @@ def load_lead_quality_model() -> Tuple[Any, Any, Dict]:
     return model, scaler, config
 
 
+def load_lead_quality_model() -> Tuple[Any, Any, Dict]:
+    """
+    Carga el modelo de calidad de leads, su scaler y configuración de features.
+    
+    Returns:
+        tuple: (model, scaler, feature_config)
+        
+    Raises:
+        FileNotFoundError: Si los archivos del modelo no existen
+    
+    Example:
+        >>> model, scaler, config = load_lead_quality_model()
+        >>> print(config['feature_columns'])
+    """
+    return _load_model_artifacts('lead_quality')
+
+
 def load_churn_model() -> Tuple[Any, Any, Dict]:
     """
     Carga el modelo de predicción de churn, su scaler y configuración de features.
@@ -64,24 +138,905 @@ def load_churn_model() -> Tuple[Any, Any, Dict]:
         >>> model, scaler, config = load_churn_model()
         >>> print(config['feature_columns'])
     """
-    model_path = MODELS_DIR / 'churn_model.joblib'
-    scaler_path = MODELS_DIR / 'churn_scaler.joblib'
-    config_path = MODELS_DIR / 'feature_config_churn.json'
+    return _load_model_artifacts('churn')
+
+
+# ==================== Encoders de features ====================
+
+class CategoricalEncoder:
+    """
+    Codificador O(1) de una variable categórica basado en un dict.
     
-    if not model_path.exists():
-        raise FileNotFoundError(f"Modelo no encontrado: {model_path}")
-    if not scaler_path.exists():
-        raise FileNotFoundError(f"Scaler no encontrado: {scaler_path}")
-    if not config_path.exists():
-        raise FileNotFoundError(f"Config no encontrado: {config_path}")
+    Cada categoría conocida se mapea a una posición de `values` (el valor
+    numérico que recibe el modelo); las categorías desconocidas usan
+    `default_index`. Trabajar con posiciones permite usar el mismo encoder
+    tanto para construir features como para indexar tablas precalculadas.
     
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
+    Example:
+        >>> encoder = CategoricalEncoder.from_classes(['Bogotá', 'Cali', 'Medellín'])
+        >>> encoder.transform(['Cali', 'Desconocida'])
+        array([1., 0.])
+    """
     
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    def __init__(self, index: Dict[str, int], values: Sequence[float], default_index: int = 0):
+        self.index = index
+        self.values = np.asarray(values, dtype=np.float64)
+        self.default_index = default_index
     
-    return model, scaler, config
+    @classmethod
+    def from_value_map(cls, value_map: Dict[str, float], default_value: float) -> 'CategoricalEncoder':
+        """Encoder para un mapeo categoría -> valor numérico (p. ej. `presupuesto_map`)."""
+        values = sorted(set(value_map.values()) | {default_value})
+        position = {value: i for i, value in enumerate(values)}
+        return cls({key: position[value] for key, value in value_map.items()}, values, position[default_value])
+    
+    @classmethod
+    def from_classes(cls, classes: Sequence[str], index: Optional[Dict[str, int]] = None) -> 'CategoricalEncoder':
+        """Encoder equivalente a un LabelEncoder entrenado con `classes` (desconocidas -> 0)."""
+        return cls(index or {value: i for i, value in enumerate(classes)}, range(len(classes)), 0)
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    def encode_indices(self, categories: Iterable[Any], count: int = -1) -> np.ndarray:
+        """Posición en `values` de cada categoría."""
+        index = self.index
+        default_index = self.default_index
+        return np.fromiter((index.get(category, default_index) for category in categories), dtype=np.intp, count=count)
+    
+    def transform(self, categories: Iterable[Any], count: int = -1) -> np.ndarray:
+        """Valor numérico de cada categoría."""
+        return self.values[self.encode_indices(categories, count)]
+
+
+class LeadFeatureEncoder:
+    """
+    Convierte leads (diccionarios) en la matriz de features del modelo de calidad.
+    
+    Se construye una vez a partir de `feature_config_leads.json` y sirve tanto
+    para un lead individual como para lotes.
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        tipo_servicio_classes = config['tipo_servicio_classes']
+        ciudad_classes = config['ciudad_classes']
+        
+        # (field, category used when the field is missing, encoder)
+        self.fields: List[Tuple[str, Any, CategoricalEncoder]] = [
+            ('presupuesto', 'Menos de 5M', CategoricalEncoder.from_value_map(config['presupuesto_map'], 2.5)),
+            ('urgencia', 'Baja', CategoricalEncoder.from_value_map(config['urgencia_map'], 1)),
+            ('tipo_servicio', tipo_servicio_classes[0],
+             CategoricalEncoder.from_classes(tipo_servicio_classes, config.get('tipo_servicio_index'))),
+            ('ciudad', ciudad_classes[0],
+             CategoricalEncoder.from_classes(ciudad_classes, config.get('ciudad_index'))),
+        ]
+    
+    @property
+    def defaults(self) -> Dict[str, Any]:
+        """Valor usado para cada campo cuando falta en el lead."""
+        return {field_name: missing for field_name, missing, _ in self.fields}
+    
+    def encode_indices(self, leads_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Matriz (n_leads, 4) con la posición de cada categoría en su encoder."""
+        n = len(leads_list)
+        indices = np.empty((n, len(self.fields)), dtype=np.intp)
+        for col, (field_name, missing, encoder) in enumerate(self.fields):
+            indices[:, col] = encoder.encode_indices((lead.get(field_name, missing) for lead in leads_list), n)
+        return indices
+    
+    def transform(self, leads_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Matriz (n_leads, 4) de features en el orden de `feature_columns`."""
+        indices = self.encode_indices(leads_list)
+        features = np.empty(indices.shape, dtype=np.float64)
+        for col, (_, _, encoder) in enumerate(self.fields):
+            features[:, col] = encoder.values[indices[:, col]]
+        return features
+
+
+class ChurnFeatureEncoder:
+    """
+    Convierte clientes (diccionarios) en la matriz de features del modelo de churn.
+    
+    Se construye una vez a partir de `feature_config_churn.json` y sirve tanto
+    para un cliente individual como para lotes.
+    """
+    
+    # (field, default when missing) for the numeric features, in model order
+    NUMERIC_FIELDS = (
+        ('dias_ultima_compra', 30),
+        ('total_compras', 0),
+        ('promedio_compra', 0),
+        ('num_transacciones', 0),
+        ('std_compra', 0),
+    )
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.engagement = CategoricalEncoder.from_value_map(config['engagement_map'], 1)
+        self.satisfaccion = CategoricalEncoder.from_value_map(config['satisfaccion_map'], 1)
+    
+    @property
+    def defaults(self) -> Dict[str, Any]:
+        """Valor usado para cada campo cuando falta en el cliente."""
+        return {'engagement': 'Medio', 'satisfaccion': 'Medio', **dict(self.NUMERIC_FIELDS)}
+    
+    def transform(self, clients_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Matriz (n_clientes, 7) de features en el orden de `feature_columns`."""
+        n = len(clients_list)
+        features = np.empty((n, 2 + len(self.NUMERIC_FIELDS)), dtype=np.float64)
+        features[:, 0] = self.engagement.transform((client.get('engagement', 'Medio') for client in clients_list), n)
+        features[:, 1] = self.satisfaccion.transform((client.get('satisfaccion', 'Medio') for client in clients_list), n)
+        for col, (field_name, default) in enumerate(self.NUMERIC_FIELDS, start=2):
+            features[:, col] = np.array([client.get(field_name, default) for client in clients_list], dtype=np.float64)
+        return features
+
+
+# Feature encoder built at load time for each model name
+FEATURE_ENCODERS = {
+    'lead_quality': LeadFeatureEncoder,
+    'churn': ChurnFeatureEncoder,
+}
+
+
+# ==================== Predictor de inferencia ====================
+
+def build_predictor(model: Any) -> Any:
+    """
+    Devuelve el objeto con `predict_proba`/`classes_` que se usará para servir `model`.
+    
+    Si el modelo es un ensemble de árboles soportado se aplana con
+    `FlatTreeEnsemble` y se comprueba contra sklearn sobre un lote de prueba;
+    si no está soportado o las probabilidades no coinciden, se usa el modelo
+    sklearn tal cual.
+    """
+    if not FLAT_TREES_ENABLED or not FlatTreeEnsemble.supports(model):
+        return model
+    engine = FlatTreeEnsemble.from_sklearn(model)
+    probe = np.random.default_rng(0).normal(size=(256, engine.n_features_in_))
+    if not np.allclose(engine.predict_proba(probe), model.predict_proba(probe), rtol=0, atol=1e-9):
+        return model
+    return engine
+
+
+def build_numpy_predictor(model: Any) -> Optional[Any]:
+    """
+    Convierte `model` al predictor NumPy que guarda el artefacto nativo.
+    
+    A diferencia de `build_predictor`, también convierte Logistic Regression
+    (`LinearPredictor`) y no depende de `ML_FLAT_TREES`.
+    
+    Returns:
+        `FlatTreeEnsemble` o `LinearPredictor` equivalente a `model`, o None si
+        no está soportado o las probabilidades no coinciden
+    """
+    if FlatTreeEnsemble.supports(model):
+        engine = FlatTreeEnsemble.from_sklearn(model)
+    elif LinearPredictor.supports(model):
+        engine = LinearPredictor.from_sklearn(model)
+    else:
+        return None
+    probe = np.random.default_rng(0).normal(size=(256, engine.n_features_in_))
+    if not np.allclose(engine.predict_proba(probe), model.predict_proba(probe), rtol=0, atol=1e-9):
+        return None
+    return engine
+
+
+# ==================== Scaler fusionado ====================
+
+def fuse_scaler(predictor: Any, scaler: Any) -> Optional[Any]:
+    """
+    Incorpora el StandardScaler a `predictor` para que reciba las features sin escalar.
+    
+    - Modelos lineales (LogisticRegression): con `z = (x - mean) / scale`,
+      `w·z + b = (w / scale)·x + (b - w·(mean / scale))`, así que se devuelve
+      una copia con esos coeficientes e intercepto.
+    - `FlatTreeEnsemble`: los umbrales de los splits se llevan al espacio
+      original (`FlatTreeEnsemble.fuse_scaler`), con las mismas hojas.
+    - `LinearPredictor`: igual que los modelos lineales de sklearn
+      (`LinearPredictor.fuse_scaler`).
+    
+    El resultado se comprueba contra `predictor` + `scaler` sobre un lote de
+    prueba, como en `build_predictor`.
+    
+    Args:
+        predictor: Objeto devuelto por `build_predictor`
+        scaler: Scaler con que se entrenó el modelo
+    
+    Returns:
+        Predictor equivalente sin scaler, o None si la combinación no se puede
+        fusionar o las probabilidades no coinciden
+    
+    Example:
+        >>> fused = fuse_scaler(build_predictor(model), scaler)
+        >>> probabilities = fused.predict_proba(features)  # sin scaler.transform
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    if not isinstance(scaler, StandardScaler):
+        return None
+    n_features = int(scaler.n_features_in_)
+    mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n_features)
+    scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n_features)
+
+    if isinstance(predictor, (FlatTreeEnsemble, LinearPredictor)):
+        if predictor.raw_input:
+            return None
+        fused = predictor.fuse_scaler(mean, scale)
+    else:
+        from sklearn.linear_model._base import LinearClassifierMixin
+
+        if not isinstance(predictor, LinearClassifierMixin):
+            return None
+        coef = predictor.coef_ / scale
+        fused = copy.copy(predictor)
+        fused.coef_ = coef
+        fused.intercept_ = predictor.intercept_ - coef @ mean
+
+    probe = mean + scale * np.random.default_rng(0).normal(size=(256, n_features))
+    expected = predictor.predict_proba(scaler.transform(probe))
+    if not np.allclose(fused.predict_proba(probe), expected, rtol=0, atol=1e-9):
+        return None
+    return fused
+
+
+# ==================== Tabla precalculada de leads ====================
+
+def _artifact_digest(name: str, models_dir: Optional[Path] = None) -> str:
+    """SHA-256 del contenido de los archivos de modelo, scaler y config de `name`."""
+    models_dir = models_dir or MODELS_DIR
+    digest = hashlib.sha256()
+    for filename in MODEL_ARTIFACTS[name]:
+        with open(models_dir / filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class LeadLookupTable:
+    """
+    Probabilidades del modelo de leads precalculadas para todas las entradas posibles.
+    
+    Las features del modelo de leads son todas categóricas (presupuesto,
+    urgencia, tipo de servicio y ciudad), así que el espacio de entrada es
+    finito: se enumeran todas las combinaciones, se puntúan con una sola
+    llamada a `predict_proba` y el resultado se guarda en un array denso
+    indexado por las posiciones de `LeadFeatureEncoder.encode_indices`.
+    Predecir pasa a ser una indexación de NumPy, sin llamar a sklearn.
+    
+    Example:
+        >>> table = LeadLookupTable.build(model, scaler, encoder)
+        >>> probabilities = table.lookup(encoder.encode_indices(leads_list))
+    """
+    
+    def __init__(self, probabilities: np.ndarray, classes: np.ndarray):
+        self.probabilities = probabilities
+        self.classes = classes
+    
+    @staticmethod
+    def n_cells(encoder: LeadFeatureEncoder) -> int:
+        """Número de combinaciones de features que tendría la tabla."""
+        return int(np.prod([len(field_encoder) for _, _, field_encoder in encoder.fields]))
+    
+    @classmethod
+    def build(cls, model: Any, scaler: Optional[Any], encoder: LeadFeatureEncoder) -> 'LeadLookupTable':
+        """Enumera todas las combinaciones y las puntúa con una sola llamada al modelo (scaler None = fusionado)."""
+        axes = [field_encoder.values for _, _, field_encoder in encoder.fields]
+        grid = np.stack([axis.ravel() for axis in np.meshgrid(*axes, indexing='ij')], axis=1)
+        probabilities = model.predict_proba(grid if scaler is None else scaler.transform(grid))
+        shape = tuple(len(axis) for axis in axes) + (probabilities.shape[1],)
+        return cls(np.ascontiguousarray(probabilities.reshape(shape)), np.asarray(model.classes_))
+    
+    def lookup(self, indices: np.ndarray) -> np.ndarray:
+        """Probabilidades (n, n_clases) para una matriz (n, 4) de posiciones."""
+        return self.probabilities[tuple(indices.T)]
+    
+    def save(self, path: Path, source_digest: str) -> None:
+        """Guarda la tabla junto con el digest de los artefactos con que se calculó."""
+        np.savez(path, probabilities=self.probabilities, classes=self.classes, source_digest=source_digest)
+    
+    @classmethod
+    def load(cls, path: Path, source_digest: str) -> Optional['LeadLookupTable']:
+        """Carga la tabla si existe y fue calculada con los mismos artefactos; si no, None."""
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if str(data['source_digest']) != source_digest:
+                return None
+            return cls(data['probabilities'], data['classes'])
+
+
+def _get_lead_lookup_table(
+    model: Any,
+    scaler: Optional[Any],
+    encoder: LeadFeatureEncoder,
+    source_digest: str
+) -> Optional[LeadLookupTable]:
+    """Tabla de leads para el modelo cargado: la guardada en disco si coincide, o calculada en memoria."""
+    if not LEAD_LOOKUP_ENABLED or LeadLookupTable.n_cells(encoder) > LEAD_LOOKUP_MAX_CELLS:
+        return None
+    table = LeadLookupTable.load(MODELS_DIR / LEAD_LOOKUP_FILE, source_digest)
+    if table is None:
+        table = LeadLookupTable.build(model, scaler, encoder)
+    return table
+
+
+def export_lead_lookup_table(models_dir: Optional[Path] = None) -> Optional[Path]:
+    """
+    Calcula la tabla de leads para los artefactos de `models_dir` (por defecto
+    `MODELS_DIR`) y la guarda en `lead_quality_lookup.npz`, para que el
+    servidor no tenga que calcularla al cargar.
+    
+    Returns:
+        Path: Ruta del archivo generado, o None si la tabla supera
+            `ML_LEAD_LOOKUP_MAX_CELLS` combinaciones
+    
+    Raises:
+        FileNotFoundError: Si los archivos del modelo no existen
+    """
+    models_dir = models_dir or MODELS_DIR
+    model, scaler, config = _load_model_artifacts('lead_quality', models_dir)
+    encoder = LeadFeatureEncoder(config)
+    if LeadLookupTable.n_cells(encoder) > LEAD_LOOKUP_MAX_CELLS:
+        return None
+    table = LeadLookupTable.build(model, scaler, encoder)
+    path = models_dir / LEAD_LOOKUP_FILE
+    table.save(path, _artifact_digest('lead_quality', models_dir))
+    return path
+
+
+# ==================== Árboles mapeados en memoria ====================
+
+def _flat_trees_path(name: str, source_digest: str, models_dir: Optional[Path] = None) -> Path:
+    """Directorio de los arrays aplanados de `name` para una versión concreta de sus artefactos."""
+    # Fused and unfused arrays take different inputs, so they never share a directory
+    suffix = '-fused' if FUSE_SCALER_ENABLED else ''
+    return (models_dir or MODELS_DIR) / FLAT_TREES_DIR / f"{name}-{source_digest[:16]}{suffix}"
+
+
+def _save_flat_trees(
+    name: str,
+    engine: FlatTreeEnsemble,
+    source_digest: str,
+    models_dir: Optional[Path] = None
+) -> Path:
+    """
+    Guarda `engine` en su directorio versionado y borra los de versiones anteriores.
+
+    Cada versión se escribe en un directorio temporal y se publica con un
+    rename, así que nunca se sobrescribe un archivo que otro proceso tenga
+    mapeado; los procesos que aún mapean una versión borrada conservan sus
+    páginas hasta que recargan.
+    """
+    target = _flat_trees_path(name, source_digest, models_dir)
+    if not target.exists():
+        staging = target.with_name(f".{target.name}.tmp-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        engine.save(staging)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another process published the same version first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    for previous in target.parent.glob(f"{name}-*"):
+        if previous != target:
+            shutil.rmtree(previous, ignore_errors=True)
+    return target
+
+
+def _load_flat_trees(name: str, source_digest: str) -> Optional[FlatTreeEnsemble]:
+    """Ensemble mapeado en memoria para estos artefactos, o None si no se exportó o no se puede leer."""
+    if not (MMAP_ARTIFACTS_ENABLED and FLAT_TREES_ENABLED):
+        return None
+    path = _flat_trees_path(name, source_digest)
+    if not path.exists():
+        return None
+    try:
+        return FlatTreeEnsemble.load(path, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def export_flat_trees(name: str, models_dir: Optional[Path] = None) -> Optional[Path]:
+    """
+    Aplana el modelo `name` de `models_dir` (por defecto `MODELS_DIR`) y guarda
+    sus arrays para cargarlos mapeados en memoria.
+
+    Salvo con `ML_FUSE_SCALER=0`, el scaler se fusiona en los umbrales
+    (`fuse_scaler`), así que los arrays guardados reciben las features sin escalar.
+
+    Returns:
+        Path: Directorio generado, o None si el modelo no es un ensemble de
+            árboles soportado
+
+    Raises:
+        FileNotFoundError: Si los archivos del modelo no existen
+    """
+    model, scaler, _ = _load_model_artifacts(name, models_dir)
+    predictor = build_predictor(model)
+    if not isinstance(predictor, FlatTreeEnsemble):
+        return None
+    if FUSE_SCALER_ENABLED:
+        predictor = fuse_scaler(predictor, scaler) or predictor
+    return _save_flat_trees(name, predictor, _artifact_digest(name, models_dir), models_dir)
+
+
+# ==================== Artefacto nativo ====================
+
+def _load_native_model(name: str) -> Optional[NativeModel]:
+    """
+    Artefacto nativo de `name`, o None si no existe, no se puede leer o quedó desactualizado.
+
+    Si los artefactos joblib están presentes, también se ignora cuando su
+    digest no coincide con el que se exportó (se reentrenó sin volver a
+    exportar) o cuando el predictor que guarda está desactivado: con
+    `ML_FUSE_SCALER=0` (el archivo siempre lleva el scaler fusionado) o, si es
+    un `FlatTreeEnsemble`, con `ML_FLAT_TREES=0`. Si no están, el artefacto
+    nativo es la única fuente del modelo y se sirve igualmente.
+    """
+    if not NATIVE_ARTIFACTS_ENABLED:
+        return None
+    path = MODELS_DIR / NATIVE_MODEL_FILES[name]
+    if not path.exists():
+        return None
+    try:
+        native = load_model(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if not native.predictor.raw_input:
+        # The file carries no scaler, so only fused predictors can be served from it
+        return None
+    if all((MODELS_DIR / filename).exists() for filename in MODEL_ARTIFACTS[name]):
+        if native.source_digest != _artifact_digest(name):
+            return None
+        # The kill switches apply whenever there is a joblib model to fall back to
+        if not FUSE_SCALER_ENABLED:
+            return None
+        if isinstance(native.predictor, FlatTreeEnsemble) and not FLAT_TREES_ENABLED:
+            return None
+    return native
+
+
+def export_native_model(name: str, models_dir: Optional[Path] = None) -> Optional[Path]:
+    """
+    Exporta el modelo `name` de `models_dir` (por defecto `MODELS_DIR`) al
+    formato nativo (`ml/model_format.py`).
+
+    El archivo contiene el predictor NumPy (`FlatTreeEnsemble` o
+    `LinearPredictor`) con el scaler fusionado y la configuración de features,
+    así que el servidor lo carga sin deserializar joblib ni importar sklearn.
+
+    Returns:
+        Path: Archivo generado, o None si el modelo no se puede convertir a un
+            predictor NumPy o el scaler no se puede fusionar
+
+    Raises:
+        FileNotFoundError: Si los archivos del modelo no existen
+
+    Example:
+        >>> export_native_model('churn')
+        PosixPath('.../ml/models/churn_model.cim')
+    """
+    models_dir = models_dir or MODELS_DIR
+    model, scaler, config = _load_model_artifacts(name, models_dir)
+    predictor = build_numpy_predictor(model)
+    fused = fuse_scaler(predictor, scaler) if predictor is not None else None
+    if fused is None:
+        return None
+    return save_model(
+        models_dir / NATIVE_MODEL_FILES[name], name, fused, config, _artifact_digest(name, models_dir)
+    )
+
+
+# ==================== Registro de modelos en memoria ====================
+
+@dataclass
+class ModelBundle:
+    """
+    Modelo, scaler, configuración y encoder cargados en memoria para un nombre de modelo.
+
+    Si el scaler está fusionado en el predictor (`scaler_fused`), `scaler` es
+    None y `model` es el propio predictor, que recibe las features sin escalar.
+    """
+    name: str
+    model: Any
+    scaler: Optional[Any]
+    config: Dict[str, Any]
+    encoder: Any
+    version: int
+    signature: Tuple
+    loaded_at: float
+    load_seconds: float
+    predictor: Any = None
+    lookup: Optional[LeadLookupTable] = None
+    memory_mapped: bool = False
+    scaler_fused: bool = False
+    # Where the predictor came from: 'native', 'flat_trees' or 'joblib'
+    artifact: str = 'joblib'
+
+
+class ModelRegistry:
+    """
+    Mantiene en memoria los modelos cargados, una vez por proceso.
+
+    Cada modelo se carga desde `MODELS_DIR` la primera vez que se pide y se
+    reutiliza en las siguientes llamadas. Como máximo cada `check_interval`
+    segundos se comprueba (mtime y tamaño) si los archivos del modelo cambiaron;
+    solo en ese caso se vuelve a cargar. Si la recarga falla (por ejemplo,
+    mientras el script de entrenamiento reescribe los archivos) se sigue
+    sirviendo la versión anterior y se reintenta en la siguiente comprobación.
+
+    Los callbacks registrados con `add_reload_listener` reciben el nombre del
+    modelo cada vez que se carga una versión nueva o se invalida.
+
+    Si existen los arrays aplanados de la versión actual (`export_flat_trees`)
+    se mapean en memoria y el modelo sklearn no se deserializa; en ese caso
+    `bundle.model` es el propio `FlatTreeEnsemble`. Si no existen y el modelo
+    se puede aplanar, el primer proceso que lo carga los exporta, para que el
+    resto de workers del host compartan la misma copia.
+
+    Salvo con `ML_FUSE_SCALER=0`, el StandardScaler se incorpora al predictor
+    (`fuse_scaler`) y la inferencia no llama a `scaler.transform`.
+
+    Por delante de todo lo anterior, si existe el artefacto nativo del modelo
+    (`export_native_model`) y corresponde a los artefactos joblib (o estos no
+    existen), se carga solo ese archivo, sin joblib ni sklearn.
+
+    Example:
+        >>> registry = ModelRegistry()
+        >>> bundle = registry.get('churn')
+        >>> print(bundle.version, bundle.config['feature_columns'])
+    """
+
+    def __init__(self, check_interval: float = MODEL_RELOAD_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._bundles: Dict[str, ModelBundle] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.RLock()
+
+    def add_reload_listener(self, callback: Callable[[str], None]) -> None:
+        """Registra `callback(name)`, llamado tras cargar o invalidar el modelo `name`."""
+        self._listeners.append(callback)
+
+    def _notify(self, name: str) -> None:
+        for callback in self._listeners:
+            callback(name)
+
+    @staticmethod
+    def _signature(name: str) -> Tuple:
+        signature = []
+        for filename in MODEL_ARTIFACTS[name] + (NATIVE_MODEL_FILES[name],):
+            path = MODELS_DIR / filename
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                signature.append((str(path), None, None))
+                continue
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get(self, name: str) -> ModelBundle:
+        """
+        Devuelve el bundle de `name`, cargándolo o recargándolo si hace falta.
+
+        Raises:
+            KeyError: Si `name` no es un modelo conocido
+            FileNotFoundError: Si los archivos del modelo no existen y no hay
+                una versión previa cargada
+        """
+        if name not in MODEL_ARTIFACTS:
+            raise KeyError(f"Modelo desconocido: {name}")
+
+        bundle = self._bundles.get(name)
+        if bundle is not None and time.monotonic() - self._checked_at.get(name, 0.0) < self.check_interval:
+            return bundle
+
+        with self._lock:
+            bundle = self._bundles.get(name)
+            signature = self._signature(name)
+            if bundle is not None and bundle.signature == signature:
+                self._checked_at[name] = time.monotonic()
+                return bundle
+
+            try:
+                bundle = self._load(name, signature)
+            except Exception:
+                if bundle is None:
+                    raise
+                # Keep serving the previous version; retry on the next check
+                self._checked_at[name] = time.monotonic()
+                return bundle
+
+            # Files rewritten while loading: accept this load but check again on next call
+            self._checked_at[name] = time.monotonic() if self._signature(name) == signature else 0.0
+            return bundle
+
+    def _load(self, name: str, signature: Tuple) -> ModelBundle:
+        start = time.perf_counter()
+        native = _load_native_model(name)
+        if native is not None:
+            model = predictor = native.predictor
+            scaler, config, source_digest = None, native.feature_config, native.source_digest
+            scaler_fused, artifact = True, 'native'
+        else:
+            _, scaler, config = _load_model_artifacts(name, load_model=False)
+            source_digest = _artifact_digest(name)
+            predictor = _load_flat_trees(name, source_digest)
+            if predictor is not None:
+                model = predictor
+                scaler_fused, artifact = predictor.raw_input, 'flat_trees'
+            else:
+                model = joblib.load(MODELS_DIR / MODEL_ARTIFACTS[name][0])
+                predictor = build_predictor(model)
+                fused = fuse_scaler(predictor, scaler) if FUSE_SCALER_ENABLED else None
+                scaler_fused, artifact = fused is not None, 'joblib'
+                if scaler_fused:
+                    predictor = fused
+                if MMAP_ARTIFACTS_ENABLED and isinstance(predictor, FlatTreeEnsemble):
+                    try:
+                        predictor = FlatTreeEnsemble.load(_save_flat_trees(name, predictor, source_digest))
+                    except OSError:
+                        # Read-only models dir: serve from private memory
+                        pass
+        if scaler_fused:
+            # Keep model/scaler consistent for get_*_model callers: both take raw features
+            model, scaler = predictor, None
+        encoder = FEATURE_ENCODERS[name](config)
+
+        lookup = (
+            _get_lead_lookup_table(predictor, scaler, encoder, source_digest)
+            if name == 'lead_quality' else None
+        )
+        version = self._versions.get(name, 0) + 1
+        bundle = ModelBundle(
+            name=name,
+            model=model,
+            scaler=scaler,
+            config=config,
+            encoder=encoder,
+            predictor=predictor,
+            lookup=lookup,
+            memory_mapped=artifact == 'native' or getattr(predictor, 'mapped_from', None) is not None,
+            scaler_fused=scaler_fused,
+            artifact=artifact,
+            version=version,
+            signature=signature,
+            loaded_at=time.time(),
+            load_seconds=time.perf_counter() - start
+        )
+        self._versions[name] = version
+        self._bundles[name] = bundle
+        self._notify(name)
+        return bundle
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Descarta el modelo `name` (o todos) para forzar su recarga en la próxima llamada."""
+        with self._lock:
+            names = [name] if name is not None else list(self._bundles)
+            for model_name in names:
+                self._bundles.pop(model_name, None)
+                self._checked_at.pop(model_name, None)
+                self._notify(model_name)
+
+    def status(self) -> Dict[str, Any]:
+        """Resumen de los modelos cargados (versión, fecha y duración de carga)."""
+        return {
+            name: {
+                'version': bundle.version,
+                'loaded_at': bundle.loaded_at,
+                'load_seconds': bundle.load_seconds,
+                'predictor': type(bundle.predictor).__name__,
+                'lookup_table': bundle.lookup is not None,
+                'memory_mapped': bundle.memory_mapped,
+                'scaler_fused': bundle.scaler_fused,
+                'artifact': bundle.artifact
+            }
+            for name, bundle in self._bundles.items()
+        }
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Devuelve el registro de modelos compartido por el proceso."""
+    return _registry
+
+
+def get_lead_quality_model() -> Tuple[Any, Any, Dict]:
+    """
+    Como `load_lead_quality_model`, pero usando la copia en memoria del registro.
+
+    Returns:
+        tuple: (model, scaler, feature_config); scaler es None si está
+            fusionado en el modelo, que entonces recibe las features sin escalar
+    """
+    bundle = _registry.get('lead_quality')
+    return bundle.model, bundle.scaler, bundle.config
+
+
+def get_churn_model() -> Tuple[Any, Any, Dict]:
+    """
+    Como `load_churn_model`, pero usando la copia en memoria del registro.
+
+    Returns:
+        tuple: (model, scaler, feature_config); scaler es None si está
+            fusionado en el modelo, que entonces recibe las features sin escalar
+    """
+    bundle = _registry.get('churn')
+    return bundle.model, bundle.scaler, bundle.config
+
+
+# ==================== Caché de predicciones ====================
+
+class PredictionCache:
+    """
+    Caché LRU acotada, con expiración opcional, para resultados de predicción.
+
+    Las claves se derivan del vector de features ya codificado y de la versión
+    del modelo (`make_key`), así que dos requests con las mismas features
+    comparten entrada y un modelo recargado nunca sirve resultados viejos.
+
+    Args:
+        max_size: Máximo de entradas; al superarlo se descarta la menos usada (0 = desactivada)
+        ttl: Segundos de vida de cada entrada (0 = sin expiración)
+
+    Example:
+        >>> cache = PredictionCache(max_size=10000, ttl=300)
+        >>> key = PredictionCache.make_key(features[0], bundle.version)
+        >>> cache.put(key, {'churn_probability': 0.12})
+        >>> cache.get(key)
+        {'churn_probability': 0.12}
+    """
+
+    def __init__(self, max_size: int, ttl: float = 0.0):
+        self.max_size = max(0, max_size)
+        self.ttl = max(0.0, ttl)
+        self._entries: 'OrderedDict[bytes, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(features: np.ndarray, version: int) -> bytes:
+        """Hash del vector de features codificado y de la versión del modelo."""
+        digest = hashlib.blake2b(np.ascontiguousarray(features, dtype=np.float64).tobytes(), digest_size=16)
+        digest.update(version.to_bytes(8, 'little'))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Devuelve el valor cacheado (marcándolo como usado) o None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        """Guarda `value`, descartando las entradas menos usadas si se supera `max_size`."""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Descarta todas las entradas."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño y contadores de aciertos, fallos y descartes."""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+
+_churn_cache = PredictionCache(CHURN_CACHE_SIZE, CHURN_CACHE_TTL)
+# A new churn model makes every cached probability stale
+_registry.add_reload_listener(lambda name: _churn_cache.clear() if name == 'churn' else None)
+
+
+def get_churn_cache() -> PredictionCache:
+    """Devuelve la caché de predicciones de churn del proceso."""
+    return _churn_cache
+
+
+# ==================== Instrumentación ====================
+
+# callback(model, stage, seconds) notified of each inference stage; None = not reported
+_stage_observer: Optional[Callable[[str, str, float], None]] = None
+
+
+def set_stage_observer(observer: Optional[Callable[[str, str, float], None]]) -> None:
+    """
+    Registra `observer(model, stage, seconds)`, llamado tras cada etapa de inferencia.
+
+    Las etapas son 'encode', 'scale' (solo si el scaler no está fusionado),
+    'predict_proba' y, para leads con tabla precalculada, 'lookup'. Se
+    reportan una vez por llamada vectorizada (un micro-lote o un bloque de un
+    batch), no por registro. None lo desactiva.
+    """
+    global _stage_observer
+    _stage_observer = observer
+
+
+def _observe(name: str, stage: str, start: float) -> float:
+    """Reporta la etapa `stage` que empezó en `start` y devuelve el instante actual."""
+    now = time.perf_counter()
+    observer = _stage_observer
+    if observer is not None:
+        observer(name, stage, now - start)
+    return now
+
+
+# ==================== Predicción ====================
+
+# Quality labels indexed by the lead model class (0, 1, 2)
+LEAD_QUALITY_LABELS = ['frío', 'tibio', 'caliente']
+
+
+def _predict_proba(name: str, predictor: Any, scaler: Optional[Any], features: np.ndarray) -> np.ndarray:
+    """Escala la matriz de features (salvo scaler fusionado, None) y devuelve `predict_proba`."""
+    if len(features) == 0:
+        return np.empty((0, len(predictor.classes_)), dtype=np.float64)
+    start = time.perf_counter()
+    if scaler is not None:
+        features = scaler.transform(features)
+        start = _observe(name, 'scale', start)
+    probabilities = predictor.predict_proba(features)
+    _observe(name, 'predict_proba', start)
+    return probabilities
+
+
+def _predict_leads(bundle: ModelBundle, leads_list: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Devuelve (probabilidades, clase predicha) para una lista de leads."""
+    start = time.perf_counter()
+    if bundle.lookup is not None:
+        indices = bundle.encoder.encode_indices(leads_list)
+        start = _observe(bundle.name, 'encode', start)
+        probabilities = bundle.lookup.lookup(indices)
+        _observe(bundle.name, 'lookup', start)
+        classes = bundle.lookup.classes
+    else:
+        features = bundle.encoder.transform(leads_list)
+        _observe(bundle.name, 'encode', start)
+        probabilities = _predict_proba(bundle.name, bundle.predictor, bundle.scaler, features)
+        classes = bundle.predictor.classes_
+    predicted_class = classes[np.argmax(probabilities, axis=1)] if len(probabilities) else np.empty(0, dtype=int)
+    return probabilities, predicted_class
 
 
 def predict_lead_quality(sample_dict: dict) -> Dict[str, Any]:
@@ -111,56 +1066,7 @@ def predict_lead_quality(sample_dict: dict) -> Dict[str, Any]:
         >>> result = predict_lead_quality(lead)
         >>> print(f"Calidad: {result['quality_label']}, Score: {result['quality_score']:.2f}")
     """
-    model, scaler, config = load_lead_quality_model()
-    
-    # Get mappings from config
-    presupuesto_map = config['presupuesto_map']
-    urgencia_map = config['urgencia_map']
-    tipo_servicio_classes = config['tipo_servicio_classes']
-    ciudad_classes = config['ciudad_classes']
-    calidad_reverse_map = {int(k): v for k, v in config['calidad_reverse_map'].items()}
-    
-    # Create encoders for categorical variables
-    presupuesto_val = presupuesto_map.get(sample_dict.get('presupuesto', 'Menos de 5M'), 2.5)
-    urgencia_val = urgencia_map.get(sample_dict.get('urgencia', 'Baja'), 1)
-    
-    # Encode tipo_servicio
-    tipo_servicio = sample_dict.get('tipo_servicio', tipo_servicio_classes[0])
-    tipo_servicio_val = tipo_servicio_classes.index(tipo_servicio) if tipo_servicio in tipo_servicio_classes else 0
-    
-    # Encode ciudad
-    ciudad = sample_dict.get('ciudad', ciudad_classes[0])
-    ciudad_val = ciudad_classes.index(ciudad) if ciudad in ciudad_classes else 0
-    
-    # Prepare features
-    features = np.array([[
-        presupuesto_val,
-        urgencia_val,
-        tipo_servicio_val,
-        ciudad_val
-    ]])
-    
-    # Scale and predict
-    features_scaled = scaler.transform(features)
-    probabilities = model.predict_proba(features_scaled)[0]
-    predicted_class = model.predict(features_scaled)[0]
-    
-    # Map to quality labels
-    quality_labels = ['frío', 'tibio', 'caliente']
-    quality_label = quality_labels[predicted_class]
-    
-    # Get probability of being 'caliente' (high quality)
-    quality_score = float(probabilities[2])  # Probability of class 2 (caliente)
-    
-    return {
-        'quality_label': quality_label,
-        'quality_score': quality_score,
-        'probabilities': {
-            'frío': float(probabilities[0]),
-            'tibio': float(probabilities[1]),
-            'caliente': float(probabilities[2])
-        }
-    }
+    return predict_lead_quality_many([sample_dict])[0]
 
 
 def predict_churn(sample_dict: dict) -> Dict[str, Any]:
@@ -194,37 +1100,78 @@ def predict_churn(sample_dict: dict) -> Dict[str, Any]:
         >>> result = predict_churn(client)
         >>> print(f"Probabilidad de churn: {result['churn_probability']:.1%}")
     """
-    model, scaler, config = load_churn_model()
+    return predict_churn_many([sample_dict])[0]
+
+
+def predict_lead_quality_many(leads_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Predice la calidad de varios leads con una sola llamada al modelo.
     
-    # Get mappings from config
-    engagement_map = config['engagement_map']
-    satisfaccion_map = config['satisfaccion_map']
+    Args:
+        leads_list: Lista de diccionarios con los campos de `predict_lead_quality`
+    
+    Returns:
+        list: Un diccionario por lead, con el mismo formato que `predict_lead_quality`
+    """
+    bundle = _registry.get('lead_quality')
+    
+    # Encode, scale and predict (or look up the precomputed table)
+    probabilities, predicted_class = _predict_leads(bundle, leads_list)
     
-    # Encode categorical variables
-    engagement_val = engagement_map.get(sample_dict.get('engagement', 'Medio'), 1)
-    satisfaccion_val = satisfaccion_map.get(sample_dict.get('satisfaccion', 'Medio'), 1)
+    return [
+        {
+            'quality_label': LEAD_QUALITY_LABELS[label],
+            'quality_score': caliente,  # Probability of class 2 (caliente)
+            'probabilities': {
+                'frío': frio,
+                'tibio': tibio,
+                'caliente': caliente
+            }
+        }
+        for label, (frio, tibio, caliente) in zip(predicted_class.tolist(), probabilities.tolist())
+    ]
+
+
+def predict_churn_many(clients_list: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
+    """
+    Predice la probabilidad de churn de varios clientes con una sola llamada al modelo.
     
-    # Prepare features
-    features = np.array([[
-        engagement_val,
-        satisfaccion_val,
-        sample_dict.get('dias_ultima_compra', 30),
-        sample_dict.get('total_compras', 0),
-        sample_dict.get('promedio_compra', 0),
-        sample_dict.get('num_transacciones', 0),
-        sample_dict.get('std_compra', 0)
-    ]])
+    Los clientes cuyas features codificadas ya se puntuaron con la versión
+    actual del modelo se responden desde la caché (`get_churn_cache`), sin
+    escalar ni invocar el modelo; solo los demás pasan por `predict_proba`.
     
-    # Scale and predict
-    features_scaled = scaler.transform(features)
-    churn_probability = model.predict_proba(features_scaled)[0][1]
+    Args:
+        clients_list: Lista de diccionarios con los campos de `predict_churn`
+        use_cache: Consultar y poblar la caché de predicciones (False para
+            scoring masivo que no se repite)
     
-    return {
-        'churn_probability': float(churn_probability)
-    }
+    Returns:
+        list: Un diccionario por cliente, con el mismo formato que `predict_churn`
+    """
+    bundle = _registry.get('churn')
+    start = time.perf_counter()
+    features = bundle.encoder.transform(clients_list)
+    _observe(bundle.name, 'encode', start)
+    
+    if not (use_cache and _churn_cache.enabled):
+        probabilities = _predict_proba(bundle.name, bundle.predictor, bundle.scaler, features)
+        return [{'churn_probability': churn_probability} for churn_probability in probabilities[:, 1].tolist()]
+    
+    keys = [PredictionCache.make_key(row, bundle.version) for row in features]
+    results: List[Optional[Dict[str, Any]]] = [_churn_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        # Scale and predict only the cache misses, in one call
+        probabilities = _predict_proba(bundle.name, bundle.predictor, bundle.scaler, features[missing])
+        for i, churn_probability in zip(missing, probabilities[:, 1].tolist()):
+            results[i] = {'churn_probability': churn_probability}
+            _churn_cache.put(keys[i], results[i])
+    
+    # Copies, so callers can't mutate the cached entries
+    return [dict(result) for result in results]
 
 
-def batch_predict_leads(leads_list: List[Dict[str, Any]]) -> pd.DataFrame:
+def batch_predict_leads(leads_list: List[Dict[str, Any]]) -> 'pd.DataFrame':
     """
     Predice calidad para múltiples leads en batch.
     
@@ -245,22 +1192,24 @@ def batch_predict_leads(leads_list: List[Dict[str, Any]]) -> pd.DataFrame:
         >>> df_results = batch_predict_leads(leads)
         >>> print(df_results[['predicted_quality_label', 'predicted_quality_score']])
     """
-    results = []
-    for lead in leads_list:
-        prediction = predict_lead_quality(lead)
-        results.append({
-            **lead,
-            'predicted_quality_label': prediction['quality_label'],
-            'predicted_quality_score': prediction['quality_score'],
-            'prob_frio': prediction['probabilities']['frío'],
-            'prob_tibio': prediction['probabilities']['tibio'],
-            'prob_caliente': prediction['probabilities']['caliente']
-        })
+    import pandas as pd
     
-    return pd.DataFrame(results)
+    bundle = _registry.get('lead_quality')
+    
+    # Encode, scale and predict the whole batch at once
+    probabilities, predicted_class = _predict_leads(bundle, leads_list)
+    
+    df = pd.DataFrame(leads_list)
+    df['predicted_quality_label'] = np.asarray(LEAD_QUALITY_LABELS, dtype=object)[predicted_class.astype(int)]
+    df['predicted_quality_score'] = probabilities[:, 2]
+    df['prob_frio'] = probabilities[:, 0]
+    df['prob_tibio'] = probabilities[:, 1]
+    df['prob_caliente'] = probabilities[:, 2]
+    
+    return df
 
 
-def batch_predict_churn(clients_list: List[Dict[str, Any]]) -> pd.DataFrame:
+def batch_predict_churn(clients_list: List[Dict[str, Any]]) -> 'pd.DataFrame':
     """
     Predice churn para múltiples clientes en batch.
     
@@ -280,12 +1229,61 @@ def batch_predict_churn(clients_list: List[Dict[str, Any]]) -> pd.DataFrame:
         >>> df_churn = batch_predict_churn(clients)
         >>> print(df_churn[['churn_probability']])
     """
-    results = []
-    for client in clients_list:
-        prediction = predict_churn(client)
-        results.append({
-            **client,
-            'churn_probability': prediction['churn_probability']
-        })
+    import pandas as pd
+    
+    bundle = _registry.get('churn')
+    
+    # Encode, scale and predict the whole batch at once
+    probabilities = _predict_proba(bundle.name, bundle.predictor, bundle.scaler, bundle.encoder.transform(clients_list))
+    
+    df = pd.DataFrame(clients_list)
+    df['churn_probability'] = probabilities[:, 1]
+    
+    return df
+
+
+# ==================== Precarga ====================
+
+# Rows scored per model by `warm_up_models`
+WARM_UP_BATCH_SIZE = 8
+
+
+def warm_up_models(names: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Carga los modelos y ejecuta con cada uno una predicción de prueba.
+    
+    Pensado para correr antes de atender tráfico (por ejemplo, en el proceso
+    master de Gunicorn antes del fork de los workers), de modo que la primera
+    request no pague la carga del modelo ni su primera ejecución. La
+    predicción de prueba usa los valores por defecto del encoder y no pasa
+    por la caché de churn.
     
-    return pd.DataFrame(results)
+    Args:
+        names: Modelos a precargar (por defecto, todos)
+    
+    Returns:
+        dict: Por modelo, `load_seconds` y `warmup_seconds`
+    
+    Raises:
+        KeyError: Si algún nombre no es un modelo conocido
+        FileNotFoundError: Si los archivos de algún modelo no existen
+    
+    Example:
+        >>> timings = warm_up_models()
+        >>> print(timings['churn']['load_seconds'])
+    """
+    timings = {}
+    for name in names or list(MODEL_ARTIFACTS):
+        start = time.perf_counter()
+        bundle = _registry.get(name)
+        loaded = time.perf_counter()
+        samples = [dict(bundle.encoder.defaults) for _ in range(WARM_UP_BATCH_SIZE)]
+        if name == 'churn':
+            predict_churn_many(samples, use_cache=False)
+        else:
+            predict_lead_quality_many(samples)
+        timings[name] = {
+            'load_seconds': loaded - start,
+            'warmup_seconds': time.perf_counter() - loaded
+        }
+    return timings
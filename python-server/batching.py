@@ -0,0 +1,162 @@
+"""
+Micro-batching de predicciones individuales - Customer Intelligence ML API
+
+Agrupa los requests individuales que llegan casi al mismo tiempo y los
+puntúa con una sola llamada vectorizada al modelo, de modo que el costo fijo
+de `predict_proba` se paga una vez por lote y no una vez por request.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from executor import ServerOverloadedError
+
+
+class MicroBatcher:
+    """
+    Agrupa predicciones concurrentes en una sola llamada vectorizada.
+
+    Cada `submit` encola un registro y espera su resultado. Una tarea de fondo
+    toma el primer registro de la cola y sigue recogiendo registros hasta
+    completar `max_batch_size` o hasta que pasen `max_wait_ms` milisegundos;
+    entonces llama una vez a `predict_many` con todo el lote y reparte los
+    resultados a los handlers que esperan.
+
+    Si se pasa `runner` (por ejemplo `InferenceExecutor.run`), el lote se
+    ejecuta a través de él en lugar de llamarse en el event loop, con hasta
+    `max_concurrency` lotes en paralelo. Con `max_queue` > 0, `submit` rechaza
+    registros con ServerOverloadedError cuando la cola está llena.
+
+    Example:
+        >>> batcher = MicroBatcher("churn", predict_churn_many, max_batch_size=64, max_wait_ms=2)
+        >>> result = await batcher.submit(sample_dict)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        predict_many: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        runner: Optional[Callable[..., Awaitable[Any]]] = None,
+        max_concurrency: int = 1,
+        max_queue: int = 0,
+        retry_after: int = 1
+    ):
+        self.name = name
+        self.predict_many = predict_many
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.runner = runner
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Stats
+        self.requests = 0
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+        self.rejected = 0
+        self.largest_batch = 0
+        self.total_queue_wait = 0.0
+        self.batch_size_histogram: Dict[int, int] = {}
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            if self._loop is not loop:
+                self._queue = asyncio.Queue()
+                self._loop = loop
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """Encola un registro y espera el resultado de su lote."""
+        self._ensure_worker()
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise ServerOverloadedError(
+                f"Cola de predicciones '{self.name}' llena ({self.max_queue} pendientes)",
+                retry_after=self.retry_after
+            )
+        future = self._loop.create_future()
+        self.requests += 1
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        slots = asyncio.Semaphore(self.max_concurrency)
+        running = set()
+        while True:
+            # While all slots are busy, requests keep accumulating into a larger next batch
+            await slots.acquire()
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = loop.create_task(self._execute(batch))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _execute(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        size = len(batch)
+        self.batches += 1
+        self.processed += size
+        self.largest_batch = max(self.largest_batch, size)
+        bucket = 1 << (size - 1).bit_length()
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+        self.total_queue_wait += sum(started - enqueued for _, _, enqueued in batch)
+
+        items = [item for item, _, _ in batch]
+        try:
+            if self.runner is not None:
+                results = await self.runner(self.predict_many, items)
+            else:
+                results = self.predict_many(items)
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            # The handler may have been cancelled (client disconnected)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de la cola y estadísticas de tamaño de lote."""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "avg_batch_size": round(self.processed / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_queue_wait_ms": round(self.total_queue_wait / self.processed * 1000, 3) if self.processed else 0.0,
+            "batch_size_histogram": {
+                f"<={bucket}": count for bucket, count in sorted(self.batch_size_histogram.items())
+            },
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
@@ -0,0 +1,135 @@
+"""
+Ejecución de inferencia fuera del event loop - Customer Intelligence ML API
+
+La inferencia con sklearn es CPU-bound y bloquearía el event loop de uvicorn
+(incluidos `/health` y los demás requests). Este módulo la ejecuta en un pool
+de threads o de procesos con un límite de trabajos pendientes: cuando el pool
+está saturado los requests se rechazan de inmediato con `Retry-After` en lugar
+de acumularse y disparar la latencia.
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class ServerOverloadedError(Exception):
+    """El servidor no admite más trabajo por ahora; reintentar tras `retry_after` segundos."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Pool acotado para ejecutar funciones de inferencia desde código async.
+
+    Args:
+        kind: 'thread' o 'process'
+        max_workers: Número de threads/procesos del pool
+        max_pending: Máximo de trabajos admitidos a la vez (en ejecución + en cola)
+        retry_after: Segundos sugeridos al cliente cuando se rechaza un trabajo
+
+    El pool se crea en el primer uso, para que un proceso que luego hace fork
+    no herede threads ni procesos hijos.
+
+    Example:
+        >>> executor = InferenceExecutor("thread", max_workers=4, max_pending=64)
+        >>> result = await executor.run(predict_churn, sample_dict)
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        retry_after: int = 1
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de executor inválido: {kind} (usa 'thread' o 'process')")
+        self.kind = kind
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max(1, max_pending)
+        self.retry_after = retry_after
+
+        self._pool: Optional[Executor] = None
+        # Admitted jobs still holding a slot, and calls currently in the pool
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._pool
+
+    def acquire(self) -> None:
+        """
+        Reserva un slot de trabajo admitido; se libera con `release`.
+
+        Un request batch reserva su slot al empezar y lo conserva mientras
+        emite la respuesta, aunque entre chunks no tenga nada en el pool.
+
+        Raises:
+            ServerOverloadedError: Si ya hay `max_pending` trabajos admitidos
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServerOverloadedError(
+                f"Servidor saturado: {self.pending} predicciones en curso",
+                retry_after=self.retry_after
+            )
+        self.pending += 1
+
+    def release(self) -> None:
+        """Libera un slot reservado con `acquire`."""
+        self.pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, admit: bool = True) -> Any:
+        """
+        Ejecuta `fn(*args)` en el pool y espera su resultado.
+
+        Con `admit=True` la llamada reserva un slot mientras dura. Con
+        `admit=False` no lo hace: es trabajo que ya tiene uno (los chunks de
+        un request batch) o que se acota por su cuenta (los lotes del
+        micro-batcher, limitados por su cola y su concurrencia).
+
+        Raises:
+            ServerOverloadedError: Si el pool está saturado y `admit` es True
+        """
+        if admit:
+            self.acquire()
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), partial(fn, *args))
+        finally:
+            self.running -= 1
+            self.completed += 1
+            if admit:
+                self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Ocupación del pool y trabajos rechazados."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self) -> None:
+        """Cierra el pool (se vuelve a crear si se usa de nuevo)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,72 @@
+"""
+Configuración de Gunicorn para producción - Customer Intelligence System
+
+Modo preload-then-fork: el proceso master importa `main`, carga los modelos y
+ejecuta una predicción de prueba una sola vez, y después hace fork de los
+workers Uvicorn. Cada worker hereda los modelos ya cargados por copy-on-write,
+así que usa todos los cores sin pagar su propio arranque en frío. Los workers
+se reciclan cada `max_requests` requests y los reemplazos nacen del mismo
+master ya cargado.
+
+Uso (desde python-server/, Gunicorn lee este archivo automáticamente):
+    gunicorn main:app
+    WEB_CONCURRENCY=8 gunicorn main:app
+"""
+
+import gc
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Each worker process already owns a core; one inference thread per worker avoids oversubscription
+os.environ.setdefault("INFERENCE_WORKERS", "1")
+
+# Per-worker metric files that /metrics aggregates (see metrics.py); must be set before
+# prometheus_client is imported, and start empty so dead workers from a previous run don't count
+_metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "customer-intelligence-metrics")
+)
+os.makedirs(_metrics_dir, exist_ok=True)
+for stale in glob.glob(os.path.join(_metrics_dir, "*.db")):
+    os.remove(stale)
+
+wsgi_app = "main:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "0")) or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app (and ml.utils) in the master so the workers inherit it
+preload_app = True
+
+# Worker recycling, staggered so the workers don't restart all at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+
+
+def when_ready(server):
+    """Precarga los modelos en el master, después de importar la app y antes del primer fork."""
+    import main
+
+    for name, timing in main.warm_up().items():
+        if "error" in timing:
+            server.log.warning("⚠️  %s no precargado: %s", name, timing["error"])
+        else:
+            server.log.info("✅ %s precargado: %s", name, timing)
+
+    # Move everything loaded so far out of the collector's reach: collections in the
+    # workers would otherwise write to these objects' headers and un-share their pages
+    gc.collect()
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    """Descarta los gauges en vivo de un worker que terminó (reciclado o caído)."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,464 @@
+"""
+Prueba de carga HTTP - Customer Intelligence ML API
+
+Levanta `main:app` en local (uvicorn o Gunicorn, en un puerto libre) o apunta
+a un servidor existente, y envía requests a `/predict/lead-quality` y
+`/predict/churn` en lazo abierto: las llegadas siguen un proceso de Poisson a
+la tasa pedida, sin esperar a que terminen las anteriores, y como máximo hay
+`--concurrency` requests en vuelo. La latencia se mide desde el instante en
+que el request debía salir, así que la espera por falta de conexiones libres
+también cuenta (sin "coordinated omission").
+
+Los payloads salen de los ejemplos `json_schema_extra` de los modelos de
+request y de las filas de los CSV de `public/data/`.
+
+El resultado (throughput, latencias p50/p95/p99/p999 y tasa de errores, por
+endpoint y por tasa) se escribe como JSON en stdout o en `--output`; el
+progreso va a stderr.
+
+Uso (desde python-server/):
+    python loadtest.py --rate 50 100 200 --duration 30
+    python loadtest.py --server gunicorn --workers 4 --rate 400 --concurrency 64
+    python loadtest.py --url https://mi-servicio.onrender.com --rate 20 --mix churn=1
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SERVER_DIR = Path(__file__).resolve().parent
+BASE_DIR = SERVER_DIR.parent
+DATA_DIR = BASE_DIR / "public" / "data"
+
+ENDPOINTS = {
+    'lead-quality': '/predict/lead-quality',
+    'churn': '/predict/churn',
+}
+
+PERCENTILES = (('p50', 50.0), ('p95', 95.0), ('p99', 99.0), ('p999', 99.9))
+
+JSON_HEADERS = {'content-type': 'application/json'}
+
+# Seconds to wait for a locally started server to answer /ready
+STARTUP_TIMEOUT = 120.0
+
+
+# ==================== Payloads ====================
+
+def example_payloads() -> Dict[str, Dict[str, Any]]:
+    """Ejemplos `json_schema_extra` de los modelos de request de `main`."""
+    sys.path.insert(0, str(SERVER_DIR))
+    from main import ChurnPredictionRequest, LeadQualityRequest
+
+    return {
+        'lead-quality': LeadQualityRequest.model_config['json_schema_extra']['example'],
+        'churn': ChurnPredictionRequest.model_config['json_schema_extra']['example'],
+    }
+
+
+def _read_csv(path: Path) -> List[Dict[str, str]]:
+    if not path.exists():
+        return []
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _level(value: float, low: float, high: float) -> str:
+    """'Bajo' / 'Medio' / 'Alto' según los cortes `low` y `high`."""
+    return 'Bajo' if value < low else 'Medio' if value < high else 'Alto'
+
+
+def lead_payloads(data_dir: Path, example: Dict[str, Any], rng: random.Random) -> List[Dict[str, Any]]:
+    """
+    Leads del ejemplo y de `leads_historicos.csv`: ciudad, canal, producto y
+    urgencia (1-10 en el CSV, 1-5 en la API) de cada lead, con un presupuesto
+    tomado de `clientes_transacciones.csv`.
+    """
+    budgets = [float(row['presupuesto']) for row in _read_csv(data_dir / 'clientes_transacciones.csv')]
+    payloads = [example]
+    for row in _read_csv(data_dir / 'leads_historicos.csv'):
+        payloads.append({
+            'name': row['empresa_lead'],
+            'city': row['ciudad'],
+            'channel': row['tipo_campana'],
+            'budget': rng.choice(budgets) if budgets else example['budget'],
+            'urgency': min(5, max(1, math.ceil(int(row['urgencia_compra']) / 2))),
+            'service_type': row['programa_producto_interes'],
+        })
+    return payloads
+
+
+def churn_payloads(data_dir: Path, example: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Clientes del ejemplo y de `clientes_comportamiento.csv`: engagement (0-1) y
+    satisfacción (1-5) llevados a niveles, y compras derivadas del valor histórico.
+    """
+    payloads = [example]
+    for row in _read_csv(data_dir / 'clientes_comportamiento.csv'):
+        total = float(row['valor_historico'])
+        purchases = int(row['frecuencia_compra'])
+        payloads.append({
+            'client_id': row['id_cliente'],
+            'engagement': _level(float(row['engagement']), 1 / 3, 2 / 3),
+            'satisfaccion': _level(float(row['satisfaccion']), 3, 4),
+            'dias_ultima_compra': int(row['dias_desde_ultima_compra']),
+            'total_compras': total,
+            'promedio_compra': total / max(purchases, 1),
+            'num_transacciones': purchases,
+            'std_compra': 0,
+        })
+    return payloads
+
+
+def build_payloads(data_dir: Path, endpoints: Sequence[str], rng: random.Random) -> Dict[str, List[bytes]]:
+    """Cuerpos JSON ya serializados por endpoint, para no gastar CPU del cliente en cada envío."""
+    examples = example_payloads()
+    builders = {
+        'lead-quality': lambda: lead_payloads(data_dir, examples['lead-quality'], rng),
+        'churn': lambda: churn_payloads(data_dir, examples['churn']),
+    }
+    return {
+        endpoint: [json.dumps(payload, ensure_ascii=False).encode('utf-8') for payload in builders[endpoint]()]
+        for endpoint in endpoints
+    }
+
+
+# ==================== Servidor local ====================
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server: str, workers: int, log_path: Path) -> Tuple[subprocess.Popen, str]:
+    """
+    Arranca `main:app` en un puerto libre y espera a que `/ready` responda 200.
+
+    Returns:
+        tuple: (proceso, URL base)
+
+    Raises:
+        RuntimeError: Si el servidor termina o no está listo en `STARTUP_TIMEOUT` segundos
+    """
+    import httpx
+
+    port = _free_port()
+    if server == 'gunicorn':
+        # gunicorn.conf.py sets the preload, worker class and recycling; only bind and workers change
+        cmd = [sys.executable, '-m', 'gunicorn', 'main:app', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+               '--no-access-log']
+    log = open(log_path, 'wb')
+    process = subprocess.Popen(cmd, cwd=SERVER_DIR, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (código {process.returncode}); log: {log_path}")
+        try:
+            if httpx.get(f'{url}/ready', timeout=1.0).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    stop_server(process)
+    raise RuntimeError(f"El servidor no estuvo listo en {STARTUP_TIMEOUT:.0f}s; log: {log_path}")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# ==================== Generación de carga ====================
+
+async def _send(
+    client: Any,
+    endpoint: str,
+    body: bytes,
+    scheduled: float,
+    semaphore: asyncio.Semaphore,
+    records: List[Tuple[str, float, float, float, Any]]
+) -> None:
+    import httpx
+
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.post(ENDPOINTS[endpoint], content=body, headers=JSON_HEADERS)
+            outcome: Any = response.status_code
+        except httpx.TimeoutException:
+            outcome = 'timeout'
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+    records.append((endpoint, scheduled, started, time.perf_counter(), outcome))
+
+
+async def run_step(
+    url: str,
+    payloads: Dict[str, List[bytes]],
+    mix: Dict[str, float],
+    rate: float,
+    duration: float,
+    warmup: float,
+    concurrency: int,
+    timeout: float,
+    rng: random.Random
+) -> Dict[str, Any]:
+    """
+    Envía requests en lazo abierto a `rate` requests/s durante `warmup + duration`
+    segundos y resume los que se programaron después del calentamiento.
+    """
+    import httpx
+
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+    records: List[Tuple[str, float, float, float, Any]] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    max_lag = 0.0
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        tasks = []
+        start = time.perf_counter()
+        offset = 0.0
+        while True:
+            offset += rng.expovariate(rate)
+            if offset >= warmup + duration:
+                break
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # The client itself can't keep up with the arrival rate
+                max_lag = max(max_lag, -delay)
+            endpoint = rng.choices(endpoints, weights)[0]
+            body = rng.choice(payloads[endpoint])
+            tasks.append(asyncio.create_task(_send(client, endpoint, body, scheduled, semaphore, records)))
+        await asyncio.gather(*tasks)
+
+    window = (start + warmup, start + warmup + duration)
+    return {
+        'rate': rate,
+        'duration_seconds': duration,
+        'client_max_lag_ms': round(max_lag * 1000, 3),
+        'all': summarize(records, window),
+        'endpoints': {
+            endpoint: summarize([record for record in records if record[0] == endpoint], window)
+            for endpoint in endpoints
+        }
+    }
+
+
+# ==================== Resumen ====================
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Percentil `q` (0-100) con interpolación lineal; None si no hay valores."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _latency_summary(seconds: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(seconds)
+    summary = {name: percentile(values, q) for name, q in PERCENTILES}
+    summary['mean'] = sum(values) / len(values) if values else None
+    summary['max'] = values[-1] if values else None
+    return {name: round(value * 1000, 3) if value is not None else None for name, value in summary.items()}
+
+
+def _is_ok(outcome: Any) -> bool:
+    return isinstance(outcome, int) and 200 <= outcome < 300
+
+
+def summarize(records: List[Tuple[str, float, float, float, Any]], window: Tuple[float, float]) -> Dict[str, Any]:
+    """
+    Throughput, errores y latencias (ms) de los requests programados dentro de `window`.
+
+    `throughput_rps` y `ok_rps` cuentan las respuestas recibidas dentro de la
+    ventana (lo que el servidor realmente despachó, no la tasa ofrecida).
+    `latency_ms` va desde que el request debía salir hasta la respuesta;
+    `service_ms`, desde que realmente salió (sin la espera por conexión libre).
+    """
+    window_start, window_end = window
+    duration = window_end - window_start
+    completed = [record for record in records if window_start <= record[3] < window_end]
+    records = [record for record in records if window_start <= record[1] < window_end]
+
+    errors: Dict[str, int] = {}
+    ok = 0
+    for _, _, _, _, outcome in records:
+        if _is_ok(outcome):
+            ok += 1
+        else:
+            errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+    total = len(records)
+    return {
+        'requests': total,
+        'ok': ok,
+        'errors': errors,
+        'error_rate': round((total - ok) / total, 6) if total else 0.0,
+        'throughput_rps': round(len(completed) / duration, 3),
+        'ok_rps': round(sum(1 for record in completed if _is_ok(record[4])) / duration, 3),
+        'latency_ms': _latency_summary([finished - scheduled for _, scheduled, _, finished, _ in records]),
+        'service_ms': _latency_summary([finished - started for _, _, started, finished, _ in records])
+    }
+
+
+def _print_step(step: Dict[str, Any]) -> None:
+    summary = step['all']
+    latency = summary['latency_ms']
+    print(
+        f"   • {step['rate']:g} req/s → {summary['ok_rps']:.1f} ok/s | "
+        f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms p999={latency['p999']}ms | "
+        f"errores={summary['error_rate']:.2%}",
+        file=sys.stderr
+    )
+    if step['client_max_lag_ms'] > 100:
+        print(f"   ⚠️  El cliente se retrasó hasta {step['client_max_lag_ms']:.0f}ms: "
+              "la tasa real fue menor que la pedida", file=sys.stderr)
+
+
+def _server_info(url: str) -> Optional[Dict[str, Any]]:
+    """`/health` al final de la prueba (memoria del proceso, modelos), si responde."""
+    import httpx
+
+    try:
+        response = httpx.get(f'{url}/health', timeout=5.0)
+        return response.json() if response.status_code == 200 else None
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+# ==================== CLI ====================
+
+def _parse_mix(pairs: Sequence[str]) -> Dict[str, float]:
+    mix = {}
+    for pair in pairs:
+        endpoint, sep, weight = pair.partition('=')
+        if not sep or endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(
+                f"Mezcla inválida: '{pair}' (usa endpoint=peso, con endpoint en {sorted(ENDPOINTS)})"
+            )
+        try:
+            mix[endpoint] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Peso inválido en '{pair}'")
+    if not mix or sum(mix.values()) <= 0 or min(mix.values()) < 0:
+        raise argparse.ArgumentTypeError("La mezcla necesita al menos un endpoint con peso positivo")
+    return {endpoint: weight for endpoint, weight in mix.items() if weight > 0}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Prueba de carga en lazo abierto de los endpoints de predicción."
+    )
+    parser.add_argument('--url', default=None,
+                        help="Servidor ya en marcha (por defecto se arranca main:app en local)")
+    parser.add_argument('--server', choices=['uvicorn', 'gunicorn'], default='uvicorn',
+                        help="Cómo arrancar el servidor local")
+    parser.add_argument('--workers', type=int, default=1, help="Workers de Gunicorn (con --server gunicorn)")
+    parser.add_argument('--rate', type=float, nargs='+', default=[50.0],
+                        help="Llegadas por segundo; varias tasas se prueban en orden")
+    parser.add_argument('--duration', type=float, default=30.0, help="Segundos medidos por tasa")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Segundos iniciales de cada tasa que no se miden")
+    parser.add_argument('--concurrency', type=int, default=32, help="Máximo de requests en vuelo")
+    parser.add_argument('--mix', action='append', default=[], metavar='ENDPOINT=PESO',
+                        help="Proporción de cada endpoint (repetible), p. ej. lead-quality=3 churn=1")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Timeout por request en segundos")
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR, help="Directorio de los CSV de payloads")
+    parser.add_argument('--seed', type=int, default=42, help="Semilla de llegadas y payloads")
+    parser.add_argument('--output', type=Path, default=None, help="Archivo JSON de resultados (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = _parse_mix(args.mix or ['lead-quality=1', 'churn=1'])
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if min(args.rate) <= 0 or args.duration <= 0 or args.concurrency < 1:
+        parser.error("--rate, --duration y --concurrency deben ser positivos")
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        print("❌ La prueba de carga requiere httpx. Instálalo con: pip install httpx", file=sys.stderr)
+        return 1
+
+    rng = random.Random(args.seed)
+    payloads = build_payloads(args.data_dir, list(mix), rng)
+    print("📦 Payloads: " + ", ".join(f"{endpoint}={len(bodies)}" for endpoint, bodies in payloads.items()),
+          file=sys.stderr)
+
+    process = None
+    url = args.url
+    if url is None:
+        log_path = Path(tempfile.gettempdir()) / f"loadtest-server-{os.getpid()}.log"
+        print(f"🚀 Arrancando main:app con {args.server} (log: {log_path})...", file=sys.stderr)
+        try:
+            process, url = start_server(args.server, args.workers, log_path)
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+    print(f"🎯 {url} | concurrencia {args.concurrency} | {args.duration:g}s por tasa", file=sys.stderr)
+
+    try:
+        steps = []
+        for rate in args.rate:
+            steps.append(asyncio.run(run_step(
+                url, payloads, mix, rate, args.duration, args.warmup, args.concurrency, args.timeout, rng
+            )))
+            _print_step(steps[-1])
+        server = _server_info(url)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report = {
+        'target': args.url or f'local ({args.server}, {args.workers if args.server == "gunicorn" else 1} workers)',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'warmup_seconds': args.warmup,
+            'timeout_seconds': args.timeout,
+            'mix': mix,
+            'seed': args.seed,
+            'client_cpu_count': os.cpu_count()
+        },
+        'steps': steps,
+        'server': server
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output is not None:
+        args.output.write_text(output + '\n', encoding='utf-8')
+        print(f"💾 Resultados guardados: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
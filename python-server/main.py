@@ -6,28 +6,182 @@ Este servidor expone endpoints para predicción de calidad de leads y churn
 usando los modelos entrenados en /ml/models/
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator, validator
+from typing import Optional, Dict, Any, AsyncIterator, Callable, List, Tuple, Type, Union
+import asyncio
+import json
+import os
+import secrets
 import sys
+import time
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
 
 # Add parent directory to path to import ml.utils
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 try:
-    from ml.utils import predict_lead_quality, predict_churn
+    from ml.utils import (
+        predict_lead_quality,
+        predict_churn,
+        predict_lead_quality_many,
+        predict_churn_many,
+        get_model_registry,
+        get_churn_cache,
+        set_stage_observer,
+        warm_up_models
+    )
 except ImportError as e:
     print(f"⚠️  Error importando ml.utils: {e}")
     print("Asegúrate de que los modelos estén entrenados en /ml/models/")
     predict_lead_quality = None
     predict_churn = None
+    predict_lead_quality_many = None
+    predict_churn_many = None
+    get_model_registry = None
+    get_churn_cache = None
+    warm_up_models = None
+    set_stage_observer = None
+
+try:
+    from ml.feature_store import (
+        ClientFeatureIndexLoader,
+        DEFAULT_BEHAVIOR_CSV,
+        DEFAULT_STORE_PATH,
+        DEFAULT_TRANSACTIONS_CSV
+    )
+except ImportError as e:
+    print(f"⚠️  Error importando ml.feature_store: {e}")
+    ClientFeatureIndexLoader = None
+
+from batching import MicroBatcher
+from executor import InferenceExecutor, ServerOverloadedError
+from metrics import MetricsMiddleware, observe_since, observe_stage, render_metrics, request_started_at
+from profiling import ProfilingMiddleware, SamplingProfiler
+
+# Records scored per vectorized inference call in the batch endpoints
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", "1000"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Inference runs in a bounded pool so the event loop stays responsive
+INFERENCE_EXECUTOR = os.environ.get("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0")) or None
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "64"))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "1"))
+
+inference_executor = InferenceExecutor(
+    INFERENCE_EXECUTOR,
+    max_workers=INFERENCE_WORKERS,
+    max_pending=INFERENCE_MAX_PENDING,
+    retry_after=RETRY_AFTER_SECONDS
+)
+
+# Micro-batching of concurrent single-record predictions
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "1") == "1"
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", "32"))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", "2"))
+# The per-model queue is what bounds single-record requests (INFERENCE_MAX_PENDING counts
+# pool jobs, and each micro-batch is one). By default a queued request waits at most
+# MICROBATCH_QUEUE_ROUNDS full batches on every inference worker.
+MICROBATCH_QUEUE_ROUNDS = 4
+MICROBATCH_MAX_QUEUE = (
+    int(os.environ.get("MICROBATCH_MAX_QUEUE", "0"))
+    or MICROBATCH_MAX_SIZE * inference_executor.max_workers * MICROBATCH_QUEUE_ROUNDS
+)
+
+
+def build_batcher(name: str, predict_many: Callable[[List[Any]], List[Any]]) -> MicroBatcher:
+    """Crea el micro-batcher de un modelo, ejecutando sus lotes en el pool de inferencia"""
+    return MicroBatcher(
+        name,
+        predict_many,
+        max_batch_size=MICROBATCH_MAX_SIZE,
+        max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+        runner=partial(inference_executor.run, admit=False),
+        max_concurrency=inference_executor.max_workers,
+        max_queue=MICROBATCH_MAX_QUEUE,
+        retry_after=RETRY_AFTER_SECONDS
+    )
+
+
+# Per-stage inference timings (encode, scale, predict_proba) go to /metrics
+if set_stage_observer is not None:
+    set_stage_observer(observe_stage)
+
+batchers: Dict[str, MicroBatcher] = {}
+if MICROBATCH_ENABLED and predict_lead_quality_many is not None:
+    batchers["lead_quality"] = build_batcher("lead_quality", predict_lead_quality_many)
+if MICROBATCH_ENABLED and predict_churn_many is not None:
+    batchers["churn"] = build_batcher("churn", predict_churn_many)
+
+# Server-side churn features, resolved by client_id
+client_index: Optional["ClientFeatureIndexLoader"] = None
+if ClientFeatureIndexLoader is not None:
+    client_index = ClientFeatureIndexLoader(
+        Path(os.environ.get("CLIENT_BEHAVIOR_CSV", str(DEFAULT_BEHAVIOR_CSV))),
+        # Prefer the incrementally updated aggregate store over re-aggregating the raw CSV
+        Path(os.environ.get(
+            "CLIENT_TRANSACTIONS_PATH",
+            str(DEFAULT_STORE_PATH if DEFAULT_STORE_PATH.exists() else DEFAULT_TRANSACTIONS_CSV)
+        )),
+        check_interval=float(os.environ.get("CLIENT_INDEX_CHECK_INTERVAL", "30"))
+    )
+
+# Opt-in sampling profiler, also switchable at runtime through /admin/profiler
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", "0.01"))
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "5"))
+
+# Token for the /admin endpoints; unset = those endpoints don't exist
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+profiler = SamplingProfiler(sample_rate=PROFILER_SAMPLE_RATE, interval=PROFILER_INTERVAL_MS / 1000)
+
+MODEL_NAMES = ("lead_quality", "churn")
+
+# Outcome of the startup warm-up: filled once per process, or inherited from the Gunicorn master
+startup_state: Dict[str, Any] = {"complete": False, "pid": None, "seconds": None, "components": {}}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Precarga los modelos antes de aceptar requests y cierra el pool de inferencia al apagar.
+
+    Con Gunicorn la precarga ya la hizo el master antes del fork y los workers
+    la heredan, así que aquí no se repite.
+    """
+    if not startup_state["complete"]:
+        print("🔄 Precargando modelos...")
+        warm_up()
+        for name, timing in startup_state["components"].items():
+            if "error" in timing:
+                print(f"⚠️  {name} no precargado: {timing['error']}")
+            else:
+                print(f"✅ {name} precargado: {timing}")
+        print(f"✅ Precarga completa en {startup_state['seconds']:.2f}s")
+    # Started here rather than at import, so the signal handler is installed in the serving process
+    if PROFILER_ENABLED:
+        try:
+            profiler.start()
+        except RuntimeError as e:
+            print(f"⚠️  Profiler no disponible: {e}")
+    yield
+    profiler.stop()
+    inference_executor.shutdown()
+
 
 app = FastAPI(
     title="Customer Intelligence ML API",
     description="API de predicción de calidad de leads y churn usando modelos entrenados",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration for Next.js
@@ -44,6 +198,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Outermost middleware, so request latency covers everything else
+app.add_middleware(MetricsMiddleware)
+
 
 # ==================== Request/Response Models ====================
 
@@ -106,11 +265,12 @@ class ChurnPredictionRequest(BaseModel):
     num_transacciones: int = Field(..., ge=0, description="Número total de transacciones")
     std_compra: Optional[float] = Field(0, ge=0, description="Desviación estándar de compras")
     
-    @validator('engagement', 'satisfaccion')
-    def validate_categorical(cls, v, field):
+    @field_validator('engagement', 'satisfaccion')
+    @classmethod
+    def validate_categorical(cls, v, info: ValidationInfo):
         valid_values = ['Bajo', 'Medio', 'Alto']
         if v not in valid_values:
-            raise ValueError(f'{field.name} debe ser uno de: {valid_values}')
+            raise ValueError(f'{info.field_name} debe ser uno de: {valid_values}')
         return v
     
     class Config:
@@ -144,6 +304,26 @@ class ChurnPredictionResponse(BaseModel):
         }
 
 
+class ChurnByClientRequest(BaseModel):
+    """Modelo de entrada para predicción de churn por id de cliente"""
+    client_ids: List[Union[str, int]] = Field(
+        ..., min_length=1, max_length=10000, description="IDs de los clientes a evaluar"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "client_ids": ["17", "42", "108"]
+            }
+        }
+
+
+class ChurnByClientResponse(BaseModel):
+    """Modelo de respuesta para predicción de churn por id de cliente"""
+    predictions: List[ChurnPredictionResponse] = Field(..., description="Predicciones de los clientes encontrados")
+    not_found: List[str] = Field(default_factory=list, description="IDs sin features registradas")
+
+
 # ==================== Helper Functions ====================
 
 def map_budget_to_category(budget: Optional[float]) -> str:
@@ -184,6 +364,338 @@ def get_risk_level(probability: float) -> str:
         return "Alto"
 
 
+def lead_to_sample(lead: LeadQualityRequest) -> Dict[str, Any]:
+    """Convierte un LeadQualityRequest al diccionario que espera el modelo"""
+    return {
+        'presupuesto': map_budget_to_category(lead.budget),
+        'urgencia': map_urgency_to_category(lead.urgency),
+        'tipo_servicio': lead.service_type or 'Social Ads',
+        'ciudad': lead.city
+    }
+
+
+def client_to_sample(client: ChurnPredictionRequest) -> Dict[str, Any]:
+    """Convierte un ChurnPredictionRequest al diccionario que espera el modelo"""
+    return {
+        'engagement': client.engagement,
+        'satisfaccion': client.satisfaccion,
+        'dias_ultima_compra': client.dias_ultima_compra,
+        'total_compras': client.total_compras,
+        'promedio_compra': client.promedio_compra,
+        'num_transacciones': client.num_transacciones,
+        'std_compra': client.std_compra
+    }
+
+
+async def run_lead_prediction(sample_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Predice un lead, agrupándolo con requests concurrentes si el micro-batching está activo"""
+    batcher = batchers.get("lead_quality")
+    if batcher is not None:
+        return await batcher.submit(sample_dict)
+    return await inference_executor.run(predict_lead_quality, sample_dict)
+
+
+async def run_churn_prediction(sample_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Predice un cliente, agrupándolo con requests concurrentes si el micro-batching está activo"""
+    batcher = batchers.get("churn")
+    if batcher is not None:
+        return await batcher.submit(sample_dict)
+    return await inference_executor.run(predict_churn, sample_dict)
+
+
+# ==================== Batch Streaming Helpers ====================
+
+def ndjson_line(payload: Dict[str, Any]) -> bytes:
+    """Serializa un diccionario como una línea NDJSON"""
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def is_ndjson_request(request: Request) -> bool:
+    """Indica si el body del request viene como NDJSON (un objeto JSON por línea)"""
+    content_type = request.headers.get("content-type", "")
+    return "ndjson" in content_type or "jsonl" in content_type
+
+
+async def iter_ndjson_records(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """Lee el body NDJSON a medida que llega y produce (índice, registro o error)"""
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield index, json.loads(line)
+            except ValueError as e:
+                yield index, e
+            index += 1
+    if buffer.strip():
+        try:
+            yield index, json.loads(buffer)
+        except ValueError as e:
+            yield index, e
+
+
+async def iter_list_records(records: List[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    """Produce (índice, registro) para un array JSON ya parseado"""
+    for index, record in enumerate(records):
+        yield index, record
+
+
+async def read_batch_records(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Devuelve un iterador de registros para un endpoint batch.
+
+    Acepta un array JSON (`application/json`) o NDJSON (`application/x-ndjson`).
+    Los arrays JSON se validan antes de empezar a responder, para poder
+    devolver 400 si el body no es un array.
+    """
+    if is_ndjson_request(request):
+        return iter_ndjson_records(request)
+
+    try:
+        records = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {str(e)}")
+    if not isinstance(records, list):
+        raise HTTPException(
+            status_code=400,
+            detail="El body debe ser un array JSON o NDJSON (Content-Type: application/x-ndjson)"
+        )
+    return iter_list_records(records)
+
+
+async def stream_batch_predictions(
+    records: AsyncIterator[Tuple[int, Any]],
+    request_model: Type[BaseModel],
+    to_sample: Callable[[Any], Dict[str, Any]],
+    predict_many: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+    format_result: Callable[[Any, Dict[str, Any]], Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """
+    Valida los registros, los puntúa en chunks de BATCH_CHUNK_SIZE y emite
+    una línea NDJSON por registro, en el orden de entrada y con su `index`.
+
+    Cada chunk se puntúa con una llamada a `predict_many` en el pool de
+    inferencia. Los registros inválidos producen una línea
+    `{"index": i, "error": ...}` sin interrumpir el resto del batch.
+    """
+    # (index, validated item or None, error message or None)
+    chunk: List[Tuple[int, Any, Optional[str]]] = []
+    pending = 0
+
+    async def flush() -> bytes:
+        items = [item for _, item, error in chunk if error is None]
+        scoring_error = None
+        results = iter(())
+        if items:
+            try:
+                # The request holds its executor slot for the whole stream (see `held_slot`)
+                predictions = await inference_executor.run(
+                    predict_many, [to_sample(item) for item in items], admit=False
+                )
+                results = iter([format_result(item, prediction) for item, prediction in zip(items, predictions)])
+            except FileNotFoundError as e:
+                scoring_error = f"Error cargando modelo: {str(e)}. Entrena los modelos primero."
+            except Exception as e:
+                scoring_error = f"Error en predicción: {str(e)}"
+
+        lines = []
+        for index, _, error in chunk:
+            error = error or scoring_error
+            if error is not None:
+                lines.append(ndjson_line({"index": index, "error": error}))
+            else:
+                lines.append(ndjson_line({"index": index, **next(results)}))
+        return b"".join(lines)
+
+    async for index, record in records:
+        if isinstance(record, Exception):
+            chunk.append((index, None, f"JSON inválido: {str(record)}"))
+        else:
+            try:
+                chunk.append((index, request_model.model_validate(record), None))
+                pending += 1
+            except ValidationError as e:
+                chunk.append((index, None, str(e)))
+
+        if pending >= BATCH_CHUNK_SIZE:
+            yield await flush()
+            chunk = []
+            pending = 0
+
+    if chunk:
+        yield await flush()
+
+
+async def held_slot(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Emite `stream` y libera al terminar el slot del executor que el request
+    reservó con `acquire`, también si el cliente se desconecta.
+    """
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        inference_executor.release()
+
+
+class BatchStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no consume `receive` mientras responde.
+
+    StreamingResponse detecta desconexiones leyendo los mensajes de `receive`,
+    lo que compite con la lectura del body NDJSON que ocurre mientras se emite
+    la respuesta. Aquí la desconexión se detecta al leer el body
+    (ClientDisconnect) o al fallar el envío.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        finally:
+            # Run the generator's cleanup (e.g. releasing its executor slot) now, not at GC
+            await self.body_iterator.aclose()
+        if self.background is not None:
+            await self.background()
+
+
+def format_lead_result(lead: LeadQualityRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Formatea la predicción de un lead para la respuesta batch"""
+    return result
+
+
+def format_churn_result(client: ChurnPredictionRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Formatea la predicción de un cliente para la respuesta batch"""
+    return {
+        "client_id": client.client_id,
+        "churn_probability": result['churn_probability'],
+        "risk_level": get_risk_level(result['churn_probability'])
+    }
+
+
+async def resolve_client_samples(client_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Features de cada cliente desde el índice en memoria (None si no existe)"""
+    if client_index is None:
+        raise HTTPException(status_code=503, detail="Índice de features de clientes no disponible")
+    loop = asyncio.get_running_loop()
+    try:
+        # Building or refreshing the index reads CSVs; keep it off the event loop
+        index = await loop.run_in_executor(None, client_index.get)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=503, detail=f"Features de clientes no disponibles: {str(e)}")
+    return index.samples(client_ids)
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Carga y ejecuta una vez cada modelo, y construye el índice de features por cliente.
+
+    Se llama antes de atender tráfico: en el master de Gunicorn antes del
+    fork, o en el lifespan de la app. Un componente que no se puede cargar,
+    por ejemplo un modelo sin entrenar, se reporta con su error en vez de
+    impedir el arranque. El resultado queda en `startup_state`.
+    """
+    start = time.perf_counter()
+    timings: Dict[str, Any] = {}
+    if warm_up_models is not None:
+        for name in MODEL_NAMES:
+            try:
+                timings[name] = warm_up_models([name])[name]
+            except Exception as e:
+                timings[name] = {"error": str(e)}
+    if client_index is not None:
+        index_start = time.perf_counter()
+        try:
+            client_index.get()
+            timings["client_features"] = {"load_seconds": time.perf_counter() - index_start}
+        except Exception as e:
+            timings["client_features"] = {"error": str(e)}
+
+    startup_state.update(
+        complete=True,
+        pid=os.getpid(),
+        seconds=time.perf_counter() - start,
+        components=timings
+    )
+    return timings
+
+
+def loaded_models_status() -> Dict[str, bool]:
+    """Qué modelos están realmente cargados en memoria en este proceso"""
+    loaded = get_model_registry().status() if get_model_registry is not None else {}
+    return {name: name in loaded for name in MODEL_NAMES}
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependencia de los endpoints /admin: exige el header `X-Admin-Token` igual a `ADMIN_TOKEN`"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+
+def json_response(payload: BaseModel, model_name: str) -> Response:
+    """
+    Serializa la respuesta de un endpoint de predicción y registra la etapa `serialization`.
+
+    Devolver un `Response` ya serializado evita que FastAPI vuelva a validar y
+    convertir el modelo a través de `response_model`.
+    """
+    start = time.perf_counter()
+    body = payload.model_dump_json()
+    observe_since(model_name, "serialization", start)
+    return Response(content=body, media_type="application/json")
+
+
+def read_proc_kb(path: str, fields: Tuple[str, ...]) -> Dict[str, float]:
+    """Lee campos `Nombre:   123 kB` de un archivo de /proc y los devuelve en MB"""
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[key] = round(int(rest.split()[0]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def process_memory() -> Dict[str, Any]:
+    """
+    Memoria de este proceso worker (solo Linux).
+
+    `rss_file_mb` incluye las páginas de los modelos mapeados en memoria, que
+    comparten todos los workers del host; `pss_mb` reparte esas páginas
+    compartidas entre los procesos que las usan, así que la suma de `pss_mb`
+    de todos los workers es la memoria real que ocupan.
+    """
+    status = read_proc_kb("/proc/self/status", ("VmRSS", "RssAnon", "RssFile", "RssShmem"))
+    rollup = read_proc_kb("/proc/self/smaps_rollup", ("Pss",))
+    return {
+        "pid": os.getpid(),
+        "rss_mb": status.get("VmRSS"),
+        "rss_anon_mb": status.get("RssAnon"),
+        "rss_file_mb": status.get("RssFile"),
+        "rss_shmem_mb": status.get("RssShmem"),
+        "pss_mb": rollup.get("Pss")
+    }
+
+
+def overloaded_exception(error: ServerOverloadedError) -> HTTPException:
+    """Convierte un rechazo por saturación en un 503 con Retry-After"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
 # ==================== Endpoints ====================
 
 @app.get("/")
@@ -193,35 +705,74 @@ async def root():
         "status": "ok",
         "service": "Customer Intelligence ML API",
         "version": "1.0.0",
-        "models_loaded": predict_lead_quality is not None and predict_churn is not None
+        "models_loaded": all(loaded_models_status().values())
     }
 
 
+@app.get("/live")
+async def liveness_check():
+    """Liveness: el proceso está vivo y su event loop responde"""
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness: la precarga terminó y todos los modelos están en memoria.
+
+    Responde 503 mientras no sea así, para que el balanceador no envíe
+    tráfico a una instancia que haría esperar la carga de un modelo.
+    """
+    models_status = loaded_models_status()
+    ready = startup_state["complete"] and all(models_status.values())
+    payload = {
+        "status": "ready" if ready else "not_ready",
+        "models": models_status,
+        "startup": startup_state
+    }
+    if not ready:
+        return JSONResponse(status_code=503, content=payload)
+    return payload
+
+
 @app.get("/health")
 async def health_check():
     """Verificar estado del servidor y modelos"""
-    models_status = {
-        "lead_quality": predict_lead_quality is not None,
-        "churn": predict_churn is not None
-    }
+    models_status = loaded_models_status()
     
     all_loaded = all(models_status.values())
     
     return {
         "status": "healthy" if all_loaded else "degraded",
         "models": models_status,
-        "message": "Todos los modelos cargados" if all_loaded else "Algunos modelos no están disponibles"
+        "message": "Todos los modelos cargados" if all_loaded else "Algunos modelos no están disponibles",
+        "startup": startup_state,
+        "loaded_models": get_model_registry().status() if get_model_registry is not None else {},
+        "inference_executor": inference_executor.stats(),
+        "micro_batching": {name: batcher.stats() for name, batcher in batchers.items()},
+        "churn_cache": get_churn_cache().stats() if get_churn_cache is not None else {},
+        "client_features": client_index.status() if client_index is not None else {},
+        "process": process_memory()
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Métricas en formato Prometheus (requests, latencias y etapas de predicción)"""
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
+
+
 @app.post("/predict/lead-quality", response_model=LeadQualityResponse)
-async def predict_lead_quality_endpoint(lead: LeadQualityRequest):
+async def predict_lead_quality_endpoint(lead: LeadQualityRequest, request: Request):
     """
     Predice la calidad de un lead usando el modelo entrenado.
     
     El modelo analiza presupuesto, urgencia, tipo de servicio y ciudad
     para clasificar el lead como 'caliente', 'tibio' o 'frío'.
     """
+    # Body read, JSON parsing and Pydantic validation happen before the handler runs
+    start = observe_since("lead_quality", "validation", request_started_at(request.scope))
     if predict_lead_quality is None:
         raise HTTPException(
             status_code=503,
@@ -230,25 +781,21 @@ async def predict_lead_quality_endpoint(lead: LeadQualityRequest):
     
     try:
         # Preparar datos para el modelo
-        presupuesto_cat = map_budget_to_category(lead.budget)
-        urgencia_cat = map_urgency_to_category(lead.urgency)
-        
-        sample_dict = {
-            'presupuesto': presupuesto_cat,
-            'urgencia': urgencia_cat,
-            'tipo_servicio': lead.service_type or 'Social Ads',
-            'ciudad': lead.city
-        }
+        sample_dict = lead_to_sample(lead)
+        start = observe_since("lead_quality", "mapping", start)
         
         # Ejecutar predicción real con el modelo
-        result = predict_lead_quality(sample_dict)
+        result = await run_lead_prediction(sample_dict)
+        observe_since("lead_quality", "inference", start)
         
-        return LeadQualityResponse(
+        return json_response(LeadQualityResponse(
             quality_label=result['quality_label'],
             quality_score=result['quality_score'],
             probabilities=result.get('probabilities')
-        )
+        ), "lead_quality")
         
+    except ServerOverloadedError as e:
+        raise overloaded_exception(e)
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
@@ -262,13 +809,15 @@ async def predict_lead_quality_endpoint(lead: LeadQualityRequest):
 
 
 @app.post("/predict/churn", response_model=ChurnPredictionResponse)
-async def predict_churn_endpoint(client: ChurnPredictionRequest):
+async def predict_churn_endpoint(client: ChurnPredictionRequest, request: Request):
     """
     Predice la probabilidad de churn de un cliente usando el modelo entrenado.
     
     El modelo analiza engagement, satisfacción, comportamiento de compra
     y recencia para estimar el riesgo de pérdida del cliente.
     """
+    # Body read, JSON parsing and Pydantic validation happen before the handler runs
+    start = observe_since("churn", "validation", request_started_at(request.scope))
     if predict_churn is None:
         raise HTTPException(
             status_code=503,
@@ -277,26 +826,68 @@ async def predict_churn_endpoint(client: ChurnPredictionRequest):
     
     try:
         # Preparar datos para el modelo
-        sample_dict = {
-            'engagement': client.engagement,
-            'satisfaccion': client.satisfaccion,
-            'dias_ultima_compra': client.dias_ultima_compra,
-            'total_compras': client.total_compras,
-            'promedio_compra': client.promedio_compra,
-            'num_transacciones': client.num_transacciones,
-            'std_compra': client.std_compra
-        }
+        sample_dict = client_to_sample(client)
+        start = observe_since("churn", "mapping", start)
         
         # Ejecutar predicción real con el modelo
-        result = predict_churn(sample_dict)
+        result = await run_churn_prediction(sample_dict)
+        observe_since("churn", "inference", start)
         churn_prob = result['churn_probability']
         
-        return ChurnPredictionResponse(
+        return json_response(ChurnPredictionResponse(
             client_id=client.client_id,
             churn_probability=churn_prob,
             risk_level=get_risk_level(churn_prob)
+        ), "churn")
+        
+    except ServerOverloadedError as e:
+        raise overloaded_exception(e)
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error cargando modelo: {str(e)}. Entrena los modelos primero."
         )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en predicción: {str(e)}"
+        )
+
+
+@app.get("/predict/churn/client/{client_id}", response_model=ChurnPredictionResponse)
+async def predict_churn_by_client_endpoint(client_id: str, request: Request):
+    """
+    Predice la probabilidad de churn de un cliente a partir de su id.
+    
+    Las features (engagement, satisfacción, recencia y agregados de
+    transacciones) se resuelven en el servidor desde el índice de clientes.
+    """
+    start = observe_since("churn", "validation", request_started_at(request.scope))
+    if predict_churn is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo de churn no disponible. Entrena los modelos ejecutando: python ml/train_leads_and_churn.py"
+        )
+    
+    # Here the mapping stage is the feature lookup in the client index
+    sample_dict = (await resolve_client_samples([client_id]))[0]
+    if sample_dict is None:
+        raise HTTPException(status_code=404, detail=f"Cliente no encontrado: {client_id}")
+    start = observe_since("churn", "mapping", start)
+    
+    try:
+        result = await run_churn_prediction(sample_dict)
+        observe_since("churn", "inference", start)
+        churn_prob = result['churn_probability']
+        
+        return json_response(ChurnPredictionResponse(
+            client_id=client_id,
+            churn_probability=churn_prob,
+            risk_level=get_risk_level(churn_prob)
+        ), "churn")
         
+    except ServerOverloadedError as e:
+        raise overloaded_exception(e)
     except FileNotFoundError as e:
         raise HTTPException(
             status_code=503,
@@ -309,6 +900,179 @@ async def predict_churn_endpoint(client: ChurnPredictionRequest):
         )
 
 
+@app.post("/predict/churn/clients", response_model=ChurnByClientResponse)
+async def predict_churn_by_clients_endpoint(request: ChurnByClientRequest):
+    """
+    Predice la probabilidad de churn de varios clientes a partir de sus ids.
+    
+    Los ids sin features registradas se devuelven en `not_found`.
+    """
+    if predict_churn_many is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo de churn no disponible. Entrena los modelos ejecutando: python ml/train_leads_and_churn.py"
+        )
+    
+    client_ids = [str(client_id) for client_id in request.client_ids]
+    samples = await resolve_client_samples(client_ids)
+    found = [(client_id, sample) for client_id, sample in zip(client_ids, samples) if sample is not None]
+    not_found = [client_id for client_id, sample in zip(client_ids, samples) if sample is None]
+    
+    try:
+        results = await inference_executor.run(predict_churn_many, [sample for _, sample in found]) if found else []
+    except ServerOverloadedError as e:
+        raise overloaded_exception(e)
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error cargando modelo: {str(e)}. Entrena los modelos primero."
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en predicción: {str(e)}"
+        )
+    
+    return ChurnByClientResponse(
+        predictions=[
+            ChurnPredictionResponse(
+                client_id=client_id,
+                churn_probability=result['churn_probability'],
+                risk_level=get_risk_level(result['churn_probability'])
+            )
+            for (client_id, _), result in zip(found, results)
+        ],
+        not_found=not_found
+    )
+
+
+@app.post("/clients/features/refresh")
+async def refresh_client_features_endpoint(force: bool = False):
+    """
+    Reconstruye el índice de features de clientes si sus archivos cambiaron
+    (o siempre, con `force=true`).
+    """
+    if client_index is None:
+        raise HTTPException(status_code=503, detail="Índice de features de clientes no disponible")
+    
+    loop = asyncio.get_running_loop()
+    try:
+        reloaded = await loop.run_in_executor(None, partial(client_index.refresh, force=force))
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=503, detail=f"Features de clientes no disponibles: {str(e)}")
+    
+    return {"reloaded": reloaded, **client_index.status()}
+
+
+@app.post("/predict/lead-quality/batch")
+async def predict_lead_quality_batch_endpoint(request: Request):
+    """
+    Predice la calidad de muchos leads en una sola llamada.
+    
+    Acepta un array JSON de LeadQualityRequest o un body NDJSON
+    (`Content-Type: application/x-ndjson`, un lead por línea). Los leads se
+    puntúan en chunks vectorizados y la respuesta se emite como NDJSON a medida
+    que cada chunk termina: una línea por lead con su `index` de entrada y la
+    predicción, o `error` si ese registro no es válido.
+    """
+    if predict_lead_quality_many is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo de calidad de leads no disponible. Entrena los modelos ejecutando: python ml/train_leads_and_churn.py"
+        )
+    
+    try:
+        inference_executor.acquire()
+    except ServerOverloadedError as e:
+        raise overloaded_exception(e)
+    try:
+        records = await read_batch_records(request)
+    except BaseException:
+        inference_executor.release()
+        raise
+    
+    return BatchStreamingResponse(
+        held_slot(stream_batch_predictions(
+            records, LeadQualityRequest, lead_to_sample, predict_lead_quality_many, format_lead_result
+        )),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+@app.post("/predict/churn/batch")
+async def predict_churn_batch_endpoint(request: Request):
+    """
+    Predice la probabilidad de churn de muchos clientes en una sola llamada.
+    
+    Acepta un array JSON de ChurnPredictionRequest o un body NDJSON
+    (`Content-Type: application/x-ndjson`, un cliente por línea) y responde
+    en NDJSON, una línea por cliente con su `index` de entrada.
+    """
+    if predict_churn_many is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo de churn no disponible. Entrena los modelos ejecutando: python ml/train_leads_and_churn.py"
+        )
+    
+    try:
+        inference_executor.acquire()
+    except ServerOverloadedError as e:
+        raise overloaded_exception(e)
+    try:
+        records = await read_batch_records(request)
+    except BaseException:
+        inference_executor.release()
+        raise
+    
+    # One-off bulk scoring would only evict the entries the dashboard keeps hitting
+    predict_many = partial(predict_churn_many, use_cache=False)
+    return BatchStreamingResponse(
+        held_slot(stream_batch_predictions(
+            records, ChurnPredictionRequest, client_to_sample, predict_many, format_churn_result
+        )),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+# ==================== Admin ====================
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def profiler_status():
+    """Estado y contadores del profiler de este worker"""
+    return {"pid": os.getpid(), **profiler.stats()}
+
+
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def profiler_start(sample_rate: Optional[float] = None, interval_ms: Optional[float] = None):
+    """Activa el profiler, opcionalmente con otra fracción de requests o intervalo de muestreo"""
+    try:
+        profiler.start(
+            sample_rate=sample_rate,
+            interval=interval_ms / 1000 if interval_ms is not None else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pid": os.getpid(), **profiler.stats()}
+
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def profiler_stop():
+    """Desactiva el profiler; las pilas acumuladas se conservan"""
+    profiler.stop()
+    return {"pid": os.getpid(), **profiler.stats()}
+
+
+@app.get("/admin/profiler/stacks", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def profiler_stacks(reset: bool = False):
+    """Pilas acumuladas en formato collapsed, listas para `flamegraph.pl` o speedscope"""
+    content = profiler.collapsed()
+    if reset:
+        profiler.reset()
+    return Response(content=content, media_type="text/plain; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,144 @@
+"""
+Métricas Prometheus del servidor de predicción - Customer Intelligence ML API
+
+Expone en `/metrics` los requests atendidos por ruta y código de estado, los
+requests en curso, la latencia por ruta y la latencia de cada etapa de una
+predicción (validación, mapeo de categorías, codificación, scaler,
+`predict_proba` y serialización) para localizar regresiones de p99.
+
+El costo en el camino caliente es el de un par de `time.perf_counter()` y un
+`observe` por etapa: los histogramas hijos de cada combinación de etiquetas se
+resuelven una sola vez y se reutilizan.
+
+Con varios procesos (Gunicorn) cada worker tiene sus propios contadores; si
+`PROMETHEUS_MULTIPROC_DIR` está definido, los valores se escriben ahí y
+`/metrics` los agrega para todos los workers del host.
+"""
+
+import os
+import time
+from typing import Any, Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+# From 100µs (a cached prediction) to 10s (a large batch)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests HTTP atendidos, por método, ruta y código de estado",
+    ["method", "route", "status"]
+)
+REQUEST_EXCEPTIONS = Counter(
+    "http_request_exceptions_total",
+    "Requests que terminaron en una excepción no controlada",
+    ["method", "route", "exception"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests HTTP en curso",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de los requests HTTP, hasta enviar el último byte",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "prediction_stage_duration_seconds",
+    "Duración de cada etapa de una predicción",
+    ["model", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+_stage_children: Dict[Tuple[str, str], Any] = {}
+
+
+def observe_stage(model: str, stage: str, seconds: float) -> None:
+    """Registra la duración de una etapa (también sirve como observer de `ml.utils`)."""
+    child = _stage_children.get((model, stage))
+    if child is None:
+        child = _stage_children.setdefault((model, stage), STAGE_LATENCY.labels(model, stage))
+    child.observe(seconds)
+
+
+def observe_since(model: str, stage: str, start: float) -> float:
+    """Registra la etapa que empezó en `start` (`perf_counter`) y devuelve el instante actual."""
+    now = time.perf_counter()
+    observe_stage(model, stage, now - start)
+    return now
+
+
+def request_started_at(scope: Dict[str, Any]) -> float:
+    """Instante (`perf_counter`) en que `MetricsMiddleware` recibió el request."""
+    return scope.get("state", {}).get("request_started_at", time.perf_counter())
+
+
+def _route_template(scope: Dict[str, Any]) -> str:
+    # Path template (e.g. /predict/churn/client/{client_id}) keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que cuenta y cronometra todos los requests HTTP.
+
+    Es un middleware ASGI puro (no `BaseHTTPMiddleware`), así que no añade
+    tareas ni copias del body; en respuestas en streaming la latencia incluye
+    el envío completo.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope.setdefault("state", {})["request_started_at"] = start
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            REQUEST_EXCEPTIONS.labels(method, _route_template(scope), type(e).__name__).inc()
+            raise
+        finally:
+            in_progress.dec()
+            route = _route_template(scope)
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status)).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Métricas en formato de texto de Prometheus, agregadas entre procesos si aplica."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,246 @@
+"""
+Profiler estadístico bajo demanda - Customer Intelligence ML API
+
+Con el profiler activo, un temporizador de CPU (`ITIMER_PROF`) envía
+`SIGPROF` al proceso cada `interval` segundos de CPU consumida. Si en ese
+momento hay en curso algún request elegido para perfilar (una fracción
+`sample_rate` de los requests), el handler, que corre en el thread principal
+justo en la instrucción interrumpida, anota la pila de todos los threads: el
+event loop, donde corren FastAPI, Starlette y la validación Pydantic, y el
+pool de inferencia, donde corre `ml/utils.py`.
+
+Las pilas se agregan en formato "collapsed" (`raíz;...;hoja cuenta`), el que
+consumen `flamegraph.pl`, speedscope o inferno para dibujar un flamegraph.
+
+A diferencia de un thread de muestreo, que solo obtiene el GIL cuando el
+event loop lo suelta (casi siempre en una llamada de I/O), la señal
+interrumpe el código Python en un punto arbitrario, así que las muestras no
+se concentran en las escrituras al socket. Como el temporizador cuenta
+tiempo de CPU, un proceso inactivo no genera señales. Desactivado, el costo
+por request es la comparación de un booleano y no hay temporizador.
+
+Requiere un sistema Unix y que el servidor corra el event loop en el thread
+principal (uvicorn y Gunicorn lo hacen).
+"""
+
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Where a thread sits when it has nothing to do; samples ending here are dropped
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+# Distinct stacks kept; further new stacks are counted under a single placeholder
+DEFAULT_MAX_STACKS = 20000
+
+TRUNCATED_STACK = "[pilas truncadas]"
+
+_PROJECT_ROOT = str(Path(__file__).resolve().parents[1])
+
+
+def _frame_label(code: Any) -> str:
+    """Etiqueta de una función en la pila: `nombre (archivo:línea)`, con rutas cortas."""
+    path = code.co_filename
+    if path.startswith(_PROJECT_ROOT):
+        path = path[len(_PROJECT_ROOT) + 1:]
+    elif "site-packages/" in path:
+        path = path.split("site-packages/", 1)[1]
+    else:
+        path = Path(path).name
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Profiler de muestreo para un proceso del servidor.
+
+    `start`, `stop` y los avisos de inicio y fin de request se llaman desde el
+    event loop (thread principal); el handler de la señal corre en ese mismo
+    thread, por eso el estado se modifica sin locks.
+
+    Args:
+        sample_rate: Fracción de requests que activan el muestreo (0-1)
+        interval: Segundos de CPU entre muestras
+        max_stacks: Máximo de pilas distintas guardadas
+
+    Example:
+        >>> profiler = SamplingProfiler(sample_rate=0.05, interval=0.005)
+        >>> profiler.start()
+        >>> print(profiler.collapsed())
+    """
+
+    def __init__(self, sample_rate: float = 0.01, interval: float = 0.005, max_stacks: int = DEFAULT_MAX_STACKS):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.enabled = False
+        self._stacks: Counter = Counter()
+        self._labels: Dict[Any, str] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._main_ident: Optional[int] = None
+        self._active_requests = 0
+        self._profiled_requests = 0
+        self._samples = 0
+        self._started_at: Optional[float] = None
+
+    @staticmethod
+    def available() -> bool:
+        """Indica si la plataforma soporta el temporizador de CPU (`setitimer`)."""
+        return hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+    def start(self, sample_rate: Optional[float] = None, interval: Optional[float] = None) -> None:
+        """
+        Activa el profiler (o cambia su configuración si ya está activo).
+
+        Raises:
+            ValueError: Si `sample_rate` no está entre 0 y 1 o `interval` no es positivo
+            RuntimeError: Si la plataforma no tiene `setitimer` o no se llama desde el thread principal
+        """
+        if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate debe estar entre 0 y 1")
+        if interval is not None and interval <= 0:
+            raise ValueError("interval debe ser positivo")
+        if not self.available():
+            raise RuntimeError("El profiler requiere setitimer/SIGPROF (Linux o macOS)")
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("El profiler solo se puede activar desde el thread principal")
+
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if interval is not None:
+            self.interval = interval
+        signal.signal(signal.SIGPROF, self._handle_signal)
+        self._main_ident = threading.main_thread().ident
+        if self._started_at is None:
+            self._started_at = time.time()
+        self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        self.enabled = True
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        """Desactiva el profiler; las pilas acumuladas se conservan hasta `reset`."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+    def reset(self) -> None:
+        """Descarta las pilas y contadores acumulados."""
+        self._stacks = Counter()
+        self._profiled_requests = 0
+        self._samples = 0
+        self._started_at = time.time() if self.enabled else None
+
+    # ==================== Requests perfilados ====================
+
+    def should_profile(self) -> bool:
+        """Decide si el request que empieza se perfila."""
+        return self.enabled and random.random() < self.sample_rate
+
+    def request_started(self) -> None:
+        self._profiled_requests += 1
+        self._active_requests += 1
+        if self._active_requests == 1:
+            # Thread names are refreshed here, never inside the signal handler
+            # (enumerate takes a lock)
+            self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+    def request_finished(self) -> None:
+        self._active_requests -= 1
+
+    # ==================== Muestreo ====================
+
+    def _handle_signal(self, signum: int, frame: Any) -> None:
+        # The timer keeps running between profiled requests (pausing it per request loses
+        # sub-tick CPU time, so it would hardly ever fire); those ticks are ignored here
+        if self._active_requests == 0:
+            return
+        self._samples += 1
+        for ident, thread_frame in sys._current_frames().items():
+            # The main thread's current frame is this handler; sample the interrupted frame instead
+            if ident == self._main_ident:
+                thread_frame = frame
+            if thread_frame is None:
+                continue
+            code = thread_frame.f_code
+            if (Path(code.co_filename).name, code.co_name) in IDLE_FRAMES:
+                continue
+            self._record(ident, thread_frame)
+
+    def _record(self, ident: int, frame: Any) -> None:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels.setdefault(code, _frame_label(code))
+            labels.append(label)
+            frame = frame.f_back
+        # Pool threads are numbered (inference_0, inference_1...); group them under one root
+        labels.append(self._thread_names.get(ident, "thread").rstrip("0123456789").rstrip("_-"))
+        stack = ";".join(reversed(labels))
+        if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+            stack = TRUNCATED_STACK
+        self._stacks[stack] += 1
+
+    # ==================== Resultados ====================
+
+    def collapsed(self) -> str:
+        """Pilas acumuladas en formato collapsed, una por línea: `raíz;...;hoja cuenta`."""
+        # dict() copies in one step, so a signal arriving meanwhile can't break the iteration
+        stacks = dict(self._stacks)
+        return "".join(
+            f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1])
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuración y contadores del profiler."""
+        return {
+            "enabled": self.enabled,
+            "available": self.available(),
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "profiling_since": self._started_at,
+            "profiled_requests": self._profiled_requests,
+            "active_requests": self._active_requests,
+            "samples": self._samples,
+            "distinct_stacks": len(self._stacks)
+        }
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que marca una fracción de los requests para perfilar.
+
+    Las rutas en `excluded_prefixes` (administración, métricas) nunca se perfilan.
+    """
+
+    def __init__(self, app: Any, profiler: SamplingProfiler, excluded_prefixes: tuple = ("/admin", "/metrics")):
+        self.app = app
+        self.profiler = profiler
+        self.excluded_prefixes = excluded_prefixes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.profiler.should_profile()
+            or scope["path"].startswith(self.excluded_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        self.profiler.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.request_finished()
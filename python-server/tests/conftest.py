@@ -0,0 +1,8 @@
+"""Configuración de pytest para los tests del servidor: hace importables sus módulos y el paquete `ml`."""
+
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR.parent))
+sys.path.insert(0, str(SERVER_DIR))
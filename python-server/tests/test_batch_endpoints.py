@@ -0,0 +1,189 @@
+"""Tests de los endpoints batch en streaming: framing NDJSON, orden, slot del executor y 503."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from executor import InferenceExecutor
+
+CLIENT = {
+    "engagement": "Medio",
+    "satisfaccion": "Alto",
+    "total_compras": 50000000,
+    "promedio_compra": 10000000,
+    "num_transacciones": 5
+}
+
+
+def clients(n: int):
+    return [{**CLIENT, "client_id": f"c{i}", "dias_ultima_compra": i} for i in range(n)]
+
+
+def fake_predict_churn_many(samples, use_cache=True):
+    # The probability encodes the input row, so the test can check which result went where
+    return [{"churn_probability": sample["dias_ultima_compra"] / 1000} for sample in samples]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """`main` con un predictor falso, chunks de 3 registros y un executor propio de 2 slots."""
+    executor = InferenceExecutor("thread", max_workers=1, max_pending=2, retry_after=4)
+    calls = []
+
+    def predict_many(samples, use_cache=True):
+        calls.append(len(samples))
+        return fake_predict_churn_many(samples)
+
+    monkeypatch.setattr(main, "predict_churn_many", predict_many)
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 3)
+    monkeypatch.setattr(main, "inference_executor", executor)
+    yield executor, calls
+    executor.shutdown()
+
+
+def parse_ndjson(response):
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text == "" or response.text.endswith("\n")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_json_array_is_streamed_in_order(server):
+    executor, calls = server
+
+    response = TestClient(main.app).post("/predict/churn/batch", json=clients(8))
+
+    assert response.status_code == 200
+    lines = parse_ndjson(response)
+    assert [line["index"] for line in lines] == list(range(8))
+    assert [line["client_id"] for line in lines] == [f"c{i}" for i in range(8)]
+    assert [line["churn_probability"] for line in lines] == [i / 1000 for i in range(8)]
+    assert all(line["risk_level"] for line in lines)
+    # One predict_many call per chunk of BATCH_CHUNK_SIZE valid records
+    assert calls == [3, 3, 2]
+    assert executor.pending == 0
+
+
+def test_ndjson_body_with_invalid_records(server):
+    executor, _ = server
+    records = clients(5)
+    body = "\n".join([
+        json.dumps(records[0]),
+        "{no es json",
+        json.dumps({"client_id": "sin campos"}),
+        "",
+        json.dumps(records[3]),
+        json.dumps(records[4])
+    ])
+
+    response = TestClient(main.app).post(
+        "/predict/churn/batch", content=body.encode("utf-8"), headers={"content-type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    lines = parse_ndjson(response)
+    # Blank lines are skipped; invalid records get an error line at their own index
+    assert [line["index"] for line in lines] == [0, 1, 2, 3, 4]
+    assert lines[0]["client_id"] == "c0"
+    assert "JSON inválido" in lines[1]["error"]
+    assert "error" in lines[2]
+    assert [lines[3]["churn_probability"], lines[4]["churn_probability"]] == [0.003, 0.004]
+    assert executor.pending == 0
+
+
+def test_empty_batch(server):
+    executor, calls = server
+
+    response = TestClient(main.app).post("/predict/churn/batch", json=[])
+
+    assert response.status_code == 200
+    assert parse_ndjson(response) == []
+    assert calls == []
+    assert executor.pending == 0
+
+
+def test_scoring_error_is_reported_per_record(server, monkeypatch):
+    executor, _ = server
+
+    def broken(samples, use_cache=True):
+        raise RuntimeError("modelo roto")
+
+    monkeypatch.setattr(main, "predict_churn_many", broken)
+
+    lines = parse_ndjson(TestClient(main.app).post("/predict/churn/batch", json=clients(4)))
+
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert all("modelo roto" in line["error"] for line in lines)
+    assert executor.pending == 0
+
+
+def test_invalid_body_releases_the_slot(server):
+    executor, _ = server
+    test_client = TestClient(main.app)
+
+    not_json = test_client.post(
+        "/predict/churn/batch", content=b"{roto", headers={"content-type": "application/json"}
+    )
+    not_array = test_client.post("/predict/churn/batch", json={"client_id": "c0"})
+
+    assert not_json.status_code == 400 and not_array.status_code == 400
+    assert executor.pending == 0
+
+
+def test_saturated_executor_is_a_503(server):
+    executor, calls = server
+    executor.acquire()
+    executor.acquire()
+
+    response = TestClient(main.app).post("/predict/churn/batch", json=clients(2))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "4"
+    assert executor.rejected == 1 and executor.pending == 2
+    assert calls == []
+
+
+def test_client_disconnect_mid_stream_releases_the_slot(server):
+    executor, calls = server
+    body = json.dumps(clients(9)).encode("utf-8")
+    sent = []
+
+    async def receive():
+        if not sent:
+            sent.append(True)
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            # The client goes away after the first chunk of results
+            raise OSError("conexión cerrada")
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/predict/churn/batch",
+        "raw_path": b"/predict/churn/batch",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80)
+    }
+
+    async def scenario():
+        try:
+            await main.app(scope, receive, send)
+        except Exception:
+            pass
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+
+    # Only the first chunk was scored, and the slot came back
+    assert calls == [3]
+    assert executor.pending == 0
@@ -0,0 +1,141 @@
+"""Tests de MicroBatcher: lotes por tamaño y por tiempo, y rechazo con la cola llena."""
+
+import asyncio
+import time
+
+import pytest
+
+from batching import MicroBatcher
+from executor import ServerOverloadedError
+
+
+class RecordingModel:
+    """`predict_many` de prueba: devuelve el doble de cada registro y anota el tamaño de cada lote."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+
+def test_batches_close_when_full():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch_size=4, max_wait_ms=5000)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(8)))
+
+    start = time.perf_counter()
+    results = asyncio.run(scenario())
+
+    # Full batches go out without waiting for max_wait_ms
+    assert time.perf_counter() - start < 1.0
+    assert results == [i * 2 for i in range(8)]
+    assert [len(batch) for batch in model.batches] == [4, 4]
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["largest_batch"] == 4 and stats["avg_batch_size"] == 4.0
+
+
+def test_batches_close_after_max_wait():
+    model = RecordingModel()
+    batcher = MicroBatcher("test", model, max_batch_size=100, max_wait_ms=50)
+
+    async def scenario():
+        first = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+        started = time.perf_counter()
+        second = await batcher.submit(10)
+        return first, second, time.perf_counter() - started
+
+    first, second, waited = asyncio.run(scenario())
+
+    assert first == [0, 2, 4] and second == 20
+    assert [len(batch) for batch in model.batches] == [3, 1]
+    # A lone request waits for company up to max_wait_ms, and not much longer
+    assert 0.04 <= waited < 1.0
+
+
+def test_runner_and_errors_reach_every_caller():
+    calls = []
+
+    async def runner(fn, items):
+        calls.append(len(items))
+        return fn(items)
+
+    def failing_model(items):
+        raise RuntimeError("modelo roto")
+
+    batcher = MicroBatcher("test", failing_model, max_batch_size=2, max_wait_ms=1, runner=runner)
+
+    async def scenario():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert calls == [2]
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.stats()["errors"] == 1
+
+
+def test_full_queue_rejects_with_retry_after():
+    model = RecordingModel()
+    release = None
+
+    async def blocked_runner(fn, items):
+        await release.wait()
+        return fn(items)
+
+    batcher = MicroBatcher(
+        "test", model, max_batch_size=1, max_wait_ms=0, runner=blocked_runner,
+        max_concurrency=1, max_queue=2, retry_after=7
+    )
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        # The first record occupies the only batch slot; the next two wait in the queue
+        pending = [asyncio.ensure_future(batcher.submit(0))]
+        while batcher.stats()["batches"] < 1:
+            await asyncio.sleep(0.001)
+        pending += [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        while batcher.stats()["queue_depth"] < 2:
+            await asyncio.sleep(0.001)
+        with pytest.raises(ServerOverloadedError) as excinfo:
+            await batcher.submit(99)
+        release.set()
+        return excinfo.value, await asyncio.gather(*pending)
+
+    error, results = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+    assert error.retry_after == 7
+    assert "llena" in str(error)
+    assert results == [0, 2, 4]
+    assert batcher.stats()["rejected"] == 1
+
+
+def test_full_queue_is_a_503(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    batcher = MicroBatcher("churn", RecordingModel(), max_queue=1, retry_after=3)
+
+    async def full_queue(item):
+        raise ServerOverloadedError("Cola de predicciones 'churn' llena (1 pendientes)", retry_after=3)
+
+    monkeypatch.setattr(batcher, "submit", full_queue)
+    monkeypatch.setitem(main.batchers, "churn", batcher)
+
+    response = TestClient(main.app).post("/predict/churn", json={
+        "client_id": "17",
+        "engagement": "Medio",
+        "satisfaccion": "Alto",
+        "dias_ultima_compra": 45,
+        "total_compras": 50000000,
+        "promedio_compra": 10000000,
+        "num_transacciones": 5
+    })
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
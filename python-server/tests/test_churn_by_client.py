@@ -0,0 +1,50 @@
+"""Tests de GET /predict/churn/client/{client_id}: respuesta, 404 y métricas por etapa."""
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import main
+
+STAGES = ("validation", "mapping", "inference", "serialization")
+
+
+def stage_count(stage: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "prediction_stage_duration_seconds_count", {"model": "churn", "stage": stage}
+    )
+    return value or 0.0
+
+
+def patch_churn(monkeypatch, samples):
+    async def resolve(client_ids):
+        return [samples.get(client_id) for client_id in client_ids]
+
+    async def run_churn_prediction(sample):
+        return {"churn_probability": sample["dias_ultima_compra"] / 100}
+
+    monkeypatch.setattr(main, "resolve_client_samples", resolve)
+    monkeypatch.setattr(main, "run_churn_prediction", run_churn_prediction)
+    monkeypatch.setattr(main, "predict_churn", lambda sample: None)
+
+
+def test_prediction_records_every_stage(monkeypatch):
+    patch_churn(monkeypatch, {"17": {"dias_ultima_compra": 80}})
+    before = {stage: stage_count(stage) for stage in STAGES}
+
+    response = TestClient(main.app).get("/predict/churn/client/17")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"client_id": "17", "churn_probability": 0.8, "risk_level": "Alto"}
+    assert all(stage_count(stage) == before[stage] + 1 for stage in STAGES)
+
+
+def test_unknown_client_is_a_404(monkeypatch):
+    patch_churn(monkeypatch, {})
+    before = stage_count("inference")
+
+    response = TestClient(main.app).get("/predict/churn/client/nadie")
+
+    assert response.status_code == 404
+    assert "nadie" in response.json()["detail"]
+    assert stage_count("inference") == before
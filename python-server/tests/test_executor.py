@@ -0,0 +1,94 @@
+"""Tests de InferenceExecutor: slots admitidos, rechazo al saturarse y liberación tras errores."""
+
+import asyncio
+import threading
+
+import pytest
+
+from executor import InferenceExecutor, ServerOverloadedError
+
+
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor("thread", max_workers=2, max_pending=2, retry_after=9)
+    yield executor
+    executor.shutdown()
+
+
+def test_invalid_kind():
+    with pytest.raises(ValueError, match="inválido"):
+        InferenceExecutor("fiber")
+
+
+def test_acquire_and_release(executor):
+    executor.acquire()
+    executor.acquire()
+
+    with pytest.raises(ServerOverloadedError) as excinfo:
+        executor.acquire()
+
+    assert excinfo.value.retry_after == 9
+    assert "saturado" in str(excinfo.value)
+    assert executor.stats()["pending"] == 2 and executor.stats()["rejected"] == 1
+
+    executor.release()
+    executor.acquire()
+    assert executor.pending == 2 and executor.rejected == 1
+
+
+def test_run_returns_the_result_and_frees_the_slot(executor):
+    result = asyncio.run(executor.run(pow, 2, 10))
+
+    assert result == 1024
+    stats = executor.stats()
+    assert stats["pending"] == 0 and stats["running"] == 0 and stats["completed"] == 1
+
+
+def test_run_rejects_when_saturated(executor):
+    gate = threading.Event()
+
+    async def scenario():
+        # Two blocked jobs hold both slots; the third is rejected without reaching the pool
+        blocked = [asyncio.ensure_future(executor.run(gate.wait, 5)) for _ in range(2)]
+        while executor.running < 2:
+            await asyncio.sleep(0.001)
+        with pytest.raises(ServerOverloadedError) as excinfo:
+            await executor.run(pow, 2, 10)
+        gate.set()
+        return excinfo.value, await asyncio.gather(*blocked)
+
+    error, results = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+    assert error.retry_after == 9
+    assert results == [True, True]
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 2 and stats["pending"] == 0
+
+
+def test_exception_in_fn_releases_the_slot(executor):
+    def broken():
+        raise RuntimeError("modelo roto")
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError, match="modelo roto"):
+            asyncio.run(executor.run(broken))
+
+    stats = executor.stats()
+    assert stats["pending"] == 0 and stats["running"] == 0
+    assert stats["completed"] == 3 and stats["rejected"] == 0
+
+
+def test_admit_false_does_not_take_a_slot(executor):
+    executor.acquire()
+    executor.acquire()
+
+    # A batch chunk runs on the slot its request already holds, even with the executor full
+    assert asyncio.run(executor.run(pow, 3, 2, admit=False)) == 9
+    assert executor.pending == 2 and executor.rejected == 0
+
+    def broken():
+        raise RuntimeError("modelo roto")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(executor.run(broken, admit=False))
+    assert executor.pending == 2 and executor.running == 0 and executor.completed == 2